@@ -0,0 +1,295 @@
+from __future__ import annotations
+
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, Mapping, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from ..config import DATA_DIR, config_section
+
+# Shared detection pass (AESTHETIC_Metric.md, composition and "saliency
+# consistency proxy"): one spectral-residual saliency map and one face
+# detection per candidate, both at low resolution, computed once and read by
+# every consumer -- the composition / narrative columns below and the layout
+# vectors agents.selection uses for diversity -- instead of each metric
+# running its own detector.
+#
+# Saliency (Hou & Zhang 2007) is batched: one FFT over the (N, S, S) stack of
+# luma thumbnails. Faces come from the first available CPU backend:
+#   yunet  cv2.FaceDetectorYN with the ONNX model at ``face_model``
+#   haar   the frontal-face cascade bundled with OpenCV 4.x
+#   none   no detector; face columns fall back to the saliency subject
+# Detectors are not thread safe, so each pool thread keeps its own; both
+# release the GIL.
+#
+# Results are per candidate frame and independent of weights, so they are
+# cached next to the metric table (FrameCache.put_detections).
+
+DETECTION_VERSION = "1"
+
+# scored columns; face_count and face_height_pct (shot scale) are descriptive
+DETECTION_CATEGORIES: Dict[str, str] = {
+    "subject_thirds_dist": "composition",
+    "headroom_pct": "composition",
+    "occupancy_pct": "composition",
+    "saliency_consistency": "narrative",
+}
+DETECTION_NAMES: Tuple[str, ...] = tuple(DETECTION_CATEGORIES) + ("face_count", "face_height_pct")
+
+# face height as % of frame height -> shot scale (first threshold reached)
+SHOT_SCALES: Tuple[Tuple[str, float], ...] = (
+    ("extreme_close", 50.0), ("close", 25.0), ("medium", 10.0), ("wide", 0.0),
+)
+
+LAYOUT_DIM = 32   # 4x4 saliency mass + 4x4 face coverage
+
+DEFAULTS: Dict[str, Any] = {
+    "enabled": True,
+    "saliency_size": 64,       # thumbnail side the spectral residual runs at
+    "map_size": 32,            # stored saliency map side
+    "face_height": 240,        # detector input height
+    "face_backend": "auto",    # auto | yunet | haar | none
+    "face_model": "",          # YuNet ONNX file; empty = data/models/face_detection_yunet.onnx
+    "face_score": 0.7,         # YuNet confidence threshold
+    "min_face_pct": 4.0,       # smallest face, % of frame height
+    "max_faces": 4,
+    "workers": 0,              # detector threads; 0 = min(4, cores)
+}
+
+_EPS = 1e-6
+_THIRDS = np.array([[1 / 3, 1 / 3], [2 / 3, 1 / 3], [1 / 3, 2 / 3], [2 / 3, 2 / 3]], dtype=np.float32)
+
+
+def detection_options(cfg: Optional[Mapping[str, Any]] = None) -> Dict[str, Any]:
+    opts = dict(DEFAULTS)
+    opts.update(config_section(cfg, "detection"))
+    return opts
+
+
+# ---------- saliency ----------
+
+def spectral_residual(gray: np.ndarray) -> np.ndarray:
+    """(N, S, S) float32 luma thumbnails -> (N, S, S) saliency maps scaled to 0..1 per frame."""
+    spec = np.fft.fft2(gray, axes=(1, 2))
+    log_amp = np.log(np.abs(spec) + _EPS)
+    # 3x3 mean of the log spectrum; the spectrum is periodic, so rolling is exact
+    avg = sum(np.roll(np.roll(log_amp, dy, axis=1), dx, axis=2) for dy in (-1, 0, 1) for dx in (-1, 0, 1)) / 9.0
+    residual = np.exp((log_amp - avg) + 1j * np.angle(spec))
+    sal = (np.abs(np.fft.ifft2(residual, axes=(1, 2))) ** 2).astype(np.float32)
+    sigma = gray.shape[1] / 24.0
+    sal = np.stack([cv2.GaussianBlur(m, (0, 0), sigma) for m in sal])
+    peak = sal.reshape(len(sal), -1).max(axis=1)
+    return sal / np.maximum(peak, _EPS)[:, None, None]
+
+
+def saliency_maps(frames: np.ndarray, size: int, map_size: int) -> np.ndarray:
+    """(N, map_size, map_size) uint8 saliency maps for (N, H, W, 3) BGR frames."""
+    if len(frames) == 0:
+        return np.zeros((0, map_size, map_size), dtype=np.uint8)
+    thumbs = np.stack([cv2.resize(f, (size, size), interpolation=cv2.INTER_AREA) for f in frames])
+    gray = cv2.cvtColor(thumbs.reshape(-1, size, 3), cv2.COLOR_BGR2GRAY).reshape(len(frames), size, size)
+    sal = spectral_residual(gray.astype(np.float32) * (1.0 / 255.0))
+    if map_size != size:
+        sal = np.stack([cv2.resize(m, (map_size, map_size), interpolation=cv2.INTER_AREA) for m in sal])
+    return np.clip(sal * 255.0 + 0.5, 0, 255).astype(np.uint8)
+
+
+# ---------- faces ----------
+
+def _yunet_model(opts: Mapping[str, Any]) -> Optional[Path]:
+    path = Path(opts["face_model"]) if opts.get("face_model") else DATA_DIR / "models" / "face_detection_yunet.onnx"
+    return path if path.is_file() else None
+
+
+def _haar_file() -> Optional[Path]:
+    data = getattr(cv2, "data", None)
+    root = getattr(data, "haarcascades", None)
+    if root is None or not hasattr(cv2, "CascadeClassifier"):
+        return None
+    path = Path(root) / "haarcascade_frontalface_default.xml"
+    return path if path.is_file() else None
+
+
+def face_backend(opts: Mapping[str, Any]) -> str:
+    """The backend ``opts`` resolves to on this machine: yunet, haar or none."""
+    want = str(opts.get("face_backend", "auto")).lower()
+    if want in ("auto", "yunet") and hasattr(cv2, "FaceDetectorYN") and _yunet_model(opts) is not None:
+        return "yunet"
+    if want in ("auto", "haar") and _haar_file() is not None:
+        return "haar"
+    return "none"
+
+
+class _FaceDetector:
+    """One thread's detector; ``boxes(frame)`` gives (K, 4) normalised x, y, w, h, largest first."""
+
+    def __init__(self, backend: str, opts: Mapping[str, Any]):
+        self.backend = backend
+        self.height = int(opts["face_height"])
+        self.min_pct = float(opts["min_face_pct"]) / 100.0
+        self.max_faces = int(opts["max_faces"])
+        self.score = float(opts["face_score"])
+        self._net: Any = None
+        if backend == "yunet":
+            self._net = cv2.FaceDetectorYN.create(str(_yunet_model(opts)), "", (320, 320), self.score, 0.3, 50)
+        elif backend == "haar":
+            self._net = cv2.CascadeClassifier(str(_haar_file()))
+
+    def boxes(self, frame: np.ndarray) -> np.ndarray:
+        h, w = frame.shape[:2]
+        scale = min(1.0, self.height / float(h))
+        small = cv2.resize(frame, (max(1, int(w * scale)), max(1, int(h * scale))), interpolation=cv2.INTER_AREA)
+        sh, sw = small.shape[:2]
+        min_side = max(8, int(self.min_pct * sh))
+        if self.backend == "yunet":
+            self._net.setInputSize((sw, sh))
+            _, found = self._net.detect(small)
+            raw = np.zeros((0, 4), dtype=np.float32) if found is None else found[:, :4]
+        else:
+            gray = cv2.equalizeHist(cv2.cvtColor(small, cv2.COLOR_BGR2GRAY))
+            found = self._net.detectMultiScale(gray, scaleFactor=1.15, minNeighbors=5, minSize=(min_side, min_side))
+            raw = np.asarray(found, dtype=np.float32).reshape(-1, 4)
+        raw = raw[(raw[:, 2] >= min_side) & (raw[:, 3] >= min_side)]
+        raw = raw[np.argsort(-(raw[:, 2] * raw[:, 3]), kind="stable")][: self.max_faces]
+        return (raw / np.array([sw, sh, sw, sh], dtype=np.float32)).astype(np.float32)
+
+
+def detect(
+    frames: np.ndarray,
+    opts: Mapping[str, Any],
+    timing: Optional[Dict[str, float]] = None,
+) -> Dict[str, np.ndarray]:
+    """
+    ``saliency`` (N, map_size, map_size) uint8 and ``faces`` (N, max_faces, 4)
+    float32 normalised boxes, NaN-padded, for an (N, H, W, 3) BGR stack.
+    """
+    n, k = len(frames), int(opts["max_faces"])
+    t0 = time.perf_counter()
+    sal = saliency_maps(frames, int(opts["saliency_size"]), int(opts["map_size"]))
+    t1 = time.perf_counter()
+    faces = np.full((n, k, 4), np.nan, dtype=np.float32)
+    backend = face_backend(opts)
+    if backend != "none" and n:
+        local = threading.local()
+
+        def run(i: int) -> Tuple[int, np.ndarray]:
+            det = getattr(local, "det", None)
+            if det is None:
+                det = local.det = _FaceDetector(backend, opts)
+            return i, det.boxes(frames[i])
+
+        workers = int(opts["workers"]) or min(4, os.cpu_count() or 1)
+        with ThreadPoolExecutor(max_workers=max(1, min(workers, n)), thread_name_prefix="aesthetic-faces") as pool:
+            for i, boxes in pool.map(run, range(n)):
+                faces[i, : len(boxes)] = boxes
+    if timing is not None:
+        timing["detection.saliency"] = timing.get("detection.saliency", 0.0) + (t1 - t0)
+        timing["detection.faces"] = timing.get("detection.faces", 0.0) + (time.perf_counter() - t1)
+    return {"saliency": sal, "faces": faces}
+
+
+# ---------- consumers ----------
+
+def _salient_mask(sal: np.ndarray) -> np.ndarray:
+    # Hou & Zhang's object map: above three times the map's mean
+    s = sal.astype(np.float32)
+    return s > 3.0 * s.mean(axis=(1, 2), keepdims=True)
+
+
+def _centroid(weight: np.ndarray) -> np.ndarray:
+    """(N, 2) x, y centres of mass in 0..1 of (N, S, S) weights; frame centre when empty."""
+    n, s = weight.shape[0], weight.shape[1]
+    grid = (np.arange(s, dtype=np.float32) + 0.5) / s
+    mass = weight.sum(axis=(1, 2))
+    safe = np.maximum(mass, _EPS)
+    x = (weight.sum(axis=1) @ grid) / safe
+    y = (weight.sum(axis=2) @ grid) / safe
+    out = np.stack([x, y], axis=1)
+    out[mass <= 0] = 0.5
+    return out.reshape(n, 2).astype(np.float32)
+
+
+def shot_scale(face_height_pct: float) -> str:
+    """Shot scale from the largest face's height; "" without a face."""
+    if not face_height_pct == face_height_pct or face_height_pct <= 0:   # NaN or no face
+        return ""
+    return next(name for name, low in SHOT_SCALES if face_height_pct >= low)
+
+
+def detection_columns(det: Mapping[str, np.ndarray], candidate_scene: np.ndarray) -> np.ndarray:
+    """
+    (N, len(DETECTION_NAMES)) raw values. The subject is the largest face, or
+    the salient region's centre of mass when no face was found; consistency
+    is the correlation of each map with the mean of the other maps in its
+    scene (NaN for single-candidate scenes and flat maps).
+    """
+    sal, faces = det["saliency"], det["faces"]
+    n = len(sal)
+    out = np.full((n, len(DETECTION_NAMES)), np.nan, dtype=np.float32)
+    if n == 0:
+        return out
+    col = {name: i for i, name in enumerate(DETECTION_NAMES)}
+    mask = _salient_mask(sal)
+    s = sal.shape[1]
+
+    has_face = ~np.isnan(faces[:, 0, 0])
+    lead = np.nan_to_num(faces[:, 0])
+    subject = _centroid(mask * sal.astype(np.float32))
+    subject[has_face] = lead[has_face, :2] + lead[has_face, 2:] / 2.0
+    dist = np.linalg.norm(subject[:, None, :] - _THIRDS[None], axis=2).min(axis=1)
+    out[:, col["subject_thirds_dist"]] = dist
+
+    rows = mask.any(axis=2)
+    top = np.where(rows.any(axis=1), rows.argmax(axis=1) / float(s), 0.5)
+    top[has_face] = lead[has_face, 1]
+    out[:, col["headroom_pct"]] = top * 100.0
+    out[:, col["occupancy_pct"]] = mask.mean(axis=(1, 2)) * 100.0
+    out[:, col["face_count"]] = (~np.isnan(faces[:, :, 0])).sum(axis=1)
+    out[:, col["face_height_pct"]] = np.where(has_face, lead[:, 3] * 100.0, 0.0)
+
+    flat = sal.reshape(n, -1).astype(np.float32)
+    flat -= flat.mean(axis=1, keepdims=True)
+    scene = np.asarray(candidate_scene, dtype=np.int64)
+    uniq, inv = np.unique(scene, return_inverse=True)
+    sums = np.zeros((len(uniq), flat.shape[1]), dtype=np.float32)
+    np.add.at(sums, inv, flat)
+    count = np.bincount(inv, minlength=len(uniq))[inv]
+    # leave-one-out: a map must not count towards its own reference
+    ref = (sums[inv] - flat) / np.maximum(count - 1, 1)[:, None]
+    denom = np.linalg.norm(flat, axis=1) * np.linalg.norm(ref, axis=1)
+    ok = (count > 1) & (denom > _EPS)
+    out[:, col["saliency_consistency"]] = np.where(ok, (flat * ref).sum(axis=1) / np.maximum(denom, _EPS), np.nan)
+    return out
+
+
+def layout_vectors(det: Mapping[str, np.ndarray]) -> np.ndarray:
+    """(N, LAYOUT_DIM) unit vectors: where the saliency and the faces sit on a 4x4 grid."""
+    sal, faces = det["saliency"], det["faces"]
+    n = len(sal)
+    if n == 0:
+        return np.zeros((0, LAYOUT_DIM), dtype=np.float32)
+    grid = np.stack([cv2.resize(m, (4, 4), interpolation=cv2.INTER_AREA) for m in sal.astype(np.float32)]).reshape(n, 16)
+    grid /= np.maximum(grid.sum(axis=1, keepdims=True), _EPS)
+    cover = np.zeros((n, 4, 4), dtype=np.float32)
+    cells = (np.arange(4, dtype=np.float32) + 0.5) / 4.0
+    for k in range(faces.shape[1]):
+        box = faces[:, k]
+        ok = ~np.isnan(box[:, 0])
+        if not ok.any():
+            break
+        b = np.nan_to_num(box)
+        inx = (cells[None, :] >= b[:, :1]) & (cells[None, :] <= b[:, :1] + b[:, 2:3])
+        iny = (cells[None, :] >= b[:, 1:2]) & (cells[None, :] <= b[:, 1:2] + b[:, 3:4])
+        # a face smaller than a cell still marks the cell it is in
+        cx = np.clip(((b[:, 0] + b[:, 2] / 2) * 4).astype(int), 0, 3)
+        cy = np.clip(((b[:, 1] + b[:, 3] / 2) * 4).astype(int), 0, 3)
+        inx[np.arange(n), cx] = True
+        iny[np.arange(n), cy] = True
+        cover += (iny[:, :, None] & inx[:, None, :]) * ok[:, None, None]
+    vec = np.concatenate([grid, np.minimum(cover, 1.0).reshape(n, 16) / 4.0], axis=1)
+    return (vec / np.maximum(np.linalg.norm(vec, axis=1, keepdims=True), _EPS)).astype(np.float32)
@@ -1 +1,267 @@
-# TODO: write frames, contact sheet, hero scenes
+from __future__ import annotations
+
+import bisect
+import json
+import math
+import os
+import shutil
+import subprocess
+import threading
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Mapping, Optional, Sequence, Set, Tuple, Union
+
+import cv2
+import numpy as np
+
+from ..config import config_section
+from ..storage.cache import FrameCache
+from ..storage.fs import ensure_dir
+from .ingest import probe, read_frames
+
+# Exporter: hero frames, a contact sheet and hero-scene trims for one job.
+#
+# Frames come from the frame cache where the job left them, otherwise from
+# one sorted forward pass over the source. Each frame is handed to a thread
+# pool that encodes the full-resolution still and pastes its thumbnail into a
+# contact sheet canvas allocated once up front (tiles are disjoint slices, so
+# workers never contend). OpenCV's codecs release the GIL, and at most
+# ``max_inflight`` frames are alive at a time, so memory stays flat however
+# many 4K stills a reel asks for.
+#
+# Trims are listed per hero scene as ffmpeg commands: stream copy when the
+# scene starts on a keyframe (no re-encode, frame exact), re-encode otherwise.
+# They are only executed with ``render_trims`` and an ffmpeg on PATH.
+
+PathLike = Union[str, Path]
+
+DEFAULTS: Dict[str, Any] = {
+    "format": "jpg",            # hero frame format: jpg | png | webp
+    "quality": 92,              # jpg / webp quality; png uses compression level 1
+    "workers": 0,               # encoder threads; 0 = min(8, cores)
+    "max_inflight": 0,          # decoded frames alive at once; 0 = 2 * workers
+    "sheet_columns": 4,
+    "tile_width": 480,
+    "sheet_format": "jpg",
+    "keyframe_tolerance": 1,    # frames between a scene start and a keyframe still counted as aligned
+    "render_trims": False,
+    "trim_codec": "libx264",    # used when a trim cannot be stream copied
+}
+
+_EXT = {"jpg": ".jpg", "jpeg": ".jpg", "png": ".png", "webp": ".webp"}
+
+
+def export_options(cfg: Optional[Mapping[str, Any]] = None) -> Dict[str, Any]:
+    opts = dict(DEFAULTS)
+    opts.update(config_section(cfg, "export"))
+    return opts
+
+
+def encode_params(fmt: str, quality: int) -> Tuple[str, List[int]]:
+    ext = _EXT.get(str(fmt).lower(), ".jpg")
+    if ext == ".png":
+        return ext, [cv2.IMWRITE_PNG_COMPRESSION, 1]
+    if ext == ".webp":
+        return ext, [cv2.IMWRITE_WEBP_QUALITY, int(quality)]
+    return ext, [cv2.IMWRITE_JPEG_QUALITY, int(quality)]
+
+
+def write_image(path: Path, img: np.ndarray, params: Sequence[int]) -> bool:
+    # imencode + write_bytes instead of imwrite: works with non-ASCII paths
+    ok, buf = cv2.imencode(path.suffix, img, list(params))
+    if ok:
+        path.write_bytes(buf.tobytes())
+    return bool(ok)
+
+
+class ContactSheet:
+    """A fixed grid canvas; ``paste(slot, frame)`` is safe from several threads."""
+
+    def __init__(self, count: int, columns: int, tile_width: int, aspect: float):
+        self.columns = max(1, min(int(columns), count))
+        self.rows = max(1, math.ceil(count / self.columns))
+        self.tile_w = max(16, int(tile_width))
+        self.tile_h = max(16, int(round(self.tile_w / max(aspect, 1e-3))))
+        self.canvas = np.zeros((self.rows * self.tile_h, self.columns * self.tile_w, 3), dtype=np.uint8)
+
+    def paste(self, slot: int, frame: np.ndarray, label: str = "") -> None:
+        r, c = divmod(int(slot), self.columns)
+        y, x = r * self.tile_h, c * self.tile_w
+        tile = cv2.resize(frame, (self.tile_w, self.tile_h), interpolation=cv2.INTER_AREA)
+        if label:
+            cv2.putText(tile, label, (8, 22), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 0, 0), 3, cv2.LINE_AA)
+            cv2.putText(tile, label, (8, 22), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 1, cv2.LINE_AA)
+        self.canvas[y:y + self.tile_h, x:x + self.tile_w] = tile
+
+
+# ---------- trims ----------
+
+def plan_trims(
+    source: PathLike,
+    shots: Sequence[Mapping[str, Any]],
+    fps: float,
+    out_dir: Path,
+    keyframes: Optional[Sequence[int]],
+    opts: Mapping[str, Any],
+) -> List[Dict[str, Any]]:
+    """One trim per hero scene, with the ffmpeg command that cuts it."""
+    src = Path(source)
+    kf = sorted(int(k) for k in keyframes) if keyframes else []
+    tol = int(opts["keyframe_tolerance"])
+    out: List[Dict[str, Any]] = []
+    seen: Set[int] = set()
+    for rank, shot in enumerate(shots, 1):
+        scene = int(shot.get("id", rank))
+        start, end = float(shot.get("start", 0.0)), float(shot.get("end", 0.0))
+        if scene in seen or end <= start:
+            continue
+        seen.add(scene)
+        start_frame = int(round(start * fps)) if fps else 0
+        aligned = False
+        if kf:
+            i = bisect.bisect_right(kf, start_frame + tol) - 1
+            aligned = i >= 0 and start_frame - kf[i] <= tol
+        if aligned:
+            path = out_dir / f"{src.stem}_scene{scene:03d}{src.suffix}"
+            # -ss before -i lands on the keyframe the scene starts on
+            codec = ["-c", "copy", "-avoid_negative_ts", "make_zero"]
+        else:
+            path = out_dir / f"{src.stem}_scene{scene:03d}.mp4"
+            codec = ["-c:v", str(opts["trim_codec"]), "-crf", "18", "-preset", "veryfast", "-c:a", "aac"]
+        cmd = ["ffmpeg", "-y", "-v", "error", "-ss", f"{start:.3f}", "-i", str(src),
+               "-t", f"{end - start:.3f}", *codec, str(path)]
+        out.append({
+            "scene": scene,
+            "rank": rank,
+            "start": start,
+            "end": end,
+            "start_frame": start_frame,
+            "mode": "copy" if aligned else "reencode",
+            "path": str(path),
+            "command": cmd,
+        })
+    return out
+
+
+def _run_trim(trim: Dict[str, Any], exe: str) -> Dict[str, Any]:
+    cmd = [exe] + trim["command"][1:]
+    try:
+        subprocess.run(cmd, capture_output=True, check=True)
+        return {"scene": trim["scene"], "ok": True}
+    except (OSError, subprocess.SubprocessError) as e:
+        return {"scene": trim["scene"], "ok": False, "error": str(e)}
+
+
+# ---------- driver ----------
+
+def export_shots(
+    source: PathLike,
+    shots: Any,
+    out_dir: PathLike,
+    cfg: Optional[Mapping[str, Any]] = None,
+    *,
+    cache: Optional[FrameCache] = None,
+    key: str = "",
+    keyframes: Optional[Sequence[int]] = None,
+    progress: Optional[Callable[[float], None]] = None,
+) -> Dict[str, Any]:
+    """
+    Write the hero frames, contact sheet and trim list of ``shots`` (a
+    ShotTable from pipeline.select_shots, or shot dicts) into ``out_dir``.
+    """
+    if hasattr(shots, "to_dicts"):
+        shots = shots.to_dicts()
+    opts = export_options(cfg)
+    meta = probe(source)
+    if not meta.get("ok"):
+        return {"ok": False, "error": meta.get("error", "probe failed")}
+    if not shots:
+        return {"ok": False, "error": "no shots to export"}
+    out = ensure_dir(Path(out_dir))
+    stem = Path(source).stem
+    fps = float(meta.get("fps") or 0.0)
+    ext, params = encode_params(opts["format"], int(opts["quality"]))
+    sheet_ext, sheet_params = encode_params(opts["sheet_format"], int(opts["quality"]))
+
+    # slot per distinct frame, in rank order
+    slots: Dict[int, int] = {}
+    labels: Dict[int, str] = {}
+    for rank, shot in enumerate(shots, 1):
+        f = int(shot.get("frame", 0))
+        if f not in slots:
+            slots[f] = len(slots)
+            labels[f] = f"#{rank}  {shot.get('totalScore', '')}"
+    paths = {f: out / f"{stem}_shot{slots[f] + 1:02d}_f{f}{ext}" for f in slots}
+    aspect = float(meta["width"]) / float(meta["height"]) if meta.get("height") else 16 / 9
+    sheet = ContactSheet(len(slots), int(opts["sheet_columns"]), int(opts["tile_width"]), aspect)
+
+    workers = int(opts["workers"]) or min(8, os.cpu_count() or 1)
+    workers = max(1, min(workers, len(slots)))
+    max_inflight = int(opts["max_inflight"]) or 2 * workers
+    written: Dict[int, str] = {}
+    failed: List[int] = []
+    lock = threading.Lock()
+    done = [0]
+
+    def emit(f: int, img: Optional[np.ndarray]) -> None:
+        ok = img is not None and write_image(paths[f], img, params)
+        if img is not None:
+            sheet.paste(slots[f], img, labels[f])
+        with lock:
+            if ok:
+                written[f] = str(paths[f])
+            else:
+                failed.append(f)
+            done[0] += 1
+
+    def report() -> None:
+        # on the calling thread, so a cancelling progress callback is not swallowed by the pool
+        if progress is not None:
+            progress(done[0] / len(slots))
+
+    def from_cache(f: int) -> bool:
+        img = cache.get_frame(key, f) if cache is not None else None
+        if img is None:
+            return False
+        emit(f, img)
+        return True
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="aesthetic-export") as pool:
+        # cached frames are read (PNG decode, GIL free) inside the workers too
+        hits = list(zip(slots, pool.map(from_cache, list(slots)))) if cache is not None else [(f, False) for f in slots]
+        to_decode = [f for f, hit in hits if not hit]
+        pending: Set[Future] = set()
+        report()
+        for f, img in read_frames(source, to_decode, keyframes=keyframes):
+            if len(pending) >= max_inflight:
+                _, pending = wait(pending, return_when=FIRST_COMPLETED)
+                report()
+            pending.add(pool.submit(emit, f, img))
+        wait(pending)
+        report()
+        for f in to_decode:
+            if f not in written and f not in failed:
+                failed.append(f)
+
+        sheet_path = out / f"{stem}_contact_sheet{sheet_ext}"
+        sheet_ok = write_image(sheet_path, sheet.canvas, sheet_params)
+
+        trims = plan_trims(source, shots, fps, out, keyframes, opts)
+        exe = shutil.which("ffmpeg")
+        rendered: List[Dict[str, Any]] = []
+        if opts["render_trims"] and exe is not None:
+            rendered = list(pool.map(lambda t: _run_trim(t, exe), trims))
+
+    trims_path = out / f"{stem}_trims.json"
+    trims_path.write_text(json.dumps({"source": str(source), "fps": fps, "trims": trims}, indent=2), encoding="utf-8")
+    return {
+        "ok": True,
+        "frames": [written[f] for f in slots if f in written],
+        "failed_frames": sorted(failed),
+        "contact_sheet": str(sheet_path) if sheet_ok else None,
+        "trims": str(trims_path),
+        "trim_modes": {m: sum(t["mode"] == m for t in trims) for m in ("copy", "reencode")},
+        "rendered": rendered,
+        "ffmpeg": exe is not None,
+        "workers": workers,
+    }
@@ -1 +1,300 @@
-# TODO: ingest video metadata
+from __future__ import annotations
+
+import bisect
+import shutil
+import subprocess
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Mapping, Optional, Sequence, Tuple, Union
+
+import cv2
+import numpy as np
+
+from ..config import config_section
+
+# Streaming decoder for the analysis pipeline.
+#
+# Peak memory is independent of reel duration and source resolution: the full
+# resolution decode target is a single reused array and everything handed to
+# callers lives in a fixed-size BufferPool at the analysis (proxy) resolution.
+# Full resolution frames are only produced by read_frames() for candidates.
+
+PathLike = Union[str, Path]
+
+DEFAULTS: Dict[str, Any] = {
+    "analysis_height": 480,   # proxy height for scene detection; 0 keeps source size
+    "pool_size": 4,           # buffers in the per-frame ring
+    "block_frames": 64,       # frames per batched block
+}
+
+
+def ingest_options(cfg: Optional[Mapping[str, Any]] = None) -> Dict[str, Any]:
+    opts = dict(DEFAULTS)
+    opts.update(config_section(cfg, "ingest"))
+    return opts
+
+
+# ---------- metadata ----------
+
+def probe(path: PathLike) -> Dict[str, Any]:
+    cap = cv2.VideoCapture(str(path))
+    if not cap.isOpened():
+        return {"ok": False, "error": f"cannot open {path}"}
+    try:
+        fps = float(cap.get(cv2.CAP_PROP_FPS) or 0.0)
+        width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    finally:
+        cap.release()
+    return {
+        "ok": True,
+        "path": str(path),
+        "fps": fps,
+        "width": width,
+        "height": height,
+        "frame_count": frame_count,
+        "duration": frame_count / fps if fps > 0 else 0.0,
+    }
+
+
+def keyframe_index(path: PathLike, fps: float, timeout: float = 120.0) -> Optional[List[int]]:
+    """
+    Sorted frame indices of the video's keyframes, read from packet flags by
+    ffprobe (no decoding). None when ffprobe is not installed or fails; the
+    readers then fall back to a fixed seek distance.
+    """
+    exe = shutil.which("ffprobe")
+    if exe is None or fps <= 0:
+        return None
+    cmd = [
+        exe, "-v", "error", "-select_streams", "v:0",
+        "-show_entries", "packet=pts_time,flags", "-of", "csv=p=0", str(path),
+    ]
+    try:
+        out = subprocess.run(cmd, capture_output=True, text=True, timeout=timeout, check=True).stdout
+    except (OSError, subprocess.SubprocessError):
+        return None
+    frames = set()
+    for line in out.splitlines():
+        parts = line.strip().split(",")
+        if len(parts) >= 2 and "K" in parts[1]:
+            try:
+                frames.add(int(round(float(parts[0]) * fps)))
+            except ValueError:
+                continue
+    return sorted(frames) or None
+
+
+def proxy_size(width: int, height: int, analysis_height: int) -> Tuple[int, int]:
+    """(w, h) of the analysis proxy; never upscales, keeps even dimensions."""
+    if analysis_height <= 0 or height <= analysis_height:
+        return width, height
+    scale = analysis_height / float(height)
+    w = max(2, int(round(width * scale / 2.0)) * 2)
+    h = max(2, int(round(analysis_height / 2.0)) * 2)
+    return w, h
+
+
+# ---------- buffers ----------
+
+class BufferPool:
+    """
+    Fixed ring of preallocated arrays handed out round-robin.
+
+    A buffer is recycled after ``size`` further acquisitions, so a consumer that
+    keeps a frame longer than that must copy it.
+    """
+
+    def __init__(self, shape: Tuple[int, ...], dtype: Any = np.uint8, size: int = 4):
+        self.shape = tuple(int(s) for s in shape)
+        self.dtype = np.dtype(dtype)
+        self._bufs = [np.empty(self.shape, dtype=self.dtype) for _ in range(max(1, int(size)))]
+        self._next = 0
+
+    def acquire(self) -> np.ndarray:
+        buf = self._bufs[self._next]
+        self._next = (self._next + 1) % len(self._bufs)
+        return buf
+
+    @property
+    def size(self) -> int:
+        return len(self._bufs)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(b.nbytes for b in self._bufs)
+
+
+class _Decoder:
+    """One VideoCapture plus the single full resolution decode target."""
+
+    def __init__(self, path: PathLike):
+        self.cap = cv2.VideoCapture(str(path))
+        if not self.cap.isOpened():
+            raise IOError(f"cannot open {path}")
+        self.width = int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        self.height = int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        self.pos = 0
+        self._full = np.empty((self.height, self.width, 3), dtype=np.uint8)
+        self._scratch: Optional[np.ndarray] = None
+
+    def close(self) -> None:
+        self.cap.release()
+
+    def seek(self, index: int) -> None:
+        if index != self.pos:
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, float(index))
+            self.pos = index
+
+    def skip(self, count: int) -> bool:
+        # grab() demuxes and decodes but skips the colour conversion and copy
+        for _ in range(count):
+            if not self.cap.grab():
+                return False
+            self.pos += 1
+        return True
+
+    def read_into(self, out: np.ndarray, gray: bool) -> bool:
+        ok, frame = self.cap.read(self._full)
+        if not ok or frame is None:
+            return False
+        if frame is not self._full:
+            # backend handed back a fresh array (e.g. size changed mid stream)
+            self._full = frame
+        self.pos += 1
+        h, w = out.shape[:2]
+        if gray:
+            src = self._full
+            if (w, h) != (self._full.shape[1], self._full.shape[0]):
+                # downscale colour first so the conversion runs at proxy size
+                if self._scratch is None or self._scratch.shape[:2] != (h, w):
+                    self._scratch = np.empty((h, w, 3), dtype=np.uint8)
+                cv2.resize(self._full, (w, h), dst=self._scratch, interpolation=cv2.INTER_AREA)
+                src = self._scratch
+            cv2.cvtColor(src, cv2.COLOR_BGR2GRAY, dst=out)
+        elif (w, h) != (self._full.shape[1], self._full.shape[0]):
+            cv2.resize(self._full, (w, h), dst=out, interpolation=cv2.INTER_AREA)
+        else:
+            np.copyto(out, self._full)
+        return True
+
+
+# ---------- streaming readers ----------
+
+def iter_frames(
+    path: PathLike,
+    *,
+    analysis_height: int = DEFAULTS["analysis_height"],
+    gray: bool = True,
+    stride: int = 1,
+    start: int = 0,
+    stop: Optional[int] = None,
+    pool_size: int = DEFAULTS["pool_size"],
+) -> Iterator[Tuple[int, np.ndarray]]:
+    """
+    Yield ``(frame_index, proxy)`` for every ``stride``-th frame in [start, stop).
+
+    Proxies are uint8 luma (H, W) when ``gray`` else BGR (H, W, 3) at
+    ``analysis_height``. They are views into a BufferPool of ``pool_size``
+    buffers and are overwritten once the generator has advanced that far.
+    """
+    stride = max(1, int(stride))
+    dec = _Decoder(path)
+    try:
+        w, h = proxy_size(dec.width, dec.height, int(analysis_height))
+        pool = BufferPool((h, w) if gray else (h, w, 3), size=pool_size)
+        dec.seek(max(0, int(start)))
+        while stop is None or dec.pos < stop:
+            index = dec.pos
+            out = pool.acquire()
+            if not dec.read_into(out, gray):
+                break
+            yield index, out
+            if stride > 1 and not dec.skip(stride - 1):
+                break
+    finally:
+        dec.close()
+
+
+def iter_blocks(
+    path: PathLike,
+    *,
+    block_frames: int = DEFAULTS["block_frames"],
+    analysis_height: int = DEFAULTS["analysis_height"],
+    gray: bool = True,
+    stride: int = 1,
+    start: int = 0,
+    stop: Optional[int] = None,
+) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+    """
+    Yield ``(indices, block)`` with ``block`` shaped (B, H, W[, 3]) for batched
+    NumPy analysis. Blocks come from a two-buffer pool, so the previous block
+    is still intact while the current one is processed.
+    """
+    block_frames = max(1, int(block_frames))
+    pool: Optional[BufferPool] = None
+    idx = np.empty(block_frames, dtype=np.int64)
+    block: Optional[np.ndarray] = None
+    fill = 0
+    frames = iter_frames(
+        path, analysis_height=analysis_height, gray=gray, stride=stride,
+        start=start, stop=stop, pool_size=1,
+    )
+    for index, frame in frames:
+        if pool is None:
+            pool = BufferPool((block_frames,) + frame.shape, size=2)
+        if block is None:
+            block = pool.acquire()
+            fill = 0
+        block[fill] = frame
+        idx[fill] = index
+        fill += 1
+        if fill == block_frames:
+            yield idx[:fill].copy(), block[:fill]
+            block = None
+    if block is not None and fill:
+        yield idx[:fill].copy(), block[:fill]
+
+
+def read_frames(
+    path: PathLike,
+    indices: Iterable[int],
+    *,
+    analysis_height: int = 0,
+    seek_gap: int = 250,
+    keyframes: Optional[Sequence[int]] = None,
+) -> Iterator[Tuple[int, np.ndarray]]:
+    """
+    Decode the requested frames (BGR, full resolution by default) in file order.
+
+    Indices are sorted and decoded in a single forward pass. With a keyframe
+    index, the decoder seeks only when a keyframe lies between the current
+    position and the next wanted frame (decoding forward is never longer than
+    decoding from that keyframe); otherwise gaps larger than ``seek_gap``
+    frames are crossed with a seek. Each yielded array is freshly allocated
+    so candidates can be retained.
+    """
+    wanted = sorted({int(i) for i in indices if int(i) >= 0})
+    if not wanted:
+        return
+    kf = list(keyframes) if keyframes else None
+    dec = _Decoder(path)
+    try:
+        w, h = proxy_size(dec.width, dec.height, int(analysis_height))
+        for index in wanted:
+            gap = index - dec.pos
+            if kf is not None:
+                k = bisect.bisect_right(kf, index) - 1
+                jump = gap < 0 or (k >= 0 and kf[k] > dec.pos)
+            else:
+                jump = gap < 0 or gap > seek_gap
+            if jump:
+                dec.seek(index)
+            elif gap and not dec.skip(gap):
+                break
+            out = np.empty((h, w, 3), dtype=np.uint8)
+            if not dec.read_into(out, gray=False):
+                break
+            yield index, out
+    finally:
+        dec.close()
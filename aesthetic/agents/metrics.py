@@ -1 +1,320 @@
-# TODO: compute cheap technical metrics
+from __future__ import annotations
+
+import math
+import time
+from typing import Any, Callable, Dict, List, Mapping, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from ..config import config_section
+
+# Batched Technical metrics (AESTHETIC_Metric.md) for a stack of candidate
+# frames shaped (N, H, W, 3), uint8 BGR.
+#
+# Every expensive intermediate (luma, Lab, histograms, Laplacian, gradients,
+# noise residuals) is computed at most once per batch by _Shared and handed to
+# the metric groups, which are cheap reductions over those arrays. Wall time
+# is recorded per intermediate ("shared.<name>") and, net of those, per
+# metric group.
+
+ENGINE_VERSION = "1"
+
+# column order of the values matrix; everything downstream keys on it
+METRIC_CATEGORIES: Dict[str, str] = {
+    "luma_mean": "exposure",
+    "luma_median": "exposure",
+    "luma_std": "exposure",
+    "luma_skew": "exposure",
+    "luma_kurtosis": "exposure",
+    "clip_highlights_pct": "exposure",
+    "clip_shadows_pct": "exposure",
+    "moment3_18gray": "exposure",
+    "snr_luma_db": "exposure",
+    "snr_chroma_db": "exposure",
+    "dynamic_range_stops": "lighting",
+    "laplacian_var": "quality",
+    "edge_density": "quality",
+    "vignetting_stops": "quality",
+    "saturation_mean": "color",
+    "saturation_uniformity": "color",
+    "palette_entropy": "color",
+}
+METRIC_NAMES: Tuple[str, ...] = tuple(METRIC_CATEGORIES)
+
+DEFAULTS: Dict[str, Any] = {
+    "batch_size": 4,   # frames per pass; bounds intermediate memory
+}
+
+_GRAY_18 = 118.0 / 255.0   # 18 % linear reflectance in sRGB code values
+_EPS = 1e-6
+
+
+def metrics_options(cfg: Optional[Mapping[str, Any]] = None) -> Dict[str, Any]:
+    opts = dict(DEFAULTS)
+    opts.update(config_section(cfg, "metrics"))
+    return opts
+
+
+def _srgb_to_linear_lut() -> np.ndarray:
+    v = np.arange(256, dtype=np.float64) / 255.0
+    lin = np.where(v <= 0.04045, v / 12.92, ((v + 0.055) / 1.055) ** 2.4)
+    return lin.astype(np.float32)
+
+
+_LINEAR_LUT = _srgb_to_linear_lut()
+
+
+# ---------- shared intermediates ----------
+
+class _Shared:
+    """Lazily computed, memoised intermediates for one batch."""
+
+    def __init__(self, frames: np.ndarray, timing: Dict[str, float]):
+        self.frames = frames
+        self.n, self.h, self.w = frames.shape[:3]
+        self.timing = timing
+        self.spent = 0.0
+        self._cache: Dict[str, Any] = {}
+
+    def _get(self, name: str, fn: Callable[[], Any]) -> Any:
+        if name not in self._cache:
+            t0 = time.perf_counter()
+            outer = self.spent
+            self._cache[name] = fn()
+            # exclusive time: nested intermediates were already booked
+            dt = time.perf_counter() - t0 - (self.spent - outer)
+            key = "shared." + name
+            self.timing[key] = self.timing.get(key, 0.0) + dt
+            self.spent += dt
+        return self._cache[name]
+
+    @property
+    def gray_u8(self) -> np.ndarray:
+        # one cvtColor over the whole stack viewed as a single tall image
+        def fn() -> np.ndarray:
+            tall = self.frames.reshape(self.n * self.h, self.w, 3)
+            return cv2.cvtColor(tall, cv2.COLOR_BGR2GRAY).reshape(self.n, self.h, self.w)
+        return self._get("gray_u8", fn)
+
+    @property
+    def gray(self) -> np.ndarray:
+        return self._get("gray", lambda: self.gray_u8.astype(np.float32) * (1.0 / 255.0))
+
+    @property
+    def hist(self) -> np.ndarray:
+        # (N, 256) luma counts
+        return self._get("hist", lambda: np.stack([np.bincount(g.ravel(), minlength=256) for g in self.gray_u8]))
+
+    @property
+    def cdf(self) -> np.ndarray:
+        return self._get("cdf", lambda: np.cumsum(self.hist, axis=1) / float(self.h * self.w))
+
+    @property
+    def lab_u8(self) -> np.ndarray:
+        # 8-bit Lab: L scaled to 0..255, a and b offset by 128
+        def fn() -> np.ndarray:
+            tall = self.frames.reshape(self.n * self.h, self.w, 3)
+            return cv2.cvtColor(tall, cv2.COLOR_BGR2LAB).reshape(self.n, self.h, self.w, 3)
+        return self._get("lab_u8", fn)
+
+    @property
+    def ab(self) -> Tuple[np.ndarray, np.ndarray]:
+        def fn() -> Tuple[np.ndarray, np.ndarray]:
+            lab = self.lab_u8
+            return lab[..., 1].astype(np.float32) - 128.0, lab[..., 2].astype(np.float32) - 128.0
+        return self._get("ab", fn)
+
+    @property
+    def chroma(self) -> np.ndarray:
+        return self._get("chroma", lambda: np.hypot(*self.ab))
+
+    @property
+    def laplacian(self) -> np.ndarray:
+        def fn() -> np.ndarray:
+            g = self.gray
+            c = g[:, 1:-1, 1:-1]
+            return (g[:, :-2, 1:-1] + g[:, 2:, 1:-1] + g[:, 1:-1, :-2] + g[:, 1:-1, 2:] - 4.0 * c) * 255.0
+        return self._get("laplacian", fn)
+
+    @property
+    def grad_mag(self) -> np.ndarray:
+        def fn() -> np.ndarray:
+            g = self.gray
+            gx = g[:, 1:-1, 2:] - g[:, 1:-1, :-2]
+            gy = g[:, 2:, 1:-1] - g[:, :-2, 1:-1]
+            return np.hypot(gx, gy) * 0.5
+        return self._get("grad_mag", fn)
+
+    def noise_sigma(self, name: str, plane: Callable[[], np.ndarray]) -> np.ndarray:
+        """Immerkaer fast noise estimate per frame, in the units of ``plane``."""
+        def fn() -> np.ndarray:
+            p = plane()
+            # separable [1,-2,1] x [1,-2,1] kernel via shifted slices
+            dx = p[:, :, :-2] - 2.0 * p[:, :, 1:-1] + p[:, :, 2:]
+            dxy = dx[:, :-2] - 2.0 * dx[:, 1:-1] + dx[:, 2:]
+            return np.abs(dxy).mean(axis=(1, 2)) * math.sqrt(math.pi / 2.0) / 6.0
+        return self._get("noise." + name, fn)
+
+
+# ---------- metric groups ----------
+
+def _histogram_moments(s: _Shared) -> Dict[str, np.ndarray]:
+    p = s.hist / float(s.h * s.w)
+    v = np.arange(256, dtype=np.float64) / 255.0
+    mean = p @ v
+    d = v[None, :] - mean[:, None]
+    var = (p * d ** 2).sum(axis=1)
+    std = np.sqrt(var)
+    safe = np.maximum(std, _EPS)
+    return {
+        "luma_mean": mean,
+        "luma_median": np.argmax(s.cdf >= 0.5, axis=1) / 255.0,
+        "luma_std": std,
+        "luma_skew": (p * d ** 3).sum(axis=1) / safe ** 3,
+        "luma_kurtosis": (p * d ** 4).sum(axis=1) / safe ** 4 - 3.0,
+        "moment3_18gray": p @ ((v - _GRAY_18) ** 3),
+    }
+
+
+def _clipping(s: _Shared) -> Dict[str, np.ndarray]:
+    total = float(s.h * s.w)
+    return {
+        "clip_highlights_pct": s.hist[:, 253:].sum(axis=1) * (100.0 / total),
+        "clip_shadows_pct": s.hist[:, :3].sum(axis=1) * (100.0 / total),
+    }
+
+
+def _snr(s: _Shared) -> Dict[str, np.ndarray]:
+    sig_y = s.noise_sigma("luma", lambda: s.gray)
+    sig_a = s.noise_sigma("a", lambda: s.ab[0])
+    sig_b = s.noise_sigma("b", lambda: s.ab[1])
+    mean_y = s.gray.mean(axis=(1, 2))
+    # chroma noise is referenced to mean L* (0..100), both in Lab units
+    mean_l = s.lab_u8[..., 0].mean(axis=(1, 2)) * (100.0 / 255.0)
+    sig_c = np.sqrt(0.5 * (sig_a ** 2 + sig_b ** 2))
+    return {
+        "snr_luma_db": 20.0 * np.log10(np.maximum(mean_y, _EPS) / np.maximum(sig_y, _EPS)),
+        "snr_chroma_db": 20.0 * np.log10(np.maximum(mean_l, _EPS) / np.maximum(sig_c, _EPS)),
+    }
+
+
+def _dynamic_range(s: _Shared) -> Dict[str, np.ndarray]:
+    lo = np.argmax(s.cdf >= 0.005, axis=1)
+    hi = np.argmax(s.cdf >= 0.995, axis=1)
+    floor = 1.0 / 1024.0  # ~10 stops below white, keeps black frames finite
+    lin_lo = np.maximum(_LINEAR_LUT[lo], floor)
+    lin_hi = np.maximum(_LINEAR_LUT[hi], floor)
+    return {"dynamic_range_stops": np.log2(lin_hi / lin_lo)}
+
+
+def _sharpness(s: _Shared) -> Dict[str, np.ndarray]:
+    return {
+        "laplacian_var": s.laplacian.reshape(s.n, -1).var(axis=1),
+        "edge_density": (s.grad_mag > 0.1).reshape(s.n, -1).mean(axis=1),
+    }
+
+
+def _vignetting(s: _Shared) -> Dict[str, np.ndarray]:
+    g = s.gray_u8
+    h3, w3 = s.h // 3, s.w // 3
+    h6, w6 = max(1, s.h // 6), max(1, s.w // 6)
+    center = _LINEAR_LUT[g[:, h3:s.h - h3, w3:s.w - w3]].mean(axis=(1, 2))
+    corners = np.stack([
+        _LINEAR_LUT[g[:, :h6, :w6]].mean(axis=(1, 2)),
+        _LINEAR_LUT[g[:, :h6, -w6:]].mean(axis=(1, 2)),
+        _LINEAR_LUT[g[:, -h6:, :w6]].mean(axis=(1, 2)),
+        _LINEAR_LUT[g[:, -h6:, -w6:]].mean(axis=(1, 2)),
+    ]).mean(axis=0)
+    return {"vignetting_stops": np.log2(np.maximum(center, _EPS) / np.maximum(corners, _EPS))}
+
+
+def _saturation(s: _Shared) -> Dict[str, np.ndarray]:
+    c = s.chroma.reshape(s.n, -1)
+    mean = c.mean(axis=1)
+    std = c.std(axis=1)
+    return {
+        "saturation_mean": mean,
+        "saturation_uniformity": 1.0 / (1.0 + std / np.maximum(mean, _EPS)),
+    }
+
+
+def _palette_entropy(s: _Shared) -> Dict[str, np.ndarray]:
+    # 4 x 8 x 8 Lab palette bins, entropy in bits (0..8)
+    lab = s.lab_u8
+    q = ((lab[..., 0] >> 6).astype(np.int32) << 6) | ((lab[..., 1] >> 5).astype(np.int32) << 3) | (lab[..., 2] >> 5)
+    counts = np.stack([np.bincount(f.ravel(), minlength=256) for f in q]).astype(np.float64)
+    p = counts / counts.sum(axis=1, keepdims=True)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ent = np.where(p > 0, p * np.log2(1.0 / p), 0.0).sum(axis=1)
+    return {"palette_entropy": ent}
+
+
+_GROUPS: Tuple[Tuple[str, Callable[[_Shared], Dict[str, np.ndarray]]], ...] = (
+    ("histogram_moments", _histogram_moments),
+    ("clipping", _clipping),
+    ("snr", _snr),
+    ("dynamic_range", _dynamic_range),
+    ("sharpness", _sharpness),
+    ("vignetting", _vignetting),
+    ("saturation", _saturation),
+    ("palette_entropy", _palette_entropy),
+)
+
+
+# ---------- engine ----------
+
+def as_stack(frames: Any) -> np.ndarray:
+    """Validate and return frames as an (N, H, W, 3) uint8 array; a single frame is promoted."""
+    arr = np.asarray(frames)
+    if arr.ndim == 3:
+        arr = arr[None]
+    if arr.ndim != 4 or arr.shape[-1] != 3 or arr.dtype != np.uint8:
+        raise ValueError(f"expected (N, H, W, 3) uint8 frames, got {arr.shape} {arr.dtype}")
+    return arr
+
+
+class MetricsEngine:
+    """
+    Computes METRIC_NAMES for (N, H, W, 3) uint8 BGR stacks in batches of
+    ``batch_size`` frames. ``timing`` accumulates seconds per intermediate and
+    metric group over the engine's lifetime.
+    """
+
+    version = ENGINE_VERSION
+    names = METRIC_NAMES
+
+    def __init__(self, batch_size: int = DEFAULTS["batch_size"]):
+        self.batch_size = max(1, int(batch_size))
+        self.timing: Dict[str, float] = {}
+
+    @classmethod
+    def from_config(cls, cfg: Optional[Mapping[str, Any]] = None) -> "MetricsEngine":
+        return cls(batch_size=int(metrics_options(cfg)["batch_size"]))
+
+    def compute(self, frames: np.ndarray) -> Dict[str, Any]:
+        frames = as_stack(frames)
+        n = frames.shape[0]
+        values = np.zeros((n, len(METRIC_NAMES)), dtype=np.float32)
+        col = {name: i for i, name in enumerate(METRIC_NAMES)}
+        timing: Dict[str, float] = {}
+        for a in range(0, n, self.batch_size):
+            shared = _Shared(np.ascontiguousarray(frames[a:a + self.batch_size]), timing)
+            for group, fn in _GROUPS:
+                t0 = time.perf_counter()
+                spent0 = shared.spent
+                for name, arr in fn(shared).items():
+                    values[a:a + shared.n, col[name]] = arr
+                # net of any intermediates this group was first to request
+                dt = time.perf_counter() - t0 - (shared.spent - spent0)
+                timing[group] = timing.get(group, 0.0) + dt
+
+        for key, sec in timing.items():
+            self.timing[key] = self.timing.get(key, 0.0) + sec
+        return {"version": ENGINE_VERSION, "names": list(METRIC_NAMES), "values": values, "timing": timing}
+
+
+def as_records(result: Mapping[str, Any]) -> List[Dict[str, float]]:
+    """Row-wise ``{metric: value}`` dicts, e.g. for JSON sidecars."""
+    names = list(result["names"])
+    return [{k: float(v) for k, v in zip(names, row)} for row in np.asarray(result["values"])]
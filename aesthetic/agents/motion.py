@@ -0,0 +1,279 @@
+from __future__ import annotations
+
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Mapping, Optional, Sequence, Tuple, Union
+
+import cv2
+import numpy as np
+
+from ..config import config_section
+from .ingest import read_frames
+from .workers import runtime_options, worker_count
+
+# Camera movement (AESTHETIC_Metric.md, "camera movement") from sparse,
+# coarse optical flow.
+#
+# Dense Farneback at full resolution over every frame of a reel is far too
+# slow on CPU, and the movement metrics only need the camera's global motion.
+# So per scene a handful of anchors are spread over its length; at each
+# anchor three frames (a, a+s, a+2s) are decoded straight to a small proxy
+# and Farneback runs on the two pairs, inside an ROI that drops letterbox
+# bars and the unreliable border. A robust similarity fit turns each flow
+# field into (dx, dy, zoom, roll, residual) -- the one shared intermediate
+# every movement metric below is a reduction of. Scenes are independent, so
+# they run on a thread pool (decode and Farneback both release the GIL), each
+# thread with its own decoder.
+#
+# Movement is a property of the scene, not of the frame: every candidate of a
+# scene gets its scene's values.
+
+MOTION_VERSION = "1"
+
+# scored columns appended to the metric matrix; descriptive figures (speed,
+# zoom, movement type) stay in the per-scene records
+MOTION_CATEGORIES: Dict[str, str] = {
+    "motion_smoothness": "movement",
+    "micro_jitter_pct": "movement",
+    "path_straightness": "movement",
+}
+MOTION_NAMES: Tuple[str, ...] = tuple(MOTION_CATEGORIES)
+MOVEMENT_TYPES: Tuple[str, ...] = ("static", "handheld", "pan", "tilt", "zoom_in", "zoom_out", "roll", "complex")
+
+PathLike = Union[str, Path]
+
+DEFAULTS: Dict[str, Any] = {
+    "enabled": True,
+    "flow_height": 180,        # proxy height flow runs at (a coarse pyramid level of the source)
+    "anchors_per_scene": 6,    # sparse sample points per scene
+    "pair_step": 2,            # frames between the frames of a pair
+    "roi_margin_pct": 0.06,    # border trimmed inside the picture area
+    "letterbox_luma": 16,      # rows / columns darker than this at the edges are bars
+    "grid_step": 4,            # proxy pixels between flow vectors used by the fit
+    "static_speed": 0.01,      # frame widths per second below which the camera is still
+    "workers": 0,              # scene threads; 0 = runtime workers
+}
+
+# Farneback at proxy size: few pyramid levels are enough once the image is small
+_FARNEBACK = dict(pyr_scale=0.5, levels=3, winsize=13, iterations=3, poly_n=5, poly_sigma=1.1, flags=0)
+
+
+def motion_options(cfg: Optional[Mapping[str, Any]] = None) -> Dict[str, Any]:
+    opts = dict(DEFAULTS)
+    opts.update(config_section(cfg, "motion"))
+    if not int(opts["workers"] or 0):
+        opts["workers"] = worker_count(runtime_options(cfg))
+    return opts
+
+
+# ---------- shared intermediates ----------
+
+def picture_roi(gray: np.ndarray, opts: Mapping[str, Any]) -> Tuple[int, int, int, int]:
+    """``(y0, y1, x0, x1)`` of the picture area minus letterbox bars and a margin."""
+    h, w = gray.shape
+    thr = float(opts["letterbox_luma"])
+    rows = np.flatnonzero(gray.mean(axis=1) > thr)
+    cols = np.flatnonzero(gray.mean(axis=0) > thr)
+    y0, y1 = (int(rows[0]), int(rows[-1]) + 1) if len(rows) else (0, h)
+    x0, x1 = (int(cols[0]), int(cols[-1]) + 1) if len(cols) else (0, w)
+    my = int((y1 - y0) * float(opts["roi_margin_pct"]))
+    mx = int((x1 - x0) * float(opts["roi_margin_pct"]))
+    if y1 - y0 - 2 * my < 16 or x1 - x0 - 2 * mx < 16:
+        return 0, h, 0, w
+    return y0 + my, y1 - my, x0 + mx, x1 - mx
+
+
+def fit_similarity(flow: np.ndarray, step: int) -> np.ndarray:
+    """
+    ``[dx, dy, zoom, roll, residual]`` of a flow field: translation in
+    frame widths, zoom and roll per unit of normalised radius, residual the
+    mean flow left after the camera model (subject motion). A refit
+    without vectors beyond twice the median residual keeps moving subjects
+    out of the camera estimate.
+    """
+    h, w = flow.shape[:2]
+    f = flow[::step, ::step].reshape(-1, 2) / float(w)
+    ys, xs = np.mgrid[0:h:step, 0:w:step]
+    x = ((xs.ravel() + 0.5) - w / 2.0) / float(w)
+    y = ((ys.ravel() + 0.5) - h / 2.0) / float(w)
+    keep = np.ones(len(f), dtype=bool)
+    for _ in range(2):
+        u, v, xx, yy = f[keep, 0], f[keep, 1], x[keep], y[keep]
+        xc, yc = xx - xx.mean(), yy - yy.mean()
+        uc, vc = u - u.mean(), v - v.mean()
+        r2 = max(float((xc * xc + yc * yc).sum()), 1e-12)
+        a = float((xc * uc + yc * vc).sum()) / r2
+        b = float((xc * vc - yc * uc).sum()) / r2
+        tx = float(u.mean() - a * xx.mean() + b * yy.mean())
+        ty = float(v.mean() - b * xx.mean() - a * yy.mean())
+        res = np.hypot(f[:, 0] - (tx + a * x - b * y), f[:, 1] - (ty + b * x + a * y))
+        keep = res <= max(2.0 * float(np.median(res)), 1e-6)
+    return np.array([tx, ty, a, b, float(res.mean())], dtype=np.float32)
+
+
+def scene_anchors(start: int, end: int, opts: Mapping[str, Any]) -> List[int]:
+    """First frame of each sampled triplet, spread evenly over the scene."""
+    span = 2 * max(1, int(opts["pair_step"]))
+    usable = end - start - span
+    if usable <= 0:
+        return []
+    k = max(1, min(int(opts["anchors_per_scene"]), usable))
+    return sorted({start + int((i + 0.5) * usable / k) for i in range(k)})
+
+
+def sample_scene(
+    source: PathLike,
+    scene: Mapping[str, Any],
+    opts: Mapping[str, Any],
+    keyframes: Optional[Sequence[int]] = None,
+) -> np.ndarray:
+    """(anchors, 2, 5) similarity fits of both pairs at every anchor; values per frame."""
+    s = max(1, int(opts["pair_step"]))
+    anchors = scene_anchors(int(scene["start_frame"]), int(scene["end_frame"]), opts)
+    wanted = sorted({a + k * s for a in anchors for k in range(3)})
+    gray: Dict[int, np.ndarray] = {}
+    for f, img in read_frames(source, wanted, analysis_height=int(opts["flow_height"]), keyframes=keyframes):
+        gray[f] = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    out = np.full((len(anchors), 2, 5), np.nan, dtype=np.float32)
+    roi: Optional[Tuple[int, int, int, int]] = None
+    grid = max(1, int(opts["grid_step"]))
+    for i, a in enumerate(anchors):
+        trip = [gray.get(a + k * s) for k in range(3)]
+        if any(t is None for t in trip):
+            continue
+        if roi is None:
+            roi = picture_roi(trip[0], opts)
+        y0, y1, x0, x1 = roi
+        for p in range(2):
+            flow = cv2.calcOpticalFlowFarneback(trip[p][y0:y1, x0:x1], trip[p + 1][y0:y1, x0:x1], None, **_FARNEBACK)
+            fit = fit_similarity(flow, grid)
+            # widths of the ROI back to widths of the frame, then per frame
+            fit[:2] *= (x1 - x0) / float(trip[p].shape[1])
+            out[i, p] = fit / s
+    return out[~np.isnan(out).any(axis=(1, 2))]
+
+
+# ---------- metrics ----------
+
+def scene_motion(samples: np.ndarray, anchors_gap: float, fps: float, opts: Mapping[str, Any]) -> Dict[str, Any]:
+    """
+    Movement figures of one scene from its (anchors, 2, 5) samples. Scenes
+    without samples (too short) count as a locked-off camera.
+    """
+    fps = fps or 24.0
+    if len(samples) == 0:
+        return {
+            "values": {"motion_smoothness": 1.0, "micro_jitter_pct": 0.0, "path_straightness": 1.0},
+            "speed": 0.0, "zoom": 0.0, "roll": 0.0, "subject": 0.0, "type": "static", "anchors": 0,
+        }
+    v1, v2 = samples[:, 0, :2], samples[:, 1, :2]
+    vel = 0.5 * (v1 + v2)                                   # widths per frame, per anchor
+    speed = float(np.linalg.norm(vel, axis=1).mean())
+    # short-term: velocity change inside a triplet is shake, not a move
+    jitter = float(np.linalg.norm(v2 - v1, axis=1).mean())
+    # long-term: velocity change between anchors, relative to the move itself
+    if len(vel) > 1:
+        jerk = float(np.linalg.norm(np.diff(vel, axis=0), axis=1).mean())
+        smooth = 1.0 / (1.0 + jerk / (speed + 0.002))
+    else:
+        smooth = 1.0
+    seg = vel * float(anchors_gap)
+    path = float(np.linalg.norm(seg, axis=1).sum())
+    straight = float(np.linalg.norm(seg.sum(axis=0)) / path) if path > 1e-3 else 1.0
+    zoom = float(samples[:, :, 2].mean())
+    roll = float(samples[:, :, 3].mean())
+    subject = float(samples[:, :, 4].mean())
+    return {
+        "values": {
+            "motion_smoothness": smooth,
+            "micro_jitter_pct": 100.0 * jitter,
+            "path_straightness": straight,
+        },
+        "speed": speed * fps,
+        "zoom": zoom * fps,
+        "roll": roll * fps,
+        "subject": subject * fps,
+        "type": movement_type(vel, zoom, roll, jitter, fps, opts),
+        "anchors": int(len(samples)),
+    }
+
+
+def movement_type(vel: np.ndarray, zoom: float, roll: float, jitter: float, fps: float, opts: Mapping[str, Any]) -> str:
+    """Rule-based tag, one of MOVEMENT_TYPES."""
+    still = float(opts["static_speed"]) / fps
+    mean_v = vel.mean(axis=0)
+    speed = float(np.linalg.norm(mean_v))
+    if max(speed, abs(zoom), abs(roll)) < still:
+        return "handheld" if jitter > still else "static"
+    if jitter > speed:
+        # shake outweighs any net move
+        return "handheld"
+    if abs(zoom) > speed and abs(zoom) > abs(roll):
+        return "zoom_in" if zoom > 0 else "zoom_out"
+    if abs(roll) > speed:
+        return "roll"
+    dx, dy = abs(float(mean_v[0])), abs(float(mean_v[1]))
+    if dx > 2.0 * dy:
+        return "pan"
+    if dy > 2.0 * dx:
+        return "tilt"
+    return "complex"
+
+
+def analyze_motion(
+    source: PathLike,
+    scenes: Sequence[Mapping[str, Any]],
+    fps: float,
+    cfg: Optional[Mapping[str, Any]] = None,
+    keyframes: Optional[Sequence[int]] = None,
+    progress: Optional[Callable[[float], None]] = None,
+) -> Dict[str, Any]:
+    """
+    Per-scene movement records (``scenes``: scene id -> figures) for the
+    whole source, plus ``timing`` and the number of flow pairs computed.
+    """
+    opts = motion_options(cfg)
+    t0 = time.perf_counter()
+    records: Dict[int, Dict[str, Any]] = {}
+    pairs = 0
+    workers = max(1, min(int(opts["workers"]), len(scenes)))
+
+    def one(sc: Mapping[str, Any]) -> Tuple[int, Dict[str, Any], int]:
+        samples = sample_scene(source, sc, opts, keyframes)
+        anchors = scene_anchors(int(sc["start_frame"]), int(sc["end_frame"]), opts)
+        gap = float(np.diff(anchors).mean()) if len(anchors) > 1 else 0.0
+        return int(sc["id"]), scene_motion(samples, gap, fps, opts), 2 * len(samples)
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="aesthetic-motion") as pool:
+        futures = [pool.submit(one, sc) for sc in scenes]
+        try:
+            for fut in as_completed(futures):
+                sid, rec, n = fut.result()
+                records[sid] = rec
+                pairs += n
+                if progress is not None:
+                    progress(len(records) / len(scenes))
+        except BaseException:
+            for fut in futures:
+                fut.cancel()
+            raise
+    return {
+        "ok": True,
+        "version": MOTION_VERSION,
+        "scenes": {str(k): records[k] for k in sorted(records)},
+        "pairs": pairs,
+        "workers": workers,
+        "seconds": round(time.perf_counter() - t0, 4),
+    }
+
+
+def motion_columns(result: Mapping[str, Any], candidate_scene: np.ndarray) -> np.ndarray:
+    """(N, len(MOTION_NAMES)) matrix giving every candidate its scene's movement values."""
+    recs = result.get("scenes", {})
+    uniq, inv = np.unique(np.asarray(candidate_scene, dtype=np.int64), return_inverse=True)
+    table = np.array(
+        [[float(recs.get(str(int(s)), {}).get("values", {}).get(n, np.nan)) for n in MOTION_NAMES] for s in uniq],
+        dtype=np.float32,
+    ).reshape(len(uniq), len(MOTION_NAMES))
+    return table[inv.reshape(-1)]
@@ -1 +1,193 @@
-# TODO: per-scene candidate sampling
+from __future__ import annotations
+
+import math
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Mapping, Optional, Sequence, Tuple, Union
+
+import cv2
+import numpy as np
+
+from ..config import config_section
+from ..models.job import CandidateTable
+from .ingest import read_frames
+
+# Candidate sampling: scenes -> planned frames -> proxy pre-filter -> kept.
+#
+# All candidate frames of a job are planned up front (even slots per scene,
+# seeded jitter, a minimum gap, no frames hugging a cut) and then decoded in
+# one sorted forward pass, seeking only where the keyframe index says it pays.
+# That pass decodes straight to proxy_height and nothing larger is kept: each
+# frame is judged on its luma proxy, black and blurred frames are rejected,
+# and of the rest only the best per_scene_keep_pct per scene is kept. Only
+# survivors are ever decoded at full resolution, once, by the metrics stage.
+
+PathLike = Union[str, Path]
+ProgressFn = Callable[[float], None]
+
+DEFAULTS: Dict[str, Any] = {
+    "per_scene_candidates": 9,
+    "per_scene_keep_pct": 0.4,   # share of each scene's planned frames kept after the pre-filter
+    "min_gap_frames": 6,         # planned frames in one scene are at least this far apart
+    "jitter": 0.25,              # +- share of a slot a frame may move off its slot centre
+    "edge_margin_pct": 0.05,     # skip this share of the scene at both ends (dissolves, cut frames)
+    "prefilter": True,
+    "proxy_height": 144,
+    "black_luma": 0.06,          # mean luma (0..1) below this is a black frame
+    "min_sharpness": 4.0,        # proxy Laplacian variance below this is blurred
+    "seek_gap": 250,             # without a keyframe index: frames decoded through before seeking
+    "seed": 42,
+}
+
+
+def sampling_options(cfg: Optional[Mapping[str, Any]] = None) -> Dict[str, Any]:
+    opts = dict(DEFAULTS)
+    extract = config_section(cfg, "extract")
+    for k in ("per_scene_candidates", "per_scene_keep_pct"):
+        if k in extract:
+            opts[k] = extract[k]
+    runtime = config_section(cfg, "runtime")
+    if "seed" in runtime:
+        opts["seed"] = runtime["seed"]
+    opts.update(config_section(cfg, "sampling"))
+    return opts
+
+
+# ---------- planning ----------
+
+def plan_scene(start: int, end: int, opts: Mapping[str, Any], rng: np.random.Generator) -> List[int]:
+    """Planned frame indices inside one scene [start, end)."""
+    length = max(1, end - start)
+    margin = int(length * float(opts["edge_margin_pct"]))
+    a, b = start + margin, max(start + margin + 1, end - margin)
+    usable = b - a
+    gap = max(1, int(opts["min_gap_frames"]))
+    k = max(1, min(int(opts["per_scene_candidates"]), 1 + (usable - 1) // gap))
+    slot = usable / k
+    centres = a + (np.arange(k) + 0.5) * slot
+    jitter = float(opts["jitter"]) * slot
+    if jitter > 0:
+        centres = centres + rng.uniform(-jitter, jitter, size=k)
+    frames = np.clip(np.round(centres).astype(np.int64), a, b - 1)
+    out: List[int] = []
+    for f in np.sort(frames).tolist():
+        if not out or f - out[-1] >= gap:
+            out.append(int(f))
+    return out
+
+
+def plan_candidates(
+    scenes: Sequence[Mapping[str, Any]], opts: Mapping[str, Any], fps: float
+) -> CandidateTable:
+    """Every planned candidate of a job, in file order, with sequential ids."""
+    scene_ids: List[int] = []
+    frames: List[int] = []
+    for sc in scenes:
+        # seeded per scene so a scene's plan does not shift when others change
+        rng = np.random.default_rng([int(opts["seed"]), int(sc["id"])])
+        planned = plan_scene(int(sc["start_frame"]), int(sc["end_frame"]), opts, rng)
+        frames.extend(planned)
+        scene_ids.extend([int(sc["id"])] * len(planned))
+    return CandidateTable.from_columns(scene_ids, frames, fps)
+
+
+# ---------- pre-filter ----------
+
+def proxy_stats(frame: np.ndarray, proxy_height: int) -> Tuple[float, float]:
+    """``(mean luma 0..1, Laplacian variance)`` of a small luma proxy."""
+    h, w = frame.shape[:2]
+    if proxy_height and h > proxy_height:
+        frame = cv2.resize(frame, (max(2, round(w * proxy_height / h)), proxy_height), interpolation=cv2.INTER_AREA)
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    lap = cv2.Laplacian(gray, cv2.CV_32F)
+    return float(gray.mean()) / 255.0, float(lap.var())
+
+
+def judge(
+    scene: np.ndarray, luma: np.ndarray, sharp: np.ndarray, opts: Mapping[str, Any]
+) -> Tuple[np.ndarray, Dict[str, int]]:
+    """
+    Keep mask over planned candidates. Black and blurred frames are rejected;
+    survivors are ranked by proxy quality and the top per_scene_keep_pct of
+    each scene's plan is kept. Every scene keeps at least one frame.
+    """
+    black = luma < float(opts["black_luma"])
+    blur = ~black & (sharp < float(opts["min_sharpness"]))
+    ok = ~(black | blur)
+    quality = np.log1p(np.maximum(sharp, 0.0)) * (1.0 - np.minimum(np.abs(luma - 0.45) / 0.45, 1.0))
+    # rejected frames sort after every survivor but still rank for the fallback
+    rank_key = np.where(ok, quality, quality - 1e6)
+    keep = np.zeros(len(scene), dtype=bool)
+    order = np.lexsort((-rank_key, scene))
+    pct = float(opts["per_scene_keep_pct"])
+    i = 0
+    while i < len(order):
+        j = i
+        while j < len(order) and scene[order[j]] == scene[order[i]]:
+            j += 1
+        idx = order[i:j]
+        quota = max(1, math.ceil(len(idx) * pct))
+        chosen = idx[ok[idx]][:quota]
+        keep[chosen if len(chosen) else idx[:1]] = True
+        i = j
+    return keep, {"rejected_black": int(black.sum()), "rejected_blur": int(blur.sum())}
+
+
+def sample_candidates(
+    source: PathLike,
+    scenes: Sequence[Mapping[str, Any]],
+    fps: float,
+    opts: Mapping[str, Any],
+    *,
+    stats: Optional[Mapping[str, Sequence[float]]] = None,
+    keyframes: Optional[Sequence[int]] = None,
+    progress: Optional[ProgressFn] = None,
+) -> Tuple[CandidateTable, Dict[str, Any]]:
+    """
+    Plan, pre-filter and return the kept candidates (ids renumbered) plus
+    stats. ``stats`` are proxy figures from an earlier run (``frames``,
+    ``luma``, ``sharp``); only planned frames they do not cover are decoded,
+    in one pass and at proxy size.
+    """
+    plan = plan_candidates(scenes, opts, fps)
+    info: Dict[str, Any] = {"planned": len(plan), "decoded": 0, "rejected_black": 0, "rejected_blur": 0}
+    if not plan or not opts.get("prefilter", True):
+        info["kept"] = len(plan)
+        return plan, info
+
+    frames = plan.frame
+    scene = plan.scene_id
+    luma = np.full(len(plan), np.nan, dtype=np.float32)
+    sharp = np.full(len(plan), np.nan, dtype=np.float32)
+    if stats is not None:
+        known = dict(zip((int(f) for f in stats.get("frames", [])), zip(stats.get("luma", []), stats.get("sharp", []))))
+        for i, f in enumerate(frames.tolist()):
+            if f in known:
+                luma[i], sharp[i] = known[f]
+
+    if np.isnan(luma).any():
+        # one forward pass decoded straight to the proxy; nothing is held
+        todo = np.isnan(luma)
+        pos = {f: i for i, f in enumerate(frames.tolist())}
+        proxy_h = int(opts["proxy_height"])
+        proxies = read_frames(
+            source,
+            frames[todo].tolist(),
+            analysis_height=proxy_h,
+            seek_gap=int(opts["seek_gap"]),
+            keyframes=keyframes,
+        )
+        for f, img in proxies:
+            i = pos[f]
+            luma[i], sharp[i] = proxy_stats(img, proxy_h)
+            info["decoded"] += 1
+            if progress is not None:
+                progress(info["decoded"] / int(todo.sum()))
+        # frames the decoder never reached (truncated file) count as black
+        missing = np.isnan(luma)
+        luma[missing], sharp[missing] = 0.0, 0.0
+
+    keep, rejected = judge(scene, luma, sharp, opts)
+    info.update(rejected)
+    info["kept"] = int(keep.sum())
+    info["proxy"] = {"frames": frames.tolist(), "luma": luma.tolist(), "sharp": sharp.tolist()}
+    return plan.take(np.flatnonzero(keep), renumber=True), info
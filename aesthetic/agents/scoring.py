@@ -0,0 +1,216 @@
+from __future__ import annotations
+
+from typing import Any, Dict, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .detection import DETECTION_CATEGORIES
+from .metrics import METRIC_CATEGORIES
+from .motion import MOTION_CATEGORIES
+
+# Raw metric values -> 0..100 quality scores -> category roll-ups -> total.
+#
+# Each metric maps onto 0..100 with one of three shapes:
+#   up      linear from a (0) to b (100)
+#   down    linear from a (100) to b (0)
+#   target  100 at a, falling to 0 at distance b
+# Everything is evaluated column-wise over an (N, M) matrix.
+
+CATEGORIES: Tuple[str, ...] = (
+    "exposure", "lighting", "composition", "movement", "color", "quality", "narrative",
+)
+PILLARS: Tuple[str, ...] = ("technical", "creative", "subjective")
+
+# frame metrics from the engine, saliency / face columns, per-scene movement columns
+COLUMN_CATEGORIES: Dict[str, str] = {**METRIC_CATEGORIES, **DETECTION_CATEGORIES, **MOTION_CATEGORIES}
+
+# every metric the engine ships today is Technical; Creative and Subjective
+# columns arrive with the baseline and MOS models
+METRIC_PILLARS: Dict[str, str] = {name: "technical" for name in COLUMN_CATEGORIES}
+
+NORMALIZATION: Dict[str, Tuple[str, float, float]] = {
+    "luma_mean": ("target", 0.45, 0.35),
+    "luma_median": ("target", 0.45, 0.35),
+    "luma_std": ("up", 0.05, 0.25),
+    "luma_skew": ("target", 0.0, 2.0),
+    "luma_kurtosis": ("target", 0.0, 4.0),
+    "clip_highlights_pct": ("down", 0.0, 5.0),
+    "clip_shadows_pct": ("down", 0.0, 5.0),
+    "moment3_18gray": ("target", 0.0, 0.02),
+    "snr_luma_db": ("up", 20.0, 45.0),
+    "snr_chroma_db": ("up", 20.0, 45.0),
+    "dynamic_range_stops": ("up", 3.0, 9.0),
+    "laplacian_var": ("up_log", 1.0, 3.0),   # log10 of the variance
+    "edge_density": ("up", 0.0, 0.15),
+    "vignetting_stops": ("target", 0.0, 1.5),
+    "saturation_mean": ("target", 25.0, 25.0),
+    "saturation_uniformity": ("up", 0.3, 0.9),
+    "palette_entropy": ("up", 2.0, 6.0),
+    "subject_thirds_dist": ("down", 0.0, 0.25),   # frame units from the nearest thirds point
+    "headroom_pct": ("target", 8.0, 12.0),        # % of frame height above the subject
+    "occupancy_pct": ("target", 20.0, 20.0),      # salient share of the frame
+    "saliency_consistency": ("up", 0.2, 0.9),     # correlation with the scene's mean map
+    "motion_smoothness": ("up", 0.3, 0.9),
+    "micro_jitter_pct": ("down", 0.02, 0.4),  # % of frame width per frame
+    "path_straightness": ("up", 0.3, 0.95),
+}
+
+
+def normalize(values: np.ndarray, names: Sequence[str]) -> np.ndarray:
+    """(N, M) raw metrics -> (N, M) scores in 0..100; unknown metrics become NaN."""
+    v = np.asarray(values, dtype=np.float32)
+    m = len(names)
+    kind = np.array([NORMALIZATION.get(n, ("none", 0.0, 1.0))[0] for n in names])
+    a = np.array([NORMALIZATION.get(n, ("none", 0.0, 1.0))[1] for n in names], dtype=np.float32)
+    b = np.array([NORMALIZATION.get(n, ("none", 0.0, 1.0))[2] for n in names], dtype=np.float32)
+    if v.shape[-1] != m:
+        raise ValueError(f"values have {v.shape[-1]} columns, expected {m}")
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        logv = np.log10(np.maximum(v, 1e-6))
+        up = (v - a) / (b - a)
+        up_log = (logv - a) / (b - a)
+        down = 1.0 - up
+        target = 1.0 - np.abs(v - a) / b
+    out = np.select(
+        [kind == "up", kind == "up_log", kind == "down", kind == "target"],
+        [up, up_log, down, target],
+        default=np.nan,
+    )
+    return (np.clip(out, 0.0, 1.0) * 100.0).astype(np.float32)
+
+
+def category_matrix(names: Sequence[str]) -> np.ndarray:
+    """(M, C) 0/1 membership of each metric column in each category."""
+    mat = np.zeros((len(names), len(CATEGORIES)), dtype=np.float32)
+    col = {c: i for i, c in enumerate(CATEGORIES)}
+    for i, n in enumerate(names):
+        cat = COLUMN_CATEGORIES.get(n)
+        if cat in col:
+            mat[i, col[cat]] = 1.0
+    return mat
+
+
+def active_pillars(names: Sequence[str]) -> Tuple[str, ...]:
+    """Pillars with at least one column in ``names``, in PILLARS order."""
+    present = {METRIC_PILLARS.get(n, "technical") for n in names if n in COLUMN_CATEGORIES}
+    return tuple(p for p in PILLARS if p in present)
+
+
+def metric_weights(
+    names: Sequence[str],
+    category_weights: Optional[Mapping[str, float]] = None,
+    pillar_weights: Optional[Mapping[str, float]] = None,
+) -> np.ndarray:
+    """
+    (M,) weights folding pillar and category weights down to metric columns.
+    Within a pillar each category's weight is split evenly over its metrics,
+    so a pillar score is the weighted mean of its category means regardless
+    of how many metrics a category has. Pillar weights then blend the pillars
+    that have columns: each gets its weight's share of the total. Weights of
+    pillars without columns are ignored, and if every present pillar is
+    weighted 0 they count equally. Normalised to sum to 1 (all zero category
+    weights stay all zeros).
+    """
+    member = category_matrix(names)
+    counts = member.sum(axis=0)
+    cw = np.array([float((category_weights or {}).get(c, 1.0)) for c in CATEGORIES], dtype=np.float32)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        per_metric = np.maximum(member @ np.where(counts > 0, cw / counts, 0.0), 0.0)
+    pillar_of = np.array([METRIC_PILLARS.get(n, "technical") for n in names])
+    parts: Dict[str, np.ndarray] = {}
+    for p in active_pillars(names):
+        part = np.where(pillar_of == p, per_metric, 0.0)
+        if part.sum() > 0:
+            parts[p] = part / part.sum()
+    if not parts:
+        return np.zeros(len(names), dtype=np.float32)
+    share = {p: max(0.0, float((pillar_weights or {}).get(p, 1.0))) for p in parts}
+    total = sum(share.values())
+    if total <= 0:
+        share, total = {p: 1.0 for p in parts}, float(len(parts))
+    w = sum(parts[p] * (share[p] / total) for p in parts)
+    return np.asarray(w, dtype=np.float32)
+
+
+def rollup(
+    scores: np.ndarray,
+    names: Sequence[str],
+    category_weights: Optional[Mapping[str, float]] = None,
+    pillar_weights: Optional[Mapping[str, float]] = None,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Category means (N, C) and weighted totals (N,) from normalised scores.
+    NaN scores are skipped: they drop out of their category mean and the
+    total is re-weighted over the remaining metrics. Categories without any
+    valid metric are NaN.
+    """
+    ranker = Ranker.from_scores(scores, names)
+    return ranker.categories, ranker.totals(category_weights, pillar_weights)
+
+
+class Ranker:
+    """
+    One job's normalised (candidates x metrics) matrix with its category
+    roll-up precomputed; a weight change is a single matrix-vector product.
+    """
+
+    def __init__(self, values: np.ndarray, names: Sequence[str]):
+        self._init(normalize(values, names), names)
+
+    @classmethod
+    def from_scores(cls, scores: np.ndarray, names: Sequence[str]) -> "Ranker":
+        obj = cls.__new__(cls)
+        obj._init(np.asarray(scores, dtype=np.float32), names)
+        return obj
+
+    def _init(self, scores: np.ndarray, names: Sequence[str]) -> None:
+        self.names = list(names)
+        valid = ~np.isnan(scores)
+        self.scores = np.ascontiguousarray(np.nan_to_num(scores, nan=0.0), dtype=np.float32)
+        # None when every score is valid: totals stay one matrix-vector product
+        self._valid = None if valid.all() else valid.astype(np.float32)
+        member = category_matrix(self.names)
+        counts = valid.astype(np.float32) @ member
+        with np.errstate(invalid="ignore", divide="ignore"):
+            cats = (self.scores @ member) / counts
+        cats[counts == 0] = np.nan
+        self.categories = cats
+
+    def totals(
+        self,
+        category_weights: Optional[Mapping[str, float]] = None,
+        pillar_weights: Optional[Mapping[str, float]] = None,
+    ) -> np.ndarray:
+        w = metric_weights(self.names, category_weights, pillar_weights)
+        totals = self.scores @ w
+        if self._valid is None:
+            return totals
+        den = self._valid @ w
+        return np.divide(totals * w.sum(), den, out=np.zeros_like(totals), where=den > 0)
+
+
+def split_weights(weights: Optional[Mapping[str, Any]]) -> Tuple[Dict[str, float], Dict[str, float]]:
+    """
+    ``(category_weights, pillar_weights)`` from either nested
+    ``{"categories": {...}, "pillars": {...}}`` or a flat mapping whose keys
+    are category or pillar names. Unknown keys and non-numbers are ignored.
+    """
+    cats: Dict[str, float] = {}
+    pillars: Dict[str, float] = {}
+    if not isinstance(weights, Mapping):
+        return cats, pillars
+    flat: Dict[str, Any] = {}
+    for k, v in weights.items():
+        if k in ("categories", "pillars") and isinstance(v, Mapping):
+            flat.update(v)
+        else:
+            flat[k] = v
+    for k, v in flat.items():
+        if not isinstance(v, (int, float)) or isinstance(v, bool):
+            continue
+        if k in CATEGORIES:
+            cats[k] = float(v)
+        elif k in PILLARS:
+            pillars[k] = float(v)
+    return cats, pillars
@@ -1 +1,264 @@
-# TODO: global selection and diversity
+from __future__ import annotations
+
+import heapq
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+import numpy as np
+
+from ..config import config_section
+from .signatures import PHashIndex, hamming
+
+# Global selection (P7): near-duplicate collapse -> overclustering ->
+# facility-location greedy with dedupe.
+#
+# The objective for a selected set S is
+#
+#   F(S) = quality_weight * sum_{j in S} q_j + sum_c w_c * max_{j in S} sim(c, j)
+#
+# where c runs over k-means centroids of the candidate embeddings ("clients"
+# weighted by cluster size) instead of over all candidates, so coverage costs
+# O(C) per evaluation and nothing is ever N x N. F is monotone submodular, so
+# lazy greedy (stale upper bounds in a heap) returns the same picks as plain
+# greedy while re-evaluating only a handful of candidates per step.
+#
+# Everything that does not depend on weights (groups, clusters, initial
+# coverage gains) is computed once per job by Selector; a re-rank only pays
+# for the heap.
+#
+# With a layout vector per candidate (agents.detection: where the saliency
+# and the faces sit) clustering and coverage run on the embedding joined with
+# the layout, so two frames with the same palette but a different framing or
+# shot scale count as different; dedupe stays on pHash and embedding.
+#
+# ``exclude`` marks candidates that duplicate heroes already exported from
+# other reels (storage.signature_index); they never enter the pool.
+
+DEFAULTS: Dict[str, Any] = {
+    "per_scene_keep_pct": 1.0,   # best share of each scene's candidates entering the pool
+                                 # (sampling already keeps extract.per_scene_keep_pct)
+    "max_per_scene": 1,          # shots drawn from one scene
+    "quality_weight": 1.0,       # score term vs. coverage term in F
+    "clusters_per_shot": 8,      # overclustering: centroids per requested shot
+    "min_clusters": 64,
+    "kmeans_iters": 8,
+    "dedupe_hamming": 4,         # pHash bits; at or below is a near-duplicate
+    "dedupe_cosine": 0.97,       # embedding cosine; above is a near-duplicate
+    "layout_weight": 0.5,        # share of the layout vector in the diversity features
+    "dedupe_prior_heroes": True, # drop pHash near-duplicates of heroes exported from earlier reels
+    "seed": 42,
+}
+
+_CHUNK = 8192  # candidates per similarity block
+
+
+def selection_options(cfg: Optional[Mapping[str, Any]] = None) -> Dict[str, Any]:
+    opts = dict(DEFAULTS)
+    runtime = config_section(cfg, "runtime")
+    if "seed" in runtime:
+        opts["seed"] = runtime["seed"]
+    opts.update(config_section(cfg, "selection"))
+    return opts
+
+
+def kmeans(x: np.ndarray, k: int, iters: int = 8, seed: int = 0) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Spherical k-means on unit rows: ``(centroids (k, D), labels (N,))``.
+    Assignment runs in blocks, so memory is O(k * _CHUNK) rather than O(N * k).
+    """
+    n = len(x)
+    k = max(1, min(int(k), n))
+    rng = np.random.default_rng(seed)
+    cent = x[rng.choice(n, size=k, replace=False)].copy()
+    labels = np.zeros(n, dtype=np.int64)
+    for _ in range(max(1, int(iters))):
+        for a in range(0, n, _CHUNK):
+            labels[a:a + _CHUNK] = np.argmax(x[a:a + _CHUNK] @ cent.T, axis=1)
+        sums = np.zeros_like(cent)
+        np.add.at(sums, labels, x)
+        counts = np.bincount(labels, minlength=k)
+        empty = counts == 0
+        if empty.any():
+            # reseed empty clusters on random points so k stays meaningful
+            sums[empty] = x[rng.choice(n, size=int(empty.sum()), replace=False)]
+        norm = np.linalg.norm(sums, axis=1, keepdims=True)
+        cent = (sums / np.maximum(norm, 1e-6)).astype(np.float32)
+    for a in range(0, n, _CHUNK):
+        labels[a:a + _CHUNK] = np.argmax(x[a:a + _CHUNK] @ cent.T, axis=1)
+    return cent, labels
+
+
+def keep_per_scene(total: np.ndarray, scene: np.ndarray, keep_pct: float) -> np.ndarray:
+    """Mask of the best ``keep_pct`` of each scene's candidates (at least one per scene)."""
+    n = len(total)
+    if n == 0:
+        return np.zeros(0, dtype=bool)
+    order = np.lexsort((-total, scene))
+    s = scene[order]
+    start = np.concatenate(([True], s[1:] != s[:-1]))
+    run_id = np.cumsum(start) - 1
+    run_start = np.flatnonzero(start)
+    rank = np.arange(n) - run_start[run_id]
+    size = np.diff(np.append(run_start, n))[run_id]
+    keep = np.zeros(n, dtype=bool)
+    keep[order] = rank < np.maximum(1, np.ceil(size * float(keep_pct)))
+    return keep
+
+
+def best_per_group(total: np.ndarray, groups: np.ndarray, mask: np.ndarray) -> np.ndarray:
+    """Restrict ``mask`` to the highest-scoring member of each group."""
+    idx = np.flatnonzero(mask)
+    if len(idx) == 0:
+        return mask
+    order = idx[np.lexsort((-total[idx], groups[idx]))]
+    g = groups[order]
+    first = order[np.concatenate(([True], g[1:] != g[:-1]))]
+    out = np.zeros_like(mask)
+    out[first] = True
+    return out
+
+
+class Selector:
+    """
+    Weight-independent state for one job's candidate pool.
+
+    ``embed`` is (N, D) unit vectors and ``phash`` (N,) uint64, as produced by
+    agents.signatures; ``scene`` is each candidate's scene id; ``layout`` is
+    optional (N, L) unit vectors from agents.detection; ``exclude`` an
+    optional (N,) mask of candidates kept out of the pool.
+    """
+
+    def __init__(
+        self,
+        embed: np.ndarray,
+        phash: np.ndarray,
+        scene: np.ndarray,
+        opts: Optional[Mapping[str, Any]] = None,
+        layout: Optional[np.ndarray] = None,
+        exclude: Optional[np.ndarray] = None,
+    ):
+        self.opts = dict(DEFAULTS)
+        self.opts.update(opts or {})
+        self.embed = np.ascontiguousarray(embed, dtype=np.float32)
+        self.phash = np.ascontiguousarray(phash, dtype=np.uint64)
+        self.scene = np.asarray(scene, dtype=np.int64)
+        self.exclude = np.asarray(exclude, dtype=bool) if exclude is not None and len(exclude) == len(self.scene) else None
+        self.features = self.embed
+        w = float(self.opts["layout_weight"])
+        if layout is not None and len(layout) == len(self.embed) and w > 0:
+            joined = np.hstack([self.embed * np.sqrt(1.0 - min(w, 1.0)), np.asarray(layout, dtype=np.float32) * np.sqrt(min(w, 1.0))])
+            norm = np.linalg.norm(joined, axis=1, keepdims=True)
+            self.features = np.ascontiguousarray(joined / np.maximum(norm, 1e-6), dtype=np.float32)
+        self._groups: Optional[np.ndarray] = None
+        self._clients: Optional[Tuple[np.ndarray, np.ndarray]] = None
+        self._cover0: Optional[np.ndarray] = None
+
+    def __len__(self) -> int:
+        return len(self.scene)
+
+    # ---------- per-job precomputation ----------
+
+    @property
+    def groups(self) -> np.ndarray:
+        """Near-duplicate group per candidate from the bucketed pHash index."""
+        if self._groups is None:
+            self._groups = PHashIndex(self.phash, int(self.opts["dedupe_hamming"])).groups()
+        return self._groups
+
+    def clients(self, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Overclustered ``(centroids, weights)``; rebuilt only when ``k`` needs more clusters."""
+        n_clusters = min(len(self), max(int(self.opts["min_clusters"]), int(self.opts["clusters_per_shot"]) * k))
+        if self._clients is None or len(self._clients[0]) < n_clusters:
+            cent, labels = kmeans(self.features, n_clusters, int(self.opts["kmeans_iters"]), int(self.opts["seed"]))
+            w = np.bincount(labels, minlength=len(cent)).astype(np.float32)
+            self._clients = (cent, w / max(1.0, float(w.sum())))
+            self._cover0 = None
+        return self._clients
+
+    def _coverage(self, cent: np.ndarray, w: np.ndarray) -> np.ndarray:
+        """Gain of each candidate against an empty selection, in blocks."""
+        if self._cover0 is None:
+            out = np.empty(len(self), dtype=np.float32)
+            for a in range(0, len(self), _CHUNK):
+                sim = np.maximum(self.features[a:a + _CHUNK] @ cent.T, 0.0)
+                out[a:a + _CHUNK] = sim @ w
+            self._cover0 = out
+        return self._cover0
+
+    # ---------- selection ----------
+
+    def select(self, total: np.ndarray, k: int) -> Tuple[np.ndarray, Dict[str, Any]]:
+        """
+        Up to ``k`` candidate indices in pick order, plus stats. If dedupe
+        leaves fewer than ``k`` the best remaining candidates fill the gap
+        (``degraded`` in stats) so the UI always gets its shot count.
+        """
+        n = len(self)
+        k = int(k)
+        if n == 0 or k <= 0:
+            return np.zeros(0, dtype=np.int64), {"pool": 0, "clusters": 0, "evaluations": 0, "degraded": False}
+        total = np.nan_to_num(np.asarray(total, dtype=np.float32), nan=0.0)
+        q = total / 100.0
+
+        pool = keep_per_scene(total, self.scene, float(self.opts["per_scene_keep_pct"]))
+        if self.exclude is not None:
+            pool &= ~self.exclude
+        pool = best_per_group(total, self.groups, pool)
+        cent, w = self.clients(k)
+        cover0 = self._coverage(cent, w)
+
+        lam = float(self.opts["quality_weight"])
+        max_per_scene = max(1, int(self.opts["max_per_scene"]))
+        max_ham = int(self.opts["dedupe_hamming"])
+        max_cos = float(self.opts["dedupe_cosine"])
+
+        idx = np.flatnonzero(pool)
+        heap = list(zip((-(lam * q[idx] + cover0[idx])).tolist(), idx.tolist()))
+        heapq.heapify(heap)
+        cur = np.zeros(len(cent), dtype=np.float32)
+        picked: List[int] = []
+        per_scene: Dict[int, int] = {}
+        evaluations = 0
+
+        while heap and len(picked) < k:
+            neg, j = heapq.heappop(heap)
+            if per_scene.get(int(self.scene[j]), 0) >= max_per_scene:
+                continue
+            if picked:
+                sel = np.asarray(picked)
+                if (hamming(self.phash[sel], self.phash[j]) <= max_ham).any():
+                    continue
+                if float((self.embed[sel] @ self.embed[j]).max()) > max_cos:
+                    continue
+            sim = np.maximum(cent @ self.features[j], 0.0)
+            gain = lam * float(q[j]) + float(np.maximum(sim - cur, 0.0) @ w)
+            evaluations += 1
+            if heap and gain < -heap[0][0] - 1e-9:
+                heapq.heappush(heap, (-gain, j))
+                continue
+            picked.append(j)
+            per_scene[int(self.scene[j])] = per_scene.get(int(self.scene[j]), 0) + 1
+            np.maximum(cur, sim, out=cur)
+
+        degraded = False
+        if len(picked) < k:
+            # fill from the full candidate list by score, one per scene where possible
+            taken = set(picked)
+            for j in np.argsort(-total, kind="stable").tolist():
+                if len(picked) >= k:
+                    break
+                if j in taken or per_scene.get(int(self.scene[j]), 0) >= max_per_scene:
+                    continue
+                picked.append(j)
+                taken.add(j)
+                per_scene[int(self.scene[j])] = per_scene.get(int(self.scene[j]), 0) + 1
+                degraded = True
+
+        stats = {
+            "pool": int(pool.sum()),
+            "clusters": int(len(cent)),
+            "evaluations": evaluations,
+            "coverage": float(cur @ w),
+            "degraded": degraded,
+            "prior_duplicates": int(self.exclude.sum()) if self.exclude is not None else 0,
+        }
+        return np.asarray(picked, dtype=np.int64), stats
@@ -0,0 +1,190 @@
+from __future__ import annotations
+
+from typing import Dict, List, Tuple
+
+import cv2
+import numpy as np
+
+# Compact per-frame signatures for dedupe and similarity search:
+#   phash  64-bit DCT perceptual hash of a 32x32 luma thumbnail
+#   embed  L2-normalised 4x4 grid of Lab means (48 floats), colour + layout
+# Both are computed for a whole (N, H, W, 3) stack at once.
+
+SIGNATURE_VERSION = "1"
+EMBED_DIM = 48
+
+_HASH_SIZE = 32
+_LOW = 8
+
+
+def _dct_matrix(n: int) -> np.ndarray:
+    k = np.arange(n)[:, None]
+    i = np.arange(n)[None, :]
+    m = np.cos(np.pi * (2 * i + 1) * k / (2 * n)) * np.sqrt(2.0 / n)
+    m[0] /= np.sqrt(2.0)
+    return m.astype(np.float32)
+
+
+_DCT = _dct_matrix(_HASH_SIZE)
+_BIT_WEIGHTS = (np.uint64(1) << np.arange(64, dtype=np.uint64)).astype(np.uint64)
+
+
+def _thumbs(frames: np.ndarray, size: int) -> np.ndarray:
+    return np.stack([cv2.resize(f, (size, size), interpolation=cv2.INTER_AREA) for f in frames])
+
+
+def phash(frames: np.ndarray) -> np.ndarray:
+    """(N,) uint64 perceptual hashes for (N, H, W, 3) uint8 BGR frames."""
+    if len(frames) == 0:
+        return np.zeros(0, dtype=np.uint64)
+    thumbs = _thumbs(frames, _HASH_SIZE)
+    tall = thumbs.reshape(-1, _HASH_SIZE, 3)
+    gray = cv2.cvtColor(tall, cv2.COLOR_BGR2GRAY).reshape(-1, _HASH_SIZE, _HASH_SIZE).astype(np.float32)
+    coeffs = np.einsum("ij,njk,lk->nil", _DCT, gray, _DCT)[:, :_LOW, :_LOW].reshape(len(frames), -1)
+    # median over the AC terms; the DC term only tracks overall brightness
+    med = np.median(coeffs[:, 1:], axis=1, keepdims=True)
+    bits = (coeffs > med).astype(np.uint64)
+    return (bits * _BIT_WEIGHTS).sum(axis=1, dtype=np.uint64)
+
+
+def embed(frames: np.ndarray) -> np.ndarray:
+    """(N, 48) float32 unit vectors: Lab means over a 4x4 grid, centred on neutral grey."""
+    if len(frames) == 0:
+        return np.zeros((0, EMBED_DIM), dtype=np.float32)
+    thumbs = _thumbs(frames, 16)
+    lab = cv2.cvtColor(thumbs.reshape(-1, 16, 3), cv2.COLOR_BGR2LAB).reshape(len(frames), 4, 4, 4, 4, 3)
+    grid = lab.astype(np.float32).mean(axis=(2, 4))  # (N, 4, 4, 3)
+    vec = ((grid - 128.0) / 128.0).reshape(len(frames), -1)
+    norm = np.linalg.norm(vec, axis=1, keepdims=True)
+    return (vec / np.maximum(norm, 1e-6)).astype(np.float32)
+
+
+def compute(frames: np.ndarray) -> Dict[str, np.ndarray]:
+    return {"phash": phash(frames), "embed": embed(frames)}
+
+
+# ---------- Hamming distance ----------
+
+if hasattr(np, "bitwise_count"):
+    def popcount64(x: np.ndarray) -> np.ndarray:
+        return np.bitwise_count(np.asarray(x, dtype=np.uint64)).astype(np.int64)
+else:  # NumPy < 2.0
+    _POP8 = np.array([bin(i).count("1") for i in range(256)], dtype=np.int64)
+
+    def popcount64(x: np.ndarray) -> np.ndarray:
+        b = np.ascontiguousarray(x, dtype=np.uint64).view(np.uint8).reshape(np.shape(x) + (8,))
+        return _POP8[b].sum(axis=-1)
+
+
+def hamming(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    return popcount64(np.bitwise_xor(np.asarray(a, dtype=np.uint64), np.asarray(b, dtype=np.uint64)))
+
+
+class PHashIndex:
+    """
+    Multi-index hashing over 64-bit pHashes.
+
+    The hash is split into ``radius + 1`` bands; by pigeonhole any two hashes
+    within ``radius`` bits agree exactly on at least one band. Each band is a
+    sorted array, so candidates come from equal-band runs rather than from all
+    pairs, and exact distances are checked with a vectorized popcount.
+    """
+
+    def __init__(self, hashes: np.ndarray, radius: int = 4):
+        self.hashes = np.ascontiguousarray(hashes, dtype=np.uint64)
+        self.radius = max(0, int(radius))
+        n_bands = min(self.radius + 1, 16)
+        edges = np.linspace(0, 64, n_bands + 1).astype(int)
+        self._bands: List[Tuple[int, int]] = [(int(a), int(b - a)) for a, b in zip(edges[:-1], edges[1:])]
+        self._keys: List[np.ndarray] = []
+        self._order: List[np.ndarray] = []
+        for shift, width in self._bands:
+            key = self._band(self.hashes, shift, width)
+            order = np.lexsort((self.hashes, key))
+            self._keys.append(key[order])
+            self._order.append(order)
+
+    @staticmethod
+    def _band(h: np.ndarray, shift: int, width: int) -> np.ndarray:
+        mask = np.uint64((1 << width) - 1)
+        return (np.asarray(h, dtype=np.uint64) >> np.uint64(shift)) & mask
+
+    def __len__(self) -> int:
+        return len(self.hashes)
+
+    def query(self, h: int, radius: int | None = None) -> np.ndarray:
+        """Indices of stored hashes within ``radius`` (<= index radius) of ``h``."""
+        r = self.radius if radius is None else min(int(radius), self.radius)
+        q = np.array([h], dtype=np.uint64)
+        hits: List[np.ndarray] = []
+        for (shift, width), keys, order in zip(self._bands, self._keys, self._order):
+            k = self._band(q, shift, width)[0]
+            lo, hi = np.searchsorted(keys, k, "left"), np.searchsorted(keys, k, "right")
+            if hi > lo:
+                hits.append(order[lo:hi])
+        if not hits:
+            return np.zeros(0, dtype=np.int64)
+        cand = np.unique(np.concatenate(hits))
+        return cand[hamming(self.hashes[cand], q[0]) <= r]
+
+    def within(self, hashes: np.ndarray, radius: int | None = None) -> np.ndarray:
+        """
+        (M,) mask of query ``hashes`` with any stored hash within ``radius``.
+        Vectorized over the queries: per band one searchsorted, then one
+        popcount pass per position in the longest matching run, so the cost
+        per query is its bucket size, not the index size.
+        """
+        r = self.radius if radius is None else min(int(radius), self.radius)
+        q = np.ascontiguousarray(hashes, dtype=np.uint64)
+        hit = np.zeros(len(q), dtype=bool)
+        if len(self) == 0 or len(q) == 0:
+            return hit
+        for (shift, width), keys, order in zip(self._bands, self._keys, self._order):
+            k = self._band(q, shift, width)
+            lo, hi = np.searchsorted(keys, k, "left"), np.searchsorted(keys, k, "right")
+            todo = np.flatnonzero((hi > lo) & ~hit)
+            d = 0
+            while len(todo):
+                close = hamming(self.hashes[order[lo[todo] + d]], q[todo]) <= r
+                hit[todo[close]] = True
+                d += 1
+                todo = todo[~close & (lo[todo] + d < hi[todo])]
+        return hit
+
+    def pairs(self, max_run: int = 256) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        All index pairs (i, j), i != j, within ``radius``. Work is bounded by
+        comparing each entry with at most ``max_run`` neighbours per band.
+        """
+        a_parts: List[np.ndarray] = []
+        b_parts: List[np.ndarray] = []
+        n = len(self.hashes)
+        for keys, order in zip(self._keys, self._order):
+            for d in range(1, min(max_run, n)):
+                same = keys[:-d] == keys[d:]
+                if not same.any():
+                    break
+                i = order[:-d][same]
+                j = order[d:][same]
+                close = hamming(self.hashes[i], self.hashes[j]) <= self.radius
+                a_parts.append(i[close])
+                b_parts.append(j[close])
+        if not a_parts:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        return np.concatenate(a_parts), np.concatenate(b_parts)
+
+    def groups(self) -> np.ndarray:
+        """(N,) near-duplicate group label per hash (connected components of pairs())."""
+        labels = np.arange(len(self.hashes), dtype=np.int64)
+        a, b = self.pairs()
+        if len(a) == 0:
+            return labels
+        while True:
+            m = np.minimum(labels[a], labels[b])
+            new = labels.copy()
+            np.minimum.at(new, a, m)
+            np.minimum.at(new, b, m)
+            new = new[new]
+            if np.array_equal(new, labels):
+                return labels
+            labels = new
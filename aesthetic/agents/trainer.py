@@ -0,0 +1,178 @@
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Mapping, Optional, Sequence, Tuple, Union
+
+import cv2
+import numpy as np
+
+from ..baseline import BaselineStore, column_stats, sha256_of
+from ..config import config_section
+from .metrics import METRIC_NAMES, MetricsEngine
+from .workers import pool_context, runtime_options, worker_count
+
+# Golden Baseline trainer (P5): reference stills -> metrics -> OnlineStats.
+#
+# The library is cut into fixed-size shards of the sorted file list; each
+# worker process decodes and scores one shard and returns a partial
+# {metric: OnlineStat dict} map. Shard boundaries depend only on
+# baseline.shard_size, never on the worker count, and partials are reduced in
+# shard order with BaselineStore._merge_stats, so the merged stats (and the
+# golden hash built from them) are bit-identical for 1 or 32 workers.
+
+PathLike = Union[str, Path]
+StatMap = Dict[str, Dict[str, float]]
+
+DEFAULTS: Dict[str, Any] = {
+    "shard_size": 64,       # stills per worker task
+    "max_side": 0,          # downscale longer side to this; 0 = native, like candidate frames
+    "extensions": [".jpg", ".jpeg", ".png", ".tif", ".tiff", ".bmp", ".webp"],
+}
+
+
+def trainer_options(cfg: Optional[Mapping[str, Any]] = None) -> Dict[str, Any]:
+    opts = dict(DEFAULTS)
+    opts.update(config_section(cfg, "baseline"))
+    return opts
+
+
+def list_stills(source: Union[PathLike, Sequence[PathLike]], extensions: Sequence[str]) -> List[str]:
+    """Sorted still paths from a folder (recursive) or an explicit list."""
+    exts = {e.lower() for e in extensions}
+    if isinstance(source, (str, Path)) and Path(source).is_dir():
+        paths = [p for p in Path(source).rglob("*") if p.is_file() and p.suffix.lower() in exts]
+    elif isinstance(source, (str, Path)):
+        paths = [Path(source)]
+    else:
+        paths = [Path(p) for p in source]
+    return sorted(str(p) for p in paths)
+
+
+def _load_still(path: str, max_side: int) -> Optional[np.ndarray]:
+    img = cv2.imread(path, cv2.IMREAD_COLOR)
+    if img is None:
+        return None
+    h, w = img.shape[:2]
+    if max_side and max(h, w) > max_side:
+        s = max_side / float(max(h, w))
+        img = cv2.resize(img, (max(1, round(w * s)), max(1, round(h * s))), interpolation=cv2.INTER_AREA)
+    return img
+
+
+# ---------- worker side ----------
+
+def _train_shard(paths: Sequence[str], max_side: int) -> Tuple[StatMap, int, List[str]]:
+    """Partial stats for one shard: (stat map, images scored, unreadable paths)."""
+    engine = MetricsEngine(batch_size=1)
+    rows: List[np.ndarray] = []
+    failed: List[str] = []
+    for p in paths:
+        img = _load_still(p, max_side)
+        if img is None:
+            failed.append(p)
+            continue
+        # stills differ in size, so each is its own stack
+        rows.append(engine.compute(img[None])["values"][0])
+    if not rows:
+        return {}, 0, failed
+    stats = column_stats(np.stack(rows), METRIC_NAMES)
+    return {k: s.to_dict() for k, s in stats.items()}, len(rows), failed
+
+
+# ---------- driver ----------
+
+def reduce_partials(partials: Sequence[StatMap]) -> StatMap:
+    """Merge partial maps left to right; callers pass them in shard order."""
+    out: StatMap = {}
+    for part in partials:
+        out = BaselineStore._merge_stats(out, part)
+    return out
+
+
+def train_stills(
+    source: Union[PathLike, Sequence[PathLike]],
+    cfg: Optional[Mapping[str, Any]] = None,
+    progress: Optional[Callable[[float], None]] = None,
+) -> Dict[str, Any]:
+    """
+    Score a stills library in parallel and return the merged stat map with
+    ``stats_hash`` (sha256 of the stats alone) for reproducibility checks.
+    """
+    opts = trainer_options(cfg)
+    paths = list_stills(source, opts["extensions"])
+    if not paths:
+        return {"ok": False, "error": f"no stills found in {source}"}
+    size = max(1, int(opts["shard_size"]))
+    shards = [paths[a:a + size] for a in range(0, len(paths), size)]
+    max_side = int(opts["max_side"] or 0)
+
+    ropts = runtime_options(cfg)
+    workers = min(worker_count(ropts), len(shards))
+    timeout = float(ropts.get("job_timeout_s", 300))
+    partials: List[Optional[StatMap]] = [None] * len(shards)
+    images, failed, fallbacks = 0, [], 0
+    mode = "inprocess"
+
+    def collect(i: int, res: Tuple[StatMap, int, List[str]]) -> None:
+        nonlocal images
+        partials[i] = res[0]
+        images += res[1]
+        failed.extend(res[2])
+        if progress is not None:
+            progress(sum(p is not None for p in partials) / len(shards))
+
+    pool = None
+    if workers >= 2:
+        try:
+            pool = pool_context().Pool(processes=workers)
+            mode = "pool"
+        except (OSError, ValueError):
+            pool = None
+    try:
+        if pool is None:
+            for i, shard in enumerate(shards):
+                collect(i, _train_shard(shard, max_side))
+        else:
+            pending = [pool.apply_async(_train_shard, (shard, max_side)) for shard in shards]
+            for i, job in enumerate(pending):
+                try:
+                    res = job.get(timeout=timeout)
+                except Exception:
+                    # same shard, same partial: determinism survives the fallback
+                    fallbacks += 1
+                    res = _train_shard(shards[i], max_side)
+                collect(i, res)
+    finally:
+        if pool is not None:
+            pool.terminate()
+            pool.join()
+
+    stats = reduce_partials([p for p in partials if p])
+    return {
+        "ok": True,
+        "stats": stats,
+        "stats_hash": sha256_of(stats),
+        "images": images,
+        "failed": failed,
+        "shards": len(shards),
+        "execution": {"mode": mode, "workers": workers if pool is not None else 0, "fallbacks": fallbacks},
+    }
+
+
+def train_baseline(
+    source: Union[PathLike, Sequence[PathLike]],
+    store: BaselineStore,
+    cfg: Optional[Mapping[str, Any]] = None,
+    target: str = "staging",
+    progress: Optional[Callable[[float], None]] = None,
+) -> Dict[str, Any]:
+    """Train from stills and fold the result into the store's staging or augment buffer."""
+    if target not in ("staging", "augment"):
+        return {"ok": False, "error": f"unknown target {target!r}"}
+    res = train_stills(source, cfg, progress)
+    if not res.get("ok"):
+        return res
+    buf = store.staging if target == "staging" else store.augment
+    buf.append(BaselineStore._map_to_online(res["stats"]))
+    res.update({"target": target, "seq": buf.seq, "metricCount": len(buf)})
+    return res
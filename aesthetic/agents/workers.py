@@ -0,0 +1,267 @@
+from __future__ import annotations
+
+import math
+import multiprocessing as mp
+import os
+import threading
+from multiprocessing import resource_tracker, shared_memory
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+import numpy as np
+
+from ..config import config_section
+from .metrics import ENGINE_VERSION, METRIC_NAMES, MetricsEngine, as_stack, metrics_options
+
+# Process-pool execution for the metrics stage.
+#
+# Candidate frames are copied once into a shared memory segment and workers
+# score disjoint shards of it in place, so only shard bounds and the small
+# (n, M) result matrices cross the process boundary. The pool is sized from
+# runtime.workers / runtime.cpu_guard_pct and runtime.max_memory_mb; each
+# shard gets runtime.job_timeout_s and runtime.retries, and anything the pool
+# cannot deliver is scored in-process instead.
+#
+# The pool outlives a single score_frames() call: the metrics stage opens one
+# ScoringPool and feeds it chunk after chunk, so worker start-up is paid once
+# per stage, not once per decoded chunk. Off the main thread (job runner
+# threads of the GUI) workers are started with forkserver / spawn, never by
+# forking a multi-threaded process.
+
+DEFAULTS: Dict[str, Any] = {
+    "workers": 0,            # 0 = derive from cpu_guard_pct
+    "cpu_guard_pct": 85,     # share of cores the pool may occupy
+    "max_memory_mb": 4096,   # ceiling for shared frames + worker intermediates
+    "job_timeout_s": 300,    # per shard
+    "retries": 1,            # resubmissions before falling back in-process
+}
+
+# metric intermediates (float32 luma, Lab planes, residuals) relative to the
+# uint8 BGR frame they are computed from
+_WORK_FACTOR = 12
+
+
+def runtime_options(cfg: Optional[Mapping[str, Any]] = None) -> Dict[str, Any]:
+    opts = dict(DEFAULTS)
+    opts.update(config_section(cfg, "runtime"))
+    return opts
+
+
+def worker_count(opts: Mapping[str, Any]) -> int:
+    n = int(opts.get("workers") or 0)
+    if n > 0:
+        return n
+    cores = os.cpu_count() or 1
+    return max(1, int(math.floor(cores * float(opts.get("cpu_guard_pct", 100)) / 100.0)))
+
+
+def plan_pool(
+    n_frames: int, frame_bytes: int, batch_size: int, opts: Mapping[str, Any]
+) -> Tuple[int, int]:
+    """
+    Fit ``(workers, wave_frames)`` under max_memory_mb: each worker holds one
+    metrics batch of intermediates, the rest of the budget holds the shared
+    frames of one wave. ``workers == 0`` means the pool does not fit.
+    """
+    budget = int(float(opts.get("max_memory_mb", DEFAULTS["max_memory_mb"])) * 1024 * 1024)
+    per_worker = frame_bytes * batch_size * _WORK_FACTOR
+    workers = min(worker_count(opts), max(1, math.ceil(n_frames / batch_size)))
+    while workers > 0:
+        wave = (budget - workers * per_worker) // max(1, frame_bytes)
+        if wave >= workers * batch_size:
+            return workers, int(min(wave, n_frames))
+        workers -= 1
+    return 0, 0
+
+
+def pool_context() -> Any:
+    """multiprocessing context for worker pools: fork only from the main thread."""
+    if threading.current_thread() is threading.main_thread():
+        return mp.get_context()
+    methods = mp.get_all_start_methods()
+    return mp.get_context("forkserver" if "forkserver" in methods else "spawn")
+
+
+class ScoringPool:
+    """
+    Worker processes shared by successive score_frames() calls. Started on
+    first use with the workers that call planned; later calls shard over at
+    most that many. A shard that times out may still be running, so the pool
+    is then torn down and started afresh on the next call.
+    """
+
+    def __init__(self) -> None:
+        self._pool: Any = None
+        self.size = 0
+        self.error: Optional[str] = None
+        self.starts = 0
+
+    def get(self, workers: int) -> Any:
+        """The running pool, started with ``workers`` processes if needed; None if unavailable."""
+        if self._pool is None and self.error is None:
+            try:
+                # start the tracker before the workers so they share it instead
+                # of each spawning one that reports the driver's segment as leaked
+                resource_tracker.ensure_running()
+                self._pool = pool_context().Pool(processes=workers)
+                self.size = workers
+                self.starts += 1
+            except (OSError, ValueError) as e:
+                self.error = f"pool unavailable: {e}"
+        return self._pool
+
+    def reset(self) -> None:
+        if self._pool is not None:
+            self._pool.terminate()
+            self._pool.join()
+        self._pool = None
+        self.size = 0
+
+    def close(self) -> None:
+        self.reset()
+
+    def __enter__(self) -> "ScoringPool":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+
+# ---------- worker side ----------
+
+def _score_shard(
+    shm_name: str, shape: Tuple[int, ...], start: int, stop: int, batch_size: int
+) -> Tuple[int, np.ndarray, Dict[str, float]]:
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        frames = np.ndarray(shape, dtype=np.uint8, buffer=shm.buf)
+        result = MetricsEngine(batch_size=batch_size).compute(frames[start:stop])
+        values = np.array(result["values"], copy=True)
+        del frames
+        return start, values, result["timing"]
+    finally:
+        shm.close()
+
+
+# ---------- driver ----------
+
+def _merge_timing(into: Dict[str, float], timing: Mapping[str, float]) -> None:
+    for k, v in timing.items():
+        into[k] = into.get(k, 0.0) + float(v)
+
+
+def _shards(n: int, workers: int, batch_size: int) -> List[Tuple[int, int]]:
+    # two shards per worker evens out stragglers without much overhead
+    size = max(batch_size, math.ceil(n / (workers * 2)))
+    return [(a, min(n, a + size)) for a in range(0, n, size)]
+
+
+def score_frames(
+    frames: np.ndarray,
+    cfg: Optional[Mapping[str, Any]] = None,
+    pool: Optional[ScoringPool] = None,
+) -> Dict[str, Any]:
+    """
+    Score an (N, H, W, 3) uint8 stack like MetricsEngine.compute, using a
+    process pool when it is worth it and fits the memory ceiling. Pass a
+    ScoringPool to reuse its workers across calls; without one a pool is
+    started and stopped for this call. The result adds an ``execution``
+    summary; ``timing`` sums worker seconds.
+    """
+    frames = as_stack(frames)
+    opts = runtime_options(cfg)
+    batch_size = max(1, int(metrics_options(cfg)["batch_size"]))
+    n = int(frames.shape[0])
+    frame_bytes = int(np.prod(frames.shape[1:])) if n else 0
+    workers, wave = plan_pool(n, frame_bytes, batch_size, opts) if n else (0, 0)
+
+    execution: Dict[str, Any] = {"mode": "inprocess", "workers": 0, "shards": 0, "retries": 0, "fallbacks": 0}
+    if workers < 2:
+        result = MetricsEngine(batch_size=batch_size).compute(frames)
+        result["execution"] = execution
+        return result
+
+    owned = pool is None
+    scoring = ScoringPool() if pool is None else pool
+    try:
+        return _score_pooled(frames, batch_size, workers, wave, scoring, opts, execution)
+    finally:
+        if owned:
+            scoring.close()
+
+
+def _score_pooled(
+    frames: np.ndarray,
+    batch_size: int,
+    workers: int,
+    wave: int,
+    scoring: ScoringPool,
+    opts: Mapping[str, Any],
+    execution: Dict[str, Any],
+) -> Dict[str, Any]:
+    n = int(frames.shape[0])
+    frame_bytes = int(np.prod(frames.shape[1:]))
+    pool = scoring.get(workers)
+    if pool is None:
+        result = MetricsEngine(batch_size=batch_size).compute(frames)
+        execution["error"] = scoring.error
+        result["execution"] = execution
+        return result
+
+    workers = min(workers, scoring.size)
+    values = np.zeros((n, len(METRIC_NAMES)), dtype=np.float32)
+    timing: Dict[str, float] = {}
+    timed_out = False
+    execution.update({"mode": "pool", "workers": workers})
+    timeout = float(opts.get("job_timeout_s", DEFAULTS["job_timeout_s"]))
+    retries = max(0, int(opts.get("retries", DEFAULTS["retries"])))
+    local = MetricsEngine(batch_size=batch_size)
+    try:
+        for w0 in range(0, n, wave):
+            w1 = min(n, w0 + wave)
+            shape = (w1 - w0,) + tuple(frames.shape[1:])
+            shm = shared_memory.SharedMemory(create=True, size=max(1, (w1 - w0) * frame_bytes))
+            try:
+                view = np.ndarray(shape, dtype=np.uint8, buffer=shm.buf)
+                view[:] = frames[w0:w1]
+                shards = _shards(w1 - w0, workers, batch_size)
+                execution["shards"] += len(shards)
+                pending = {
+                    (a, b): pool.apply_async(_score_shard, (shm.name, shape, a, b, batch_size))
+                    for a, b in shards
+                }
+                for (a, b), job in pending.items():
+                    attempts = 0
+                    while True:
+                        try:
+                            start, vals, t = job.get(timeout=timeout)
+                            values[w0 + start:w0 + start + len(vals)] = vals
+                            _merge_timing(timing, t)
+                            break
+                        except Exception as e:
+                            timed_out = timed_out or isinstance(e, mp.TimeoutError)
+                            if attempts < retries:
+                                attempts += 1
+                                execution["retries"] += 1
+                                job = pool.apply_async(_score_shard, (shm.name, shape, a, b, batch_size))
+                                continue
+                            execution["fallbacks"] += 1
+                            res = local.compute(view[a:b])
+                            values[w0 + a:w0 + b] = res["values"]
+                            _merge_timing(timing, res["timing"])
+                            break
+                del view
+            finally:
+                shm.close()
+                shm.unlink()
+    finally:
+        if timed_out:
+            # the timed-out shard may still occupy a worker
+            scoring.reset()
+
+    return {
+        "version": ENGINE_VERSION,
+        "names": list(METRIC_NAMES),
+        "values": values,
+        "timing": timing,
+        "execution": execution,
+    }
@@ -1,13 +1,18 @@
 # aesthetic/app.py
+from __future__ import annotations
+
 import json
 import random
+import threading
+import time
 from datetime import datetime
+from functools import partial
 from pathlib import Path
-from typing import Any, Dict, Optional
-
-import webview  # pip install pywebview
+from typing import TYPE_CHECKING, Any, Dict, Optional
 
 from .config import (
+    config_section,
+    ensure_data_dirs,
     load_config,
     to_yaml,
     BASE_DIR,
@@ -17,6 +22,21 @@ from .config import (
     BASELINE_PATH,
     CONFIG_PATH,
 )
+from .profiling import Profiler, cprofile_to
+from .runner import CANCELLED, FAILED, JobContext, JobRunner
+from .storage.fs import data_path
+
+if TYPE_CHECKING:
+    from .baseline import BaselineStore
+    from .models.job import ShotTable
+    from .storage.cache import FrameCache
+    from .storage.signature_index import SignatureIndex
+
+# Startup stays light: only config, runner and profiling are imported with
+# the module. The pixel engine (NumPy, OpenCV and every agent) is imported by
+# the bridge method that first needs it, and warm_up() does that on a
+# background thread as soon as the window is up, so the first job rarely
+# waits for it. pywebview itself is imported in main().
 
 APP_NAME = "AESTHETIC (Local Desktop)"
 
@@ -27,6 +47,16 @@ class API:
         self.jobs: Dict[int, Dict[str, Any]] = {}
         self.next_job_id: int = 1
         self._baseline: Dict[str, Any] = self._load_baseline()
+        self._cache: Optional[FrameCache] = None
+        self._store: Optional[BaselineStore] = None
+        self._index: Optional[SignatureIndex] = None
+        self._lock = threading.RLock()
+        self._warm: Dict[str, Any] = {"state": "idle"}
+        # pixel analysis runs in the background; bridge calls only enqueue
+        self._runner = JobRunner(
+            max_jobs=int(config_section(self.cfg, "runtime").get("max_jobs", 1)),
+            on_event=self._push_event,
+        )
 
     # -------- baseline helpers --------
     def _load_baseline(self) -> Dict[str, Any]:
@@ -50,9 +80,61 @@ class API:
             },
         }
 
+    def _get_cache(self) -> FrameCache:
+        from .storage.cache import FrameCache
+
+        with self._lock:
+            if self._cache is None:
+                self._cache = FrameCache.from_config(self.cfg)
+            return self._cache
+
+    def _push_event(self, event: Dict[str, Any]) -> None:
+        # window.onJobEvent is optional; polling job_status gets the same events
+        if self.window is not None:
+            payload = json.dumps(event, separators=(",", ":"), default=str)
+            self.window.evaluate_js(f"window.onJobEvent && window.onJobEvent({payload})")
+
     def _save_baseline(self) -> None:
+        ensure_data_dirs()
         BASELINE_PATH.write_text(json.dumps(self._baseline, indent=2), encoding="utf-8")
 
+    # -------- startup --------
+    def warm_up(self) -> Dict[str, Any]:
+        """
+        Import the pixel engine and run it once on a tiny frame so OpenCV's
+        first-call setup is paid before the first job. Runs on a daemon
+        thread; startup_status() reports progress. Idempotent.
+        """
+        with self._lock:
+            if self._warm["state"] != "idle":
+                return {"ok": True, **self._warm}
+            self._warm = {"state": "running"}
+
+        def run() -> None:
+            t0 = time.perf_counter()
+            try:
+                import numpy as np
+
+                from .agents import export, trainer  # noqa: F401  (import cost only)
+                from .agents.metrics import MetricsEngine
+                from .pipeline import default_weights  # noqa: F401
+
+                MetricsEngine.from_config(self.cfg).compute(np.zeros((1, 64, 64, 3), dtype=np.uint8))
+                self._get_cache()
+                state: Dict[str, Any] = {"state": "ready"}
+            except Exception as e:  # the first job imports again and reports properly
+                state = {"state": "failed", "error": f"{type(e).__name__}: {e}"}
+            state["seconds"] = round(time.perf_counter() - t0, 3)
+            with self._lock:
+                self._warm = state
+
+        threading.Thread(target=run, name="aesthetic-warmup", daemon=True).start()
+        return {"ok": True, "state": "running"}
+
+    def startup_status(self):
+        with self._lock:
+            return {"ok": True, **self._warm}
+
     # -------- API used by index.html --------
     def get_config(self):
         text = to_yaml(self.cfg) if self.cfg else (
@@ -77,20 +159,233 @@ class API:
         self._save_baseline()
         return {"ok": True}
 
+    def _get_store(self) -> BaselineStore:
+        from .baseline import BaselineStore
+
+        with self._lock:
+            if self._store is None:
+                self._store = BaselineStore(DATA_DIR)
+            return self._store
+
+    def _get_index(self) -> Optional[SignatureIndex]:
+        """The archive-wide signature index, or None when disabled in config."""
+        opts = config_section(self.cfg, "signature_index")
+        if not opts.get("enabled", True):
+            return None
+        from .storage.signature_index import SignatureIndex
+
+        with self._lock:
+            if self._index is None:
+                self._index = SignatureIndex(
+                    max_segments=int(opts.get("max_segments", 32)),
+                    lock_timeout=float(opts.get("lock_timeout_s", 30.0)),
+                )
+            return self._index
+
+    def train_baseline(self, folder: str, target: str = "staging"):
+        """Queue a parallel training run over a stills folder; poll job_status for progress."""
+        if not folder or not Path(folder).exists():
+            return {"ok": False, "error": f"no such folder: {folder}"}
+        with self._lock:
+            job_id = f"baseline-{self.next_job_id}"
+            self.next_job_id += 1
+
+        def run(ctx: JobContext) -> Dict[str, Any]:
+            from .agents.trainer import train_baseline
+
+            ctx.progress("train", 0.0)
+            res = train_baseline(folder, self._get_store(), self.cfg, target, lambda f: ctx.progress("train", f))
+            if not res.get("ok"):
+                raise RuntimeError(res.get("error", "training failed"))
+            res.pop("stats", None)
+            return res
+
+        res = self._runner.submit(job_id, run)
+        return {"ok": bool(res.get("ok")), "job_id": job_id, "status": res.get("status"), "error": res.get("error")}
+
     def create_job(self, filename: str):
         if not filename:
             return {"ok": False, "error": "filename required"}
-        job_id = self.next_job_id
-        self.next_job_id += 1
-        self.jobs[job_id] = {"filename": filename, "manifest": None}
-        return {"ok": True, "job_id": job_id}
+        from .pipeline import default_weights
+
+        with self._lock:
+            job_id = self.next_job_id
+            self.next_job_id += 1
+            self.jobs[job_id] = {
+                "filename": filename,
+                "manifest": None,
+                "analysis": None,
+                "ranker": None,
+                "selector": None,
+                "store": None,
+                "sensitivity": 50,
+                "weights": default_weights(self.cfg),
+                "profiler": Profiler(),
+                "cprofile": None,
+            }
+        status = None
+        if Path(filename).is_file():
+            status = self._runner.submit(job_id, partial(self._run_job, job_id)).get("status")
+        return {"ok": True, "job_id": job_id, "status": status}
+
+    def _run_job(self, job_id: int, ctx: JobContext) -> Dict[str, Any]:
+        """Background body of a job: analyse pixels once, then select shots."""
+        from .agents.scoring import Ranker
+        from .pipeline import analyze_source, make_selector
+        from .storage.columnar import MetricsStore
+
+        job = self.jobs[job_id]
+        source = Path(job["filename"])
+        prof_path = None
+        if config_section(self.cfg, "profiling").get("cprofile"):
+            prof_path = data_path("profiles") / f"{source.stem}-job{job_id}.pstats"
+        with cprofile_to(prof_path) as notes:
+            analysis = analyze_source(source, self.cfg, self._get_cache(), ctx.progress, job["profiler"])
+            if not analysis.get("ok"):
+                raise RuntimeError(analysis.get("error", "analysis failed"))
+            ctx.progress("store", 0.0)
+            with job["profiler"].stage("store", frames=len(analysis["candidates"])):
+                job_dir = data_path("jobs", f"{source.stem}-{analysis['source_hash'][:12] or job_id}")
+                store = MetricsStore.write(
+                    job_dir / "metrics",
+                    analysis["names"],
+                    analysis["values"],
+                    analysis["candidates"],
+                    analysis["engine_version"],
+                )
+            index = self._get_index()
+            if index is not None:
+                cands = analysis["candidates"]
+                with job["profiler"].stage("index", frames=len(cands)) as rec:
+                    added = index.add(analysis["source_hash"], str(source), cands.frame, cands.scene_id, cands.time,
+                                      analysis["phash"], analysis["embed"])
+                    if not added.get("ok"):
+                        rec["error"] = added.get("error")   # e.g. lock timeout; the job itself goes on
+            ctx.progress("selection", 0.0)
+            ranker = Ranker(analysis["values"], analysis["names"])
+            selector = make_selector(analysis, self.cfg, index)
+            ctx.check()
+            with self._lock:
+                job.update(analysis=analysis, ranker=ranker, selector=selector, store=store)
+            shots = self._select(job_id)
+        if prof_path is not None:
+            with self._lock:
+                job["cprofile"] = {"notes": notes} if notes else {"path": str(prof_path)}
+                job["manifest"] = self._manifest(job, shots)
+        return {"shots": shots.to_dicts()}
+
+    def _select(self, job_id: int) -> ShotTable:
+        from .pipeline import select_shots
+
+        job = self.jobs[job_id]
+        with self._lock:
+            with job["profiler"].stage("selection", frames=len(job["analysis"]["candidates"])):
+                shots = select_shots(job["analysis"], job["sensitivity"], job["weights"], job["ranker"], job["selector"])
+            job["manifest"] = self._manifest(job, shots)
+        return shots
+
+    def _performance(self, job: Dict[str, Any]) -> Dict[str, Any]:
+        perf = job["profiler"].report()
+        if job.get("cprofile"):
+            perf["cprofile"] = job["cprofile"]
+        return perf
+
+    def _manifest(self, job: Dict[str, Any], shots: ShotTable) -> Dict[str, Any]:
+        manifest = {
+            "source_file": job["filename"],
+            "analysis_timestamp": datetime.utcnow().isoformat(),
+            "config": self.cfg or {"note": "stub config"},
+            "golden_baseline_summary": {
+                "sample_count": self._baseline.get("sampleCount", 0),
+                "avg_technical": self._baseline.get("avgTechnical", 0.0),
+                "avg_subjective": self._baseline.get("avgSubjective", 0.0),
+            },
+            "weights": job["weights"],
+            "shots": shots,
+            "performance": self._performance(job),
+        }
+        if job.get("exports"):
+            manifest["exports"] = {k: job["exports"][k] for k in ("frames", "contact_sheet", "trims", "trim_modes")}
+        if job.get("analysis") is not None:
+            manifest["analysis"] = {
+                "source_hash": job["analysis"]["source_hash"],
+                "engine_version": job["analysis"]["engine_version"],
+                "scene_count": len(job["analysis"]["scenes"]),
+                "candidate_count": len(job["analysis"]["candidates"]),
+                "cache": job["analysis"]["cache"],
+                "metrics_store": {
+                    "path": str(job["store"].root),
+                    "index": job["store"].index_path.name,
+                    "rows": job["store"].rows,
+                },
+            }
+        return manifest
 
     def analyze(self, job_id: int, sensitivity: int = 50):
+        """
+        Shots for a job. Once its background analysis is done this is only a
+        re-selection and returns ``shots`` directly; before that it returns the
+        job ``status`` (re-queueing failed or cancelled jobs) and the shots
+        arrive with the job's ``done`` event.
+        """
         if job_id not in self.jobs:
             return {"ok": False, "error": f"unknown job_id {job_id}"}
 
-        # simple mapping of sensitivity to shot count
-        target = max(3, min(12, int(3 + (sensitivity / 100.0) * 9)))
+        job = self.jobs[job_id]
+        job["sensitivity"] = int(sensitivity)
+        if not Path(job["filename"]).is_file():
+            # UI demo mode: the browser only hands over a file name
+            from .models.job import ShotTable
+
+            shots = ShotTable.from_dicts(self._mock_shots(sensitivity))
+            job["manifest"] = self._manifest(job, shots)
+            return {"ok": True, "shots": shots.to_dicts()}
+
+        if job.get("analysis") is not None:
+            return {"ok": True, "status": "done", "shots": self._select(job_id).to_dicts()}
+        if self._runner.state(job_id) in (None, FAILED, CANCELLED):
+            res = self._runner.submit(job_id, partial(self._run_job, job_id))
+            if not res.get("ok"):
+                return res
+        return {"ok": True, "job_id": job_id, "status": self._runner.state(job_id), "shots": None}
+
+    def job_status(self, job_id: int, since: int = 0):
+        """Progress, per-stage seconds and events newer than ``since`` (an event seq)."""
+        return self._runner.status(job_id, since)
+
+    def cancel_job(self, job_id: int):
+        return self._runner.cancel(job_id)
+
+    def list_jobs(self):
+        return {"ok": True, "jobs": self._runner.list()}
+
+    def rerank(self, job_id: int, weights: Dict[str, Any], sensitivity: Optional[int] = None):
+        """
+        Recompute totals from the job's stored metrics with new pillar and/or
+        category weights, e.g. {"categories": {"exposure": 2.0}} or a flat
+        {"exposure": 2.0, "technical": 1.0}. No video is decoded.
+        """
+        job = self.jobs.get(job_id)
+        if not job or job.get("ranker") is None:
+            return {"ok": False, "error": "no stored metrics for this job; run analyze first"}
+        if not isinstance(weights, dict):
+            return {"ok": False, "error": "weights must be a dict"}
+        from .agents.scoring import active_pillars, split_weights
+
+        cats, pillars = split_weights(weights)
+        # pillars without metric columns (no Creative / Subjective models yet) cannot move totals
+        ignored = sorted(set(pillars) - set(active_pillars(job["ranker"].names)))
+        job["weights"]["categories"].update(cats)
+        job["weights"]["pillars"].update(pillars)
+        if sensitivity is not None:
+            job["sensitivity"] = int(sensitivity)
+        shots = self._select(job_id)
+        return {"ok": True, "shots": shots.to_dicts(), "weights": job["weights"], "ignored_pillars": ignored}
+
+    def _mock_shots(self, sensitivity: int):
+        from .pipeline import shot_target
+
+        target = shot_target(sensitivity)
         t = 0.0
         shots = []
         for i in range(1, target + 1):
@@ -116,38 +411,111 @@ class API:
                     },
                 }
             )
-
-        manifest = {
-            "source_file": self.jobs[job_id]["filename"],
-            "analysis_timestamp": datetime.utcnow().isoformat(),
-            "config": self.cfg or {"note": "stub config"},
-            "golden_baseline_summary": {
-                "sample_count": self._baseline.get("sampleCount", 0),
-                "avg_technical": self._baseline.get("avgTechnical", 0.0),
-                "avg_subjective": self._baseline.get("avgSubjective", 0.0),
-            },
-            "shots": shots,
-        }
-        self.jobs[job_id]["manifest"] = manifest
-        return {"ok": True, "shots": shots}
+        return shots
 
     def export_manifest(self, job_id: int):
         job = self.jobs.get(job_id)
         if not job or not job.get("manifest"):
             return {"ok": False, "error": "no manifest available; run analyze first"}
 
+        from .models.job import write_json
+
         stem = Path(job["manifest"]["source_file"]).stem or f"job_{job_id}"
         OUTPUTS_DIR.mkdir(parents=True, exist_ok=True)
         out_path = OUTPUTS_DIR / f"{stem}_run_manifest.json"
-        out_path.write_text(json.dumps(job["manifest"], indent=2), encoding="utf-8")
+        # the manifest carries earlier export timings; this one is recorded after
+        manifest = dict(job["manifest"], performance=self._performance(job))
+        with job["profiler"].stage("export"):
+            write_json(out_path, manifest, indent=bool(config_section(self.cfg, "export").get("manifest_indent")))
+        return {"ok": True, "path": str(out_path)}
+
+    def export_shots(self, job_id: int):
+        """
+        Queue hero frames, contact sheet and trim list for the job's current
+        shots into data/outputs/<stem>-job<id>; poll job_status("export-<id>").
+        """
+        job = self.jobs.get(job_id)
+        if not job or job.get("analysis") is None or not job.get("manifest"):
+            return {"ok": False, "error": "no analysed shots for this job; run analyze first"}
+        analysis = job["analysis"]
+        shots = job["manifest"]["shots"]
+        source = Path(job["filename"])
+        out_dir = OUTPUTS_DIR / f"{source.stem}-job{job_id}"
+
+        def run(ctx: JobContext) -> Dict[str, Any]:
+            from .agents.export import export_shots
+
+            ctx.progress("export", 0.0)
+            with job["profiler"].stage("export_media", frames=len(shots)) as rec:
+                res = export_shots(
+                    source,
+                    shots,
+                    out_dir,
+                    self.cfg,
+                    cache=self._get_cache(),
+                    key=analysis["source_hash"],
+                    keyframes=analysis.get("keyframes"),
+                    progress=lambda f: ctx.progress("export", f),
+                )
+                rec["workers"] = res.get("workers", 0)
+            if not res.get("ok"):
+                raise RuntimeError(res.get("error", "export failed"))
+            index = self._get_index()
+            if index is not None:
+                # later reels dedupe against these heroes
+                marked = index.mark_heroes(analysis["source_hash"], [int(s["frame"]) for s in shots.to_dicts()])
+                if not marked.get("ok"):
+                    res["index_error"] = marked.get("error")
+            with self._lock:
+                job["exports"] = res
+                job["manifest"] = self._manifest(job, job["manifest"]["shots"])
+            return res
+
+        res = self._runner.submit(f"export-{job_id}", run)
+        return {"ok": bool(res.get("ok")), "job_id": f"export-{job_id}", "status": res.get("status"), "error": res.get("error")}
+
+    def find_similar(self, job_id: int, frame: int, k: int = 12, metric: str = "cosine", other_reels: bool = False):
+        """
+        Indexed candidates across every analysed reel that look like ``frame``
+        of this job, best first; ``metric`` is "cosine" (colour / layout
+        embedding) or "hamming" (pHash).
+        """
+        job = self.jobs.get(job_id)
+        if not job or job.get("analysis") is None:
+            return {"ok": False, "error": "no analysed shots for this job; run analyze first"}
+        if metric not in ("cosine", "hamming"):
+            return {"ok": False, "error": "metric must be 'cosine' or 'hamming'"}
+        index = self._get_index()
+        if index is None:
+            return {"ok": False, "error": "signature index is disabled (signature_index.enabled)"}
+        return index.similar_to(job["analysis"]["source_hash"], int(frame), int(k), metric, bool(other_reels))
+
+    def signature_index_stats(self):
+        index = self._get_index()
+        if index is None:
+            return {"ok": False, "error": "signature index is disabled (signature_index.enabled)"}
+        return index.stats()
+
+    def export_metrics_json(self, job_id: int):
+        job = self.jobs.get(job_id)
+        if not job or job.get("store") is None:
+            return {"ok": False, "error": "no metrics store for this job; run analyze first"}
+        store = job["store"]
+        out_path = store.export_json(store.root.parent / "metrics.json")
         return {"ok": True, "path": str(out_path)}
 
 def main():
+    import webview  # pip install pywebview
+
     html = (WEB_DIR / "index.html").as_uri()
     api = API()
     window = webview.create_window(APP_NAME, html, width=1280, height=820, resizable=True, js_api=api)
     api.window = window
-    webview.start(http_server=False)
+    try:
+        # warm_up runs once the GUI loop is up, so the window is not held back
+        webview.start(api.warm_up if config_section(api.cfg, "runtime").get("warm_up", True) else None, http_server=False)
+    finally:
+        api._runner.shutdown()
 
 if __name__ == "__main__":
     main()
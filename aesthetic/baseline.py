@@ -2,17 +2,31 @@ from __future__ import annotations
 
 import json
 import hashlib
+import os
 from dataclasses import dataclass
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import Any, Dict, Iterable, Mapping, List, cast
+from typing import Any, Dict, Iterable, Mapping, List, Optional, Sequence, Tuple, Union, cast
+
+import numpy as np
 
 
 def _now_iso() -> str:
     return datetime.now(timezone.utc).replace(microsecond=0).isoformat()
 
 
-def _sha256_of(obj: Any) -> str:
+def _atomic_write_text(path: Path, text: str) -> None:
+    """Write via a synced temp file and rename, so readers see old or new, never half."""
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def sha256_of(obj: Any) -> str:
+    """Content hash of a JSON-serialisable object (key order does not matter)."""
     data = json.dumps(obj, sort_keys=True, separators=(",", ":")).encode("utf-8")
     return "sha256:" + hashlib.sha256(data).hexdigest()
 
@@ -52,6 +66,185 @@ class OnlineStat:
         return OnlineStat(int(d.get("n", 0)), float(d.get("mean", 0.0)), float(d.get("M2", 0.0)))
 
 
+# a training batch: rows of {metric: value}, a columnar {metric: values}
+# mapping, or an (samples x metrics) array with its column names
+Batch = Union[Iterable[Mapping[str, float]], Mapping[str, Sequence[float]], np.ndarray]
+
+_STAT_CHUNK = 65536  # rows per vectorized pass; bounds the (x - mean)^2 temporary
+
+
+def _chunk_moments(x: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Per-column (n, mean, M2) of a float64 (rows, M) chunk, ignoring NaN."""
+    valid = ~np.isnan(x)
+    n = valid.sum(axis=0).astype(np.float64)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = np.where(n > 0, np.where(valid, x, 0.0).sum(axis=0) / n, 0.0)
+        dev = np.where(valid, x - mean, 0.0)
+    return n, mean, (dev * dev).sum(axis=0)
+
+
+def _merge_moments(
+    a: Tuple[np.ndarray, np.ndarray, np.ndarray], b: Tuple[np.ndarray, np.ndarray, np.ndarray]
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """OnlineStat.merge applied column-wise to (n, mean, M2) arrays."""
+    na, ma, m2a = a
+    nb, mb, m2b = b
+    n = na + nb
+    safe = np.where(n > 0, n, 1.0)
+    delta = mb - ma
+    mean = ma + delta * (nb / safe)
+    m2 = m2a + m2b + delta * delta * (na * nb / safe)
+    return n, mean, m2
+
+
+def column_stats(values: np.ndarray, names: Sequence[str]) -> Dict[str, OnlineStat]:
+    """
+    OnlineStats for each column of a (samples x metrics) array, computed in
+    vectorized chunks folded together with the merge formula. NaN entries
+    are skipped; columns without any value are left out.
+    """
+    x = np.asarray(values, dtype=np.float64)
+    if x.ndim == 1:
+        x = x[:, None]
+    if x.ndim != 2 or x.shape[1] != len(names):
+        raise ValueError(f"values {x.shape} do not match {len(names)} metric names")
+    m = x.shape[1]
+    acc = (np.zeros(m), np.zeros(m), np.zeros(m))
+    for a in range(0, x.shape[0], _STAT_CHUNK):
+        acc = _merge_moments(acc, _chunk_moments(x[a:a + _STAT_CHUNK]))
+    n, mean, m2 = acc
+    return {
+        str(k): OnlineStat(int(n[j]), float(mean[j]), float(m2[j]))
+        for j, k in enumerate(names)
+        if n[j] > 0
+    }
+
+
+def batch_stats(batch: Batch, names: Optional[Sequence[str]] = None) -> Dict[str, OnlineStat]:
+    """Partial OnlineStats for any Batch shape; ``names`` is required for arrays."""
+    if isinstance(batch, np.ndarray):
+        if names is None:
+            raise ValueError("names are required for array batches")
+        return column_stats(batch, names)
+    if isinstance(batch, Mapping):
+        out: Dict[str, OnlineStat] = {}
+        for k, col in batch.items():
+            arr = np.asarray(col, dtype=np.float64).ravel()
+            out.update(column_stats(arr, [k]))
+        return out
+    # row dicts: one pass to columns, then the vectorized path
+    cols: Dict[str, List[float]] = {}
+    for sample in batch:
+        for k, v in sample.items():
+            if isinstance(v, (int, float)) and not isinstance(v, bool):
+                cols.setdefault(k, []).append(float(v))
+    return batch_stats({k: np.asarray(v) for k, v in cols.items()})
+
+
+class StatBuffer:
+    """
+    Resident OnlineStat table persisted as snapshot + append-only delta log:
+
+      staging.json    # {"stats": {...}, "updated": ..., "seq": N}  (snapshot)
+      staging.log     # one JSON line per batch: {"seq", "t", "stats"} (deltas)
+
+    A batch costs one merge per touched metric and one appended line, not a
+    rewrite of every stat. Every ``compact_every`` batches the table is folded
+    into a new snapshot (atomic rename) and the log is truncated. On load the
+    log is replayed past the snapshot's seq; a torn last line from a crash is
+    dropped, so the buffer always comes back as of the last complete batch.
+    """
+
+    def __init__(self, snapshot_path: Path, compact_every: int = 256):
+        self.snapshot_path = Path(snapshot_path)
+        self.log_path = self.snapshot_path.with_suffix(".log")
+        self.compact_every = max(1, int(compact_every))
+        self.stats: Dict[str, OnlineStat] = {}
+        self.updated: str = _now_iso()
+        self.seq = 0
+        self._pending = 0
+        self._load()
+
+    # ---------- persistence ----------
+
+    def _load(self) -> None:
+        snap_seq = 0
+        try:
+            doc = json.loads(self.snapshot_path.read_text(encoding="utf-8"))
+        except Exception:
+            doc = None
+        if isinstance(doc, dict):
+            self.stats = BaselineStore._map_to_online(cast(Dict[str, Any], doc.get("stats", {})))
+            self.updated = str(doc.get("updated", self.updated))
+            snap_seq = int(doc.get("seq", 0))
+        self.seq = snap_seq
+
+        if not self.log_path.exists():
+            return
+        good = 0
+        with open(self.log_path, "rb") as f:
+            for line in f:
+                try:
+                    rec = json.loads(line)
+                    seq = int(rec["seq"])
+                    delta = BaselineStore._map_to_online(rec.get("stats", {}))
+                except Exception:
+                    break  # torn tail: keep everything before it
+                good += len(line)
+                if seq <= snap_seq:
+                    continue  # already folded into the snapshot
+                self._apply(delta)
+                self.seq = seq
+                self.updated = str(rec.get("t", self.updated))
+                self._pending += 1
+        if good < self.log_path.stat().st_size:
+            with open(self.log_path, "r+b") as f:
+                f.truncate(good)
+
+    def _apply(self, delta: Mapping[str, OnlineStat]) -> None:
+        for k, d in delta.items():
+            cur = self.stats.get(k)
+            self.stats[k] = d if cur is None else cur.merge(d)
+
+    def append(self, delta: Mapping[str, OnlineStat]) -> None:
+        """Merge one batch's partial stats and log it durably."""
+        if not delta:
+            return
+        self.seq += 1
+        self.updated = _now_iso()
+        rec = {"seq": self.seq, "t": self.updated, "stats": {k: s.to_dict() for k, s in delta.items()}}
+        with open(self.log_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(rec, separators=(",", ":")) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self._apply(delta)
+        self._pending += 1
+        if self._pending >= self.compact_every:
+            self.compact()
+
+    def compact(self) -> None:
+        """Fold the log into a fresh snapshot, then truncate the log."""
+        doc = {"stats": self.to_dict(), "updated": self.updated, "seq": self.seq}
+        _atomic_write_text(self.snapshot_path, json.dumps(doc, separators=(",", ":")))
+        # a crash here leaves log records the snapshot already covers; seq skips them
+        with open(self.log_path, "w", encoding="utf-8"):
+            pass
+        self._pending = 0
+
+    def reset(self) -> None:
+        self.stats = {}
+        self.updated = _now_iso()
+        self.compact()
+
+    # ---------- views ----------
+
+    def to_dict(self) -> Dict[str, Dict[str, float]]:
+        return {k: s.to_dict() for k, s in self.stats.items()}
+
+    def __len__(self) -> int:
+        return len(self.stats)
+
+
 class BaselineStore:
     """
     Local Golden Baseline with three states:
@@ -61,12 +254,20 @@ class BaselineStore:
           golden/
             v0001.json
             v0002.json
-            active.json        # {"version": 2, "path": "..."}
-          staging.json         # pre-lock buffer
-          augment.json         # post-lock additive buffer
+            index.json         # per-version id / hash / counts, newest last
+            active.json        # {"version": 2, "path": "...", "hash": "..."}
+          staging.json         # pre-lock buffer (snapshot)
+          staging.log          # appended batch deltas since the snapshot
+          augment.json         # post-lock additive buffer (snapshot)
+          augment.log
+
+    Staging and augment stay resident as StatBuffers for the life of the
+    store; golden versions and active.json are written by atomic rename.
+    The active golden is cached in-process and reloaded only when active.json
+    or its version file changes (mtime) or the recorded hash differs.
     """
 
-    def __init__(self, data_dir: Path):
+    def __init__(self, data_dir: Path, compact_every: int = 256):
         self.data_dir = Path(data_dir)
         self.base = self.data_dir / "baseline"
         self.base.mkdir(parents=True, exist_ok=True)
@@ -75,11 +276,17 @@ class BaselineStore:
         self.staging_path = self.base / "staging.json"
         self.augment_path = self.base / "augment.json"
         self.active_path = self.golden_dir / "active.json"
+        self.index_path = self.golden_dir / "index.json"
+        self._active_key: Optional[Tuple[int, int, str]] = None
+        self._active: Dict[str, Any] = {}
+        self._arrays: Dict[Tuple[str, ...], Tuple[np.ndarray, np.ndarray]] = {}
 
+        self.staging = StatBuffer(self.staging_path, compact_every)
+        self.augment = StatBuffer(self.augment_path, compact_every)
         if not self.staging_path.exists():
-            self._save_json(self.staging_path, {"stats": {}, "updated": _now_iso()})
+            self.staging.compact()
         if not self.augment_path.exists():
-            self._save_json(self.augment_path, {"stats": {}, "updated": _now_iso()})
+            self.augment.compact()
         if not self.active_path.exists():
             self._save_json(self.active_path, {"version": 0})
 
@@ -95,134 +302,231 @@ class BaselineStore:
         return dict(default)
 
     def _save_json(self, path: Path, obj: Dict[str, Any]) -> None:
-        path.write_text(json.dumps(obj, indent=2), encoding="utf-8")
+        _atomic_write_text(path, json.dumps(obj, indent=2))
 
     # ---------- public summaries ----------
 
     def get_summary(self) -> Dict[str, Any]:
         active = self._load_json(self.active_path, {"version": 0})
-        staging = self._load_json(self.staging_path, {"stats": {}})
-        augment = self._load_json(self.augment_path, {"stats": {}})
+        version = int(active.get("version", 0))
 
         active_meta: Dict[str, Any] = {}
-        if int(active.get("version", 0)) > 0 and "path" in active:
-            try:
-                meta = self._load_json(Path(str(active["path"])), {})
-                stats = cast(Dict[str, Any], meta.get("stats", {}))
-                active_meta = {
-                    "id": meta.get("id"),
-                    "version": meta.get("version"),
-                    "hash": meta.get("hash"),
-                    "created": meta.get("created"),
-                    "note": meta.get("note", ""),
-                    "metricCount": len(stats),
-                    "sampleCount": sum(int(cast(Mapping[str, Any], s).get("n", 0)) for s in stats.values()),
-                }
-            except Exception:
+        if version > 0:
+            entry = self.versions().get(version)
+            if entry is not None:
+                active_meta = {k: entry.get(k) for k in ("id", "version", "hash", "created", "note", "metricCount", "sampleCount")}
+            else:
                 active_meta = {"error": "active metadata unreadable"}
 
         return {
             "active": active_meta or {"version": 0},
-            "staging_metricCount": len(cast(Dict[str, Any], staging.get("stats", {}))),
-            "augment_metricCount": len(cast(Dict[str, Any], augment.get("stats", {}))),
+            "staging_metricCount": len(self.staging),
+            "augment_metricCount": len(self.augment),
         }
 
     def load_active_golden(self) -> Dict[str, Any]:
+        """
+        The active golden document, cached until active.json or the version
+        file changes. The returned dict is shared; treat it as read-only.
+        """
+        try:
+            st_active = self.active_path.stat()
+        except OSError:
+            return {}
+        if self._active_key is not None and self._active_key[0] == st_active.st_mtime_ns:
+            try:
+                if Path(self._active_key[2]).stat().st_mtime_ns == self._active_key[1]:
+                    return self._active
+            except OSError:
+                pass
         active = self._load_json(self.active_path, {"version": 0})
         if int(active.get("version", 0)) == 0 or "path" not in active:
+            self._set_active(None, {})
             return {}
-        return self._load_json(Path(str(active["path"])), {})
+        vpath = Path(str(active["path"]))
+        meta = self._load_json(vpath, {})
+        if active.get("hash") and meta.get("hash") != active.get("hash"):
+            meta = {}  # version file does not match what was activated
+        try:
+            key = (st_active.st_mtime_ns, vpath.stat().st_mtime_ns, str(vpath))
+        except OSError:
+            key = None
+        self._set_active(key, meta)
+        return meta
+
+    def _set_active(self, key: Optional[Tuple[int, int, str]], meta: Dict[str, Any]) -> None:
+        if meta.get("hash") != self._active.get("hash"):
+            self._arrays.clear()
+        self._active_key = key if meta else None
+        self._active = meta
+
+    # ---------- scoring against the baseline ----------
+
+    def baseline_arrays(self, names: Sequence[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        ``(mean, std)`` float32 arrays aligned to ``names`` from the active
+        golden; NaN where a metric is missing or has fewer than two samples.
+        Cached per column order until the active golden changes.
+        """
+        stats = cast(Dict[str, Any], self.load_active_golden().get("stats", {}))
+        key = tuple(names)
+        hit = self._arrays.get(key)
+        if hit is not None:
+            return hit
+        mean = np.full(len(names), np.nan, dtype=np.float32)
+        std = np.full(len(names), np.nan, dtype=np.float32)
+        for j, name in enumerate(names):
+            st = stats.get(name)
+            if isinstance(st, Mapping):
+                s = OnlineStat.from_dict(st)
+                if s.n >= 2:
+                    mean[j] = s.mean
+                    std[j] = (s.M2 / (s.n - 1)) ** 0.5
+        std[std <= 0] = np.nan
+        self._arrays[key] = (mean, std)
+        return mean, std
+
+    def zscores(self, values: np.ndarray, names: Sequence[str]) -> np.ndarray:
+        """(N, M) z-scores of raw metric values against the active golden in one step."""
+        mean, std = self.baseline_arrays(names)
+        return ((np.asarray(values, dtype=np.float32) - mean) / std).astype(np.float32)
 
     # ---------- updating buffers ----------
 
-    def update_staging(self, batch: Iterable[Mapping[str, float]]) -> Dict[str, Any]:
-        doc = self._load_json(self.staging_path, {"stats": {}})
-        stats = self._map_to_online(cast(Dict[str, Any], doc.get("stats", {})))
-        for sample in batch:
-            for k, v in sample.items():
-                if isinstance(v, (int, float)):
-                    stats.setdefault(k, OnlineStat()).add(float(v))
-        out: Dict[str, Any] = {"stats": {k: s.to_dict() for k, s in stats.items()}, "updated": _now_iso()}
-        self._save_json(self.staging_path, out)
-        return out
-
-    def update_augment(self, batch: Iterable[Mapping[str, float]]) -> Dict[str, Any]:
-        doc = self._load_json(self.augment_path, {"stats": {}})
-        stats = self._map_to_online(cast(Dict[str, Any], doc.get("stats", {})))
-        for sample in batch:
-            for k, v in sample.items():
-                if isinstance(v, (int, float)):
-                    stats.setdefault(k, OnlineStat()).add(float(v))
-        out: Dict[str, Any] = {"stats": {k: s.to_dict() for k, s in stats.items()}, "updated": _now_iso()}
-        self._save_json(self.augment_path, out)
-        return out
+    def _update(self, buf: StatBuffer, batch: Batch, names: Optional[Sequence[str]], summary: bool) -> Dict[str, Any]:
+        delta = batch_stats(batch, names)
+        buf.append(delta)
+        if summary:
+            return {"ok": True, "updated": buf.updated, "seq": buf.seq, "metricCount": len(buf), "touched": len(delta)}
+        return {"stats": buf.to_dict(), "updated": buf.updated}
+
+    def update_staging(
+        self, batch: Batch, names: Optional[Sequence[str]] = None, *, summary: bool = False
+    ) -> Dict[str, Any]:
+        """
+        Fold a batch into staging: row dicts, a columnar ``{metric: values}``
+        mapping, or a (samples x metrics) array with ``names``. Returns
+        ``{"stats", "updated"}`` with the full buffer; ``summary=True`` returns
+        ``{"ok", "updated", "seq", "metricCount", "touched"}`` instead, which
+        skips serialising every stat on each call (bulk training loops).
+        """
+        return self._update(self.staging, batch, names, summary)
+
+    def update_augment(
+        self, batch: Batch, names: Optional[Sequence[str]] = None, *, summary: bool = False
+    ) -> Dict[str, Any]:
+        """As update_staging, for the post-lock augment buffer."""
+        return self._update(self.augment, batch, names, summary)
+
+    def staging_stats(self) -> Dict[str, Dict[str, float]]:
+        return self.staging.to_dict()
+
+    def augment_stats(self) -> Dict[str, Dict[str, float]]:
+        return self.augment.to_dict()
+
+    def compact(self) -> None:
+        """Fold both buffer logs into their snapshots (e.g. on shutdown)."""
+        self.staging.compact()
+        self.augment.compact()
 
     # ---------- promotions ----------
 
-    def promote_staging_to_golden(self, note: str = "") -> Dict[str, Any]:
-        staging = self._load_json(self.staging_path, {"stats": {}})
-        stats = cast(Dict[str, Any], staging.get("stats", {}))
+    def _write_golden(self, stats: Dict[str, Any], note: str) -> Dict[str, Any]:
         version = self._next_version()
         meta: Dict[str, Any] = {
             "id": f"golden-{_now_iso().replace(':','-')}",
             "version": version,
             "created": _now_iso(),
-            "note": note or "promoted from staging",
+            "note": note,
             "stats": stats,
         }
-        meta["hash"] = _sha256_of({"version": version, "stats": stats})
+        meta["hash"] = sha256_of({"version": version, "stats": stats})
         vpath = self.golden_dir / f"v{version:04d}.json"
         self._save_json(vpath, meta)
-        self._save_json(self.active_path, {"version": version, "path": str(vpath)})
-        self._save_json(self.staging_path, {"stats": {}, "updated": _now_iso()})
+        entry = {k: meta[k] for k in ("id", "version", "hash", "created", "note")}
+        entry.update({
+            "path": vpath.name,
+            "metricCount": len(stats),
+            "sampleCount": sum(int(cast(Mapping[str, Any], s).get("n", 0)) for s in stats.values()),
+        })
+        index = self._load_index()
+        index["versions"] = [e for e in index["versions"] if int(e.get("version", 0)) != version] + [entry]
+        index["latest"] = version
+        self._save_json(self.index_path, index)
+        self._save_json(self.active_path, {"version": version, "path": str(vpath), "hash": meta["hash"]})
+        self._set_active((self.active_path.stat().st_mtime_ns, vpath.stat().st_mtime_ns, str(vpath)), meta)
         return {"ok": True, "version": version, "path": str(vpath), "id": meta["id"], "hash": meta["hash"]}
 
+    def promote_staging_to_golden(self, note: str = "") -> Dict[str, Any]:
+        res = self._write_golden(self.staging.to_dict(), note or "promoted from staging")
+        self.staging.reset()
+        return res
+
     def apply_augment_to_new_golden(self, note: str = "") -> Dict[str, Any]:
         active = self.load_active_golden()
         if not active:
             return {"ok": False, "error": "no active golden to augment"}
-        augment = self._load_json(self.augment_path, {"stats": {}})
         merged_stats = self._merge_stats(
             cast(Dict[str, Any], active.get("stats", {})),
-            cast(Dict[str, Any], augment.get("stats", {})),
+            self.augment.to_dict(),
         )
-        version = self._next_version()
-        meta: Dict[str, Any] = {
-            "id": f"golden-{_now_iso().replace(':','-')}",
-            "version": version,
-            "created": _now_iso(),
-            "note": note or "golden + augment",
-            "stats": merged_stats,
-        }
-        meta["hash"] = _sha256_of({"version": version, "stats": merged_stats})
-        vpath = self.golden_dir / f"v{version:04d}.json"
-        self._save_json(vpath, meta)
-        self._save_json(self.active_path, {"version": version, "path": str(vpath)})
-        self._save_json(self.augment_path, {"stats": {}, "updated": _now_iso()})
-        return {"ok": True, "version": version, "path": str(vpath), "id": meta["id"], "hash": meta["hash"]}
+        res = self._write_golden(merged_stats, note or "golden + augment")
+        self.augment.reset()
+        return res
+
+    # ---------- version index ----------
+
+    def _load_index(self) -> Dict[str, Any]:
+        index = self._load_json(self.index_path, {})
+        if isinstance(index.get("versions"), list):
+            return index
+        return self._rebuild_index()
+
+    def _rebuild_index(self) -> Dict[str, Any]:
+        """One-off scan of v*.json for stores created before the index existed."""
+        versions: List[Dict[str, Any]] = []
+        for p in sorted(self.golden_dir.glob("v*.json")):
+            meta = self._load_json(p, {})
+            if "version" not in meta:
+                continue
+            stats = cast(Dict[str, Any], meta.get("stats", {}))
+            versions.append({
+                "id": meta.get("id"),
+                "version": int(meta["version"]),
+                "hash": meta.get("hash"),
+                "created": meta.get("created"),
+                "note": meta.get("note", ""),
+                "path": p.name,
+                "metricCount": len(stats),
+                "sampleCount": sum(int(cast(Mapping[str, Any], s).get("n", 0)) for s in stats.values()),
+            })
+        versions.sort(key=lambda e: e["version"])
+        index = {"versions": versions, "latest": versions[-1]["version"] if versions else 0}
+        self._save_json(self.index_path, index)
+        return index
+
+    def versions(self) -> Dict[int, Dict[str, Any]]:
+        """Index entries by version number (no version file is opened)."""
+        return {int(e["version"]): e for e in self._load_index()["versions"]}
 
     # ---------- resets ----------
 
     def reset_staging(self) -> Dict[str, Any]:
-        self._save_json(self.staging_path, {"stats": {}, "updated": _now_iso()})
+        self.staging.reset()
         return {"ok": True}
 
     def reset_augment(self) -> Dict[str, Any]:
-        self._save_json(self.augment_path, {"stats": {}, "updated": _now_iso()})
+        self.augment.reset()
         return {"ok": True}
 
     # ---------- internal helpers ----------
 
     def _next_version(self) -> int:
-        max_v = 0
-        for p in self.golden_dir.glob("v*.json"):
-            try:
-                v = int(p.stem.lstrip("v"))
-                if v > max_v:
-                    max_v = v
-            except Exception:
-                continue
-        return max_v + 1
+        v = int(self._load_index().get("latest", 0)) + 1
+        # a crash between writing a version file and the index must not reuse it
+        while (self.golden_dir / f"v{v:04d}.json").exists():
+            v += 1
+        return v
 
     @staticmethod
     def _map_to_online(d: Mapping[str, Any]) -> Dict[str, OnlineStat]:
@@ -0,0 +1,486 @@
+"""
+Reproducible performance benchmark (P12 CPU targets, P16 determinism).
+
+  python -m aesthetic.benchmark                 # run, compare to the stored baseline
+  python -m aesthetic.benchmark --save          # run and store as the new baseline
+  python -m aesthetic.benchmark --quick         # smallest case only
+
+Every case renders a synthetic clip with known cuts, camera moves and
+exposure levels (NumPy frames through cv2.VideoWriter, seeded, so the
+pixels are identical on every run), then times each pipeline stage on a
+cold cache, a warm re-analysis, selection, export and the BaselineStore
+update / promote paths. Cases run in a fresh spawned process so peak RSS
+belongs to that case alone.
+
+Results are compared with a JSON baseline from an earlier run on the same
+machine: a stage regresses when it gets slower (or lower fps) than the
+tolerance allows, a case when its peak memory grows, and determinism is
+broken when the selected shots differ for identical input.
+"""
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import math
+import multiprocessing as mp
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+from .config import DATA_DIR, config_section, load_config
+
+BENCH_VERSION = 1
+
+DEFAULTS: Dict[str, Any] = {
+    "resolutions": [[640, 360], [1280, 720], [1920, 1080]],
+    "durations_s": [12, 36],
+    "fps": 24,
+    "scene_s": [2.0, 4.0],       # scene lengths are drawn from this range
+    "seed": 7,
+    "sensitivity": 80,
+    "baseline_updates": 64,      # BaselineStore batches per case
+    "time_tolerance": 0.25,      # slower than baseline by more than this share is a regression
+    "min_delta_s": 0.1,          # ... and by at least this many seconds (timer noise on short stages)
+    "memory_tolerance": 0.20,
+}
+
+STAGES: Tuple[str, ...] = (
+    "fixture", "ingest", "scenes", "sampling", "metrics", "motion", "selection", "export",
+    "warm_analysis", "baseline_update", "baseline_promote",
+)
+# stages not compared: fixture rendering is not engine work
+_UNCHECKED = ("fixture",)
+
+_MOVES = ("static", "pan", "zoom", "handheld", "tilt")
+_GAINS = (1.0, 0.45, 1.6)   # normal, under, over
+
+
+def benchmark_options(cfg: Optional[Mapping[str, Any]] = None) -> Dict[str, Any]:
+    opts = dict(DEFAULTS)
+    opts.update(config_section(cfg, "benchmark"))
+    return opts
+
+
+def default_dir() -> Path:
+    return DATA_DIR / "benchmarks"
+
+
+# ---------- fixtures ----------
+
+def _texture(rng: np.random.Generator, h: int, w: int, scale: float, hue: int) -> np.ndarray:
+    """Blurred noise over a colour gradient: trackable detail, a distinct hue per scene."""
+    noise = rng.integers(0, 256, size=(h, w, 3), dtype=np.uint8)
+    tex = cv2.GaussianBlur(noise, (0, 0), max(1.0, 2.0 * scale))
+    tex = cv2.normalize(tex, None, 0, 255, cv2.NORM_MINMAX)
+    hsv = np.array([[[hue % 180, 200, 170]]], dtype=np.uint8)
+    base = cv2.cvtColor(hsv, cv2.COLOR_HSV2BGR)[0, 0].astype(np.float32)
+    ramp = np.linspace(0.6, 1.2, w, dtype=np.float32)[None, :, None]
+    grad = np.clip(base[None, None, :] * ramp, 0, 255)
+    return cv2.addWeighted(tex, 0.6, np.broadcast_to(grad, tex.shape).astype(np.uint8), 0.4, 0.0)
+
+
+def make_clip(
+    path: Path,
+    width: int,
+    height: int,
+    seconds: float,
+    fps: int = 24,
+    seed: int = 0,
+    scene_s: Sequence[float] = (2.0, 4.0),
+) -> Dict[str, Any]:
+    """
+    Render a synthetic clip and return its ground truth: per scene the frame
+    span, camera move (one of static, pan, zoom, handheld, tilt) and exposure
+    gain. Cuts are hard cuts between unrelated textures.
+    """
+    rng = np.random.default_rng(seed)
+    total = int(round(seconds * fps))
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*"MJPG"), float(fps), (width, height))
+    if not writer.isOpened():
+        raise RuntimeError(f"cannot open VideoWriter for {path}")
+    scale = width / 640.0
+    scenes: List[Dict[str, Any]] = []
+    start = 0
+    try:
+        while start < total:
+            length = min(total - start, int(rng.uniform(*scene_s) * fps))
+            if total - start - length < fps:
+                length = total - start   # no sliver scene at the end
+            i = len(scenes)
+            move, gain = _MOVES[i % len(_MOVES)], _GAINS[(i // len(_MOVES)) % len(_GAINS)]
+            step = 0.004 * width      # px per frame for pans and tilts
+            pad_x = int(math.ceil(step * length)) + 16 if move == "pan" else 32
+            pad_y = int(math.ceil(step * length)) + 16 if move == "tilt" else 32
+            tex = _texture(rng, height + pad_y, width + pad_x, scale, 67 * i)
+            shake = rng.normal(0.0, 0.004 * width, size=(length, 2))
+            for t in range(length):
+                x, y = 16, 16
+                if move == "pan":
+                    x = int(round(8 + step * t))
+                elif move == "tilt":
+                    y = int(round(8 + step * t))
+                elif move == "handheld":
+                    x = int(np.clip(16 + shake[t, 0], 0, pad_x))
+                    y = int(np.clip(16 + shake[t, 1], 0, pad_y))
+                if move == "zoom":
+                    s = 1.0 + 0.3 * t / max(1, length)
+                    cw, ch = int(width / s), int(height / s)
+                    x0, y0 = 16 + (width - cw) // 2, 16 + (height - ch) // 2
+                    frame = cv2.resize(tex[y0:y0 + ch, x0:x0 + cw], (width, height), interpolation=cv2.INTER_LINEAR)
+                else:
+                    frame = np.ascontiguousarray(tex[y:y + height, x:x + width])
+                if gain != 1.0:
+                    frame = cv2.convertScaleAbs(frame, alpha=gain)
+                writer.write(frame)
+            scenes.append({"start_frame": start, "end_frame": start + length, "move": move, "gain": gain})
+            start += length
+    finally:
+        writer.release()
+    return {"frames": total, "fps": fps, "width": width, "height": height, "scenes": scenes,
+            "cuts": [s["start_frame"] for s in scenes[1:]]}
+
+
+def cut_accuracy(truth: Sequence[int], found: Sequence[int], tolerance: int = 2) -> Dict[str, float]:
+    """Recall / precision of detected cut frames against the known ones."""
+    truth, found = sorted(truth), sorted(found)
+    hit = sum(1 for t in truth if any(abs(t - f) <= tolerance for f in found))
+    true_pos = sum(1 for f in found if any(abs(t - f) <= tolerance for t in truth))
+    return {
+        "cut_recall": round(hit / len(truth), 4) if truth else 1.0,
+        "cut_precision": round(true_pos / len(found), 4) if found else 1.0,
+    }
+
+
+def movement_accuracy(truth: Mapping[str, Any], analysis: Mapping[str, Any]) -> Optional[float]:
+    """Share of detected scenes whose movement tag matches the rendered move."""
+    motion = analysis.get("motion") or {}
+    if not motion:
+        return None
+    expect = {"static": {"static"}, "pan": {"pan"}, "tilt": {"tilt"}, "zoom": {"zoom_in", "zoom_out"}, "handheld": {"handheld"}}
+    hits = n = 0
+    for sc in analysis["scenes"]:
+        mid = (int(sc["start_frame"]) + int(sc["end_frame"])) // 2
+        src = next((t for t in truth["scenes"] if t["start_frame"] <= mid < t["end_frame"]), None)
+        rec = motion.get(str(int(sc["id"])))
+        if src is None or rec is None:
+            continue
+        n += 1
+        hits += rec["type"] in expect[src["move"]]
+    return round(hits / n, 4) if n else None
+
+
+# ---------- one case ----------
+
+def _fixture_hash(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return "sha256:" + h.hexdigest()
+
+
+def _shots_hash(shots: Any) -> str:
+    data = json.dumps(shots.to_dicts(), sort_keys=True, separators=(",", ":")).encode("utf-8")
+    return "sha256:" + hashlib.sha256(data).hexdigest()
+
+
+def run_case(case: Mapping[str, Any], cfg: Mapping[str, Any], workdir: str) -> Dict[str, Any]:
+    """Render, analyse, select, export and train for one case; returns its report."""
+    # heavy imports stay out of the parent process
+    from .agents.export import export_shots
+    from .agents.scoring import Ranker
+    from .baseline import BaselineStore
+    from .pipeline import analyze_source, make_selector, select_shots
+    from .profiling import Profiler
+    from .storage.cache import FrameCache
+
+    opts = benchmark_options(cfg)
+    root = Path(workdir)
+    prof = Profiler()
+    clip = root / f"{case['id']}.avi"
+    with prof.stage("fixture", frames=case["frames"]):
+        truth = make_clip(clip, case["width"], case["height"], case["seconds"], case["fps"], case["seed"], opts["scene_s"])
+
+    cache = FrameCache(root / "cache")
+    analysis = analyze_source(clip, cfg, cache, None, prof)
+    if not analysis.get("ok"):
+        return {"ok": False, "error": analysis.get("error", "analysis failed")}
+
+    with prof.stage("selection", frames=len(analysis["candidates"])):
+        ranker = Ranker(analysis["values"], analysis["names"])
+        selector = make_selector(analysis, cfg)
+        shots = select_shots(analysis, int(opts["sensitivity"]), None, ranker, selector)
+        # selection again from the same state must give the same shots
+        again = select_shots(analysis, int(opts["sensitivity"]), None, ranker, selector)
+
+    with prof.stage("export", frames=len(shots)):
+        exported = export_shots(clip, shots, root / "export", cfg, cache=cache,
+                                key=analysis["source_hash"], keyframes=analysis.get("keyframes"))
+
+    # warm: everything from the cache, no decode
+    warm = Profiler()
+    with prof.stage("warm_analysis", frames=case["frames"]):
+        rerun = analyze_source(clip, cfg, cache, None, warm)
+    warm_shots = select_shots(rerun, int(opts["sensitivity"]))
+
+    store = BaselineStore(root / "baseline")
+    updates = max(1, int(opts["baseline_updates"]))
+    rows = np.asarray(analysis["values"], dtype=np.float64)
+    with prof.stage("baseline_update", frames=updates * len(rows)):
+        for _ in range(updates):
+            store.update_staging(rows, analysis["names"], summary=True)
+            store.update_augment(rows, analysis["names"], summary=True)
+    with prof.stage("baseline_promote"):
+        store.promote_staging_to_golden("benchmark")
+        store.apply_augment_to_new_golden("benchmark")
+        store.zscores(rows, analysis["names"])
+
+    report = prof.report()
+    return {
+        "ok": True,
+        "case": dict(case),
+        "stages": report["stages"],
+        "peak_rss_mb": max((s.get("peak_rss_mb", 0.0) for s in report["stages"].values()), default=0.0),
+        "total_wall_s": report["total_wall_s"],
+        "accuracy": {
+            **cut_accuracy(truth["cuts"], [int(s["start_frame"]) for s in analysis["scenes"][1:]]),
+            "scenes_true": len(truth["scenes"]),
+            "scenes_found": len(analysis["scenes"]),
+            "movement": movement_accuracy(truth, analysis),
+        },
+        "determinism": {
+            "shots_hash": _shots_hash(shots),
+            "repeat_equal": _shots_hash(again) == _shots_hash(shots),
+            "warm_equal": _shots_hash(warm_shots) == _shots_hash(shots),
+        },
+        "export_ok": bool(exported.get("ok")),
+        "fixture_hash": _fixture_hash(clip),
+    }
+
+
+def _case_entry(case: Mapping[str, Any], cfg: Mapping[str, Any], queue: Any) -> None:
+    workdir = tempfile.mkdtemp(prefix="aesthetic-bench-")
+    try:
+        queue.put(run_case(case, cfg, workdir))
+    except Exception as e:  # reported, the suite goes on with the next case
+        queue.put({"ok": False, "case": dict(case), "error": f"{type(e).__name__}: {e}"})
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def _await_case(case: Mapping[str, Any], proc: Any, queue: Any, poll_s: float = 1.0) -> Dict[str, Any]:
+    """
+    The case's result, or a failure once its process is gone without one
+    (OOM kill, segfault in a native library) instead of blocking forever.
+    """
+    import queue as queue_mod
+
+    while True:
+        try:
+            return queue.get(timeout=poll_s)
+        except queue_mod.Empty:
+            if proc.is_alive():
+                continue
+        # exited: a result put just before exit may still be in the pipe
+        try:
+            return queue.get(timeout=poll_s)
+        except queue_mod.Empty:
+            proc.join()
+            return {"ok": False, "case": dict(case), "error": f"exit code {proc.exitcode}"}
+
+
+# ---------- suite ----------
+
+def plan_cases(opts: Mapping[str, Any], quick: bool = False) -> List[Dict[str, Any]]:
+    resolutions = [tuple(r) for r in opts["resolutions"]]
+    durations = [float(d) for d in opts["durations_s"]]
+    if quick:
+        resolutions, durations = resolutions[:1], durations[:1]
+    fps = int(opts["fps"])
+    cases = []
+    for w, h in resolutions:
+        for d in durations:
+            cases.append({
+                "id": f"{h}p-{int(d)}s",
+                "width": int(w),
+                "height": int(h),
+                "seconds": d,
+                "fps": fps,
+                "frames": int(round(d * fps)),
+                "seed": int(opts["seed"]),
+            })
+    return cases
+
+
+def config_digest(cfg: Mapping[str, Any]) -> str:
+    data = json.dumps(cfg, sort_keys=True, separators=(",", ":"), default=str).encode("utf-8")
+    return hashlib.sha256(data).hexdigest()[:16]
+
+
+def run_suite(
+    cfg: Optional[Mapping[str, Any]] = None,
+    quick: bool = False,
+    isolate: bool = True,
+    log: Any = None,
+) -> Dict[str, Any]:
+    cfg = dict(cfg or {})
+    opts = benchmark_options(cfg)
+    cases: Dict[str, Any] = {}
+    ctx = mp.get_context("spawn")
+    for case in plan_cases(opts, quick):
+        t0 = time.perf_counter()
+        if isolate:
+            queue = ctx.Queue()
+            proc = ctx.Process(target=_case_entry, args=(case, cfg, queue))
+            proc.start()
+            res = _await_case(case, proc, queue)
+            proc.join()
+        else:
+            q: List[Dict[str, Any]] = []
+            _case_entry(case, cfg, type("Q", (), {"put": staticmethod(q.append)})())
+            res = q[0]
+        cases[case["id"]] = res
+        if log is not None:
+            status = "ok" if res.get("ok") else f"FAILED {res.get('error')}"
+            log(f"{case['id']}: {status} ({time.perf_counter() - t0:.1f}s)")
+    from .profiling import Profiler
+
+    return {
+        "bench_version": BENCH_VERSION,
+        "created": datetime.now(timezone.utc).replace(microsecond=0).isoformat(),
+        "config_digest": config_digest(cfg),
+        "host": Profiler().report()["host"],
+        "cases": cases,
+    }
+
+
+def compare(results: Mapping[str, Any], baseline: Mapping[str, Any], opts: Optional[Mapping[str, Any]] = None) -> List[Dict[str, Any]]:
+    """
+    Regression flags of ``results`` against ``baseline``: ``{"case", "kind",
+    "stage", "baseline", "current", "change"}`` per flag. Cases missing from
+    either side are skipped; a changed config is reported once.
+    """
+    opts = dict(DEFAULTS, **(opts or {}))
+    t_tol, m_tol, min_dt = float(opts["time_tolerance"]), float(opts["memory_tolerance"]), float(opts["min_delta_s"])
+    flags: List[Dict[str, Any]] = []
+
+    def flag(case: str, kind: str, stage: Optional[str], base: Any, cur: Any) -> None:
+        change = None
+        if isinstance(base, (int, float)) and isinstance(cur, (int, float)) and base:
+            change = round(cur / base - 1.0, 4)
+        flags.append({"case": case, "kind": kind, "stage": stage, "baseline": base, "current": cur, "change": change})
+
+    if baseline.get("bench_version") != results.get("bench_version"):
+        flag("*", "version_changed", None, baseline.get("bench_version"), results.get("bench_version"))
+    if baseline.get("config_digest") != results.get("config_digest"):
+        flag("*", "config_changed", None, baseline.get("config_digest"), results.get("config_digest"))
+    for cid, cur in results.get("cases", {}).items():
+        base = baseline.get("cases", {}).get(cid)
+        if not base or not base.get("ok"):
+            continue
+        if not cur.get("ok"):
+            flag(cid, "failed", None, "ok", cur.get("error"))
+            continue
+        for stage, rec in cur["stages"].items():
+            b = base["stages"].get(stage)
+            if b is None or stage in _UNCHECKED:
+                continue
+            bw, cw = float(b.get("wall_s", 0.0)), float(rec.get("wall_s", 0.0))
+            if cw > bw * (1.0 + t_tol) and cw - bw >= min_dt:
+                flag(cid, "slower", stage, bw, cw)
+            bf, cf = b.get("fps"), rec.get("fps")
+            if bf and cf and cf < bf / (1.0 + t_tol) and cw - bw >= min_dt:
+                flag(cid, "fps", stage, bf, cf)
+        bm, cm = float(base.get("peak_rss_mb", 0.0)), float(cur.get("peak_rss_mb", 0.0))
+        if bm and cm > bm * (1.0 + m_tol):
+            flag(cid, "memory", None, bm, cm)
+        det = cur.get("determinism", {})
+        if not det.get("repeat_equal") or not det.get("warm_equal"):
+            flag(cid, "nondeterministic", "selection", True, False)
+        if base.get("fixture_hash") != cur.get("fixture_hash"):
+            # different pixels: timings still compare, shots and accuracy do not
+            flag(cid, "fixture_changed", None, base.get("fixture_hash"), cur.get("fixture_hash"))
+            continue
+        bh = base.get("determinism", {}).get("shots_hash")
+        if bh and bh != det.get("shots_hash") and baseline.get("config_digest") == results.get("config_digest"):
+            flag(cid, "shots_changed", "selection", bh, det.get("shots_hash"))
+        for k in ("cut_recall", "cut_precision"):
+            bv, cv = base.get("accuracy", {}).get(k), cur.get("accuracy", {}).get(k)
+            if bv is not None and cv is not None and cv < bv:
+                flag(cid, "accuracy", k, bv, cv)
+    return flags
+
+
+def summary_lines(results: Mapping[str, Any]) -> List[str]:
+    lines = []
+    for cid, res in results.get("cases", {}).items():
+        if not res.get("ok"):
+            lines.append(f"{cid:>12}  FAILED: {res.get('error')}")
+            continue
+        parts = []
+        for stage in STAGES:
+            rec = res["stages"].get(stage)
+            if rec is None:
+                continue
+            fps = f" {rec['fps']:.0f}fps" if rec.get("fps") else ""
+            parts.append(f"{stage} {rec['wall_s']:.2f}s{fps}")
+        acc = res["accuracy"]
+        lines.append(
+            f"{cid:>12}  peak {res['peak_rss_mb']:.0f} MB  cuts r{acc['cut_recall']:.2f}/p{acc['cut_precision']:.2f}"
+            f"  movement {acc['movement']}  |  " + ", ".join(parts)
+        )
+    return lines
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    ap = argparse.ArgumentParser(
+        prog="python -m aesthetic.benchmark",
+        description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    ap.add_argument("--quick", action="store_true", help="smallest resolution and duration only")
+    ap.add_argument("--save", action="store_true", help="store the results as the new baseline")
+    ap.add_argument("--baseline", type=Path, default=None, help="baseline JSON (default data/benchmarks/baseline.json)")
+    ap.add_argument("--out", type=Path, default=None, help="results JSON (default data/benchmarks/results-<time>.json)")
+    ap.add_argument("--in-process", action="store_true", help="do not spawn a process per case (peak RSS is then cumulative)")
+    args = ap.parse_args(argv)
+
+    cfg = load_config()
+    results = run_suite(cfg, quick=args.quick, isolate=not args.in_process, log=print)
+    for line in summary_lines(results):
+        print(line)
+
+    out_dir = default_dir()
+    out_dir.mkdir(parents=True, exist_ok=True)
+    out = args.out or out_dir / f"results-{results['created'].replace(':', '-')}.json"
+    out.write_text(json.dumps(results, indent=2), encoding="utf-8")
+    print(f"results: {out}")
+
+    baseline_path = args.baseline or out_dir / "baseline.json"
+    failed = any(not r.get("ok") for r in results["cases"].values())
+    if args.save:
+        baseline_path.write_text(json.dumps(results, indent=2), encoding="utf-8")
+        print(f"baseline saved: {baseline_path}")
+        return 1 if failed else 0
+    if not baseline_path.exists():
+        print(f"no baseline at {baseline_path}; run with --save to create one")
+        return 1 if failed else 0
+    flags = compare(results, json.loads(baseline_path.read_text(encoding="utf-8")), benchmark_options(cfg))
+    for f in flags:
+        change = f" ({f['change']:+.0%})" if f.get("change") is not None else ""
+        print(f"REGRESSION {f['case']} {f['kind']} {f['stage'] or ''}: {f['baseline']} -> {f['current']}{change}")
+    if not flags:
+        print("no regressions")
+    return 1 if flags or failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,14 +1,19 @@
 
 import os
 import json
+from functools import partial
 from typing import Any, Dict, List, Optional
 
+from aesthetic.runner import CANCELLED, DONE, FAILED, JobContext, JobRunner
+
 # Lightweight "bridge" that the Web UI calls. No HTTP server is started.
 # JS calls window.pywebview.api.<method>(...) and receives a Promise.
+# Jobs run on a background JobRunner; poll job_status() for progress.
 
 class AestheticAPI:
-    def __init__(self, root_dir: str):
+    def __init__(self, root_dir: str, max_jobs: int = 1):
         self.root_dir = root_dir
+        self.runner = JobRunner(max_jobs=max_jobs)
         self.data_dir = os.path.join(root_dir, "data")
         self.jobs_dir = os.path.join(self.data_dir, "jobs")
         self.baseline_dir = os.path.join(self.data_dir, "baseline")
@@ -53,6 +58,16 @@ class AestheticAPI:
         return {"ok": True}
 
     # --- Jobs ---
+    def _write_manifest(self, job_id: str, **fields: Any) -> None:
+        path = os.path.join(self.jobs_dir, job_id, "manifest.json")
+        manifest: Dict[str, Any] = {"job_id": job_id, "shots": []}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+        manifest.update(fields)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+
     def create_job(self, filename: str) -> Dict[str, Any]:
         # In a future pass, create a UUID and copy uploads to a job folder.
         job_id = filename.replace(" ", "_")
@@ -67,11 +82,13 @@ class AestheticAPI:
         }
         with open(os.path.join(job_dir, "manifest.json"), "w", encoding="utf-8") as f:
             json.dump(manifest, f, indent=2)
-        return {"ok": True, "job_id": job_id}
+        res = self.runner.submit(job_id, partial(self._run_job, job_id))
+        return {"ok": True, "job_id": job_id, "status": res.get("status", self.runner.state(job_id))}
 
-    def analyze(self, job_id: str, sensitivity: int = 50) -> Dict[str, Any]:
+    def _run_job(self, job_id: str, ctx: JobContext) -> Dict[str, Any]:
         # Stub: return a tiny mock so the UI can render cards while backend lands.
         # Replace with real pipeline calls in app/pipeline.py.
+        ctx.progress("analyze", 0.0)
         shots = []
         for i in range(1, 5):
             shots.append({
@@ -89,11 +106,38 @@ class AestheticAPI:
                 },
                 "totalScore": 80
             })
+        ctx.progress("analyze", 1.0)
         job_dir = os.path.join(self.jobs_dir, job_id)
         os.makedirs(job_dir, exist_ok=True)
         with open(os.path.join(job_dir, "shots.json"), "w", encoding="utf-8") as f:
-            json.dump(shots, f, indent=2)
-        return {"ok": True, "shots": shots}
+            json.dump(shots, f, separators=(",", ":"))
+        self._write_manifest(job_id, status="done", shots=shots)
+        return {"shots": shots}
+
+    def analyze(self, job_id: str, sensitivity: int = 50) -> Dict[str, Any]:
+        """
+        Shots once the job is done; otherwise (re)queues it and returns its
+        status. ``sensitivity`` mirrors app.API.analyze; the stub ignores it.
+        """
+        state = self.runner.state(job_id)
+        if state == DONE:
+            path = os.path.join(self.jobs_dir, job_id, "shots.json")
+            with open(path, "r", encoding="utf-8") as f:
+                return {"ok": True, "status": state, "shots": json.load(f)}
+        if state is None or state in (FAILED, CANCELLED):
+            res = self.runner.submit(job_id, partial(self._run_job, job_id))
+            if not res.get("ok"):
+                return res
+        return {"ok": True, "job_id": job_id, "status": self.runner.state(job_id), "shots": None}
+
+    def job_status(self, job_id: str, since: int = 0) -> Dict[str, Any]:
+        return self.runner.status(job_id, since)
+
+    def cancel_job(self, job_id: str) -> Dict[str, Any]:
+        res = self.runner.cancel(job_id)
+        if res.get("ok") and res.get("status") == CANCELLED:
+            self._write_manifest(job_id, status="cancelled")
+        return res
 
     def export_manifest(self, job_id: str) -> Dict[str, Any]:
         job_dir = os.path.join(self.jobs_dir, job_id)
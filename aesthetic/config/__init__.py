@@ -1,7 +1,13 @@
 # aesthetic/config/__init__.py
+import copy
+import threading
 from pathlib import Path
-from typing import Dict, Any
-import yaml
+from typing import Dict, Any, Mapping, Optional, Tuple
+
+# Imported by everything, so it stays cheap: no yaml until a config is
+# actually parsed, no filesystem writes at import time (ensure_data_dirs()
+# is called by whatever first writes there), and the parsed config is cached
+# until config.yaml changes on disk.
 
 # repo layout anchors
 PKG_DIR = Path(__file__).resolve().parent          # .../aesthetic/config
@@ -13,16 +19,39 @@ BASELINE_DIR = DATA_DIR / "baseline"                # .../aesthetic/data/baselin
 BASELINE_PATH = BASELINE_DIR / "baseline.json"      # canonical baseline
 CONFIG_PATH = BASE_DIR / "config" / "config.yaml"   # .../aesthetic/config/config.yaml
 
-# ensure dirs exist
-for d in (DATA_DIR, OUTPUTS_DIR, BASELINE_DIR):
-    d.mkdir(parents=True, exist_ok=True)
+_lock = threading.Lock()
+_parsed: Dict[Path, Tuple[Tuple[int, int], Dict[str, Any]]] = {}   # path -> ((mtime_ns, size), cfg)
+
+
+def ensure_data_dirs() -> None:
+    for d in (DATA_DIR, OUTPUTS_DIR, BASELINE_DIR):
+        d.mkdir(parents=True, exist_ok=True)
+
+
+def load_config(path: Path = CONFIG_PATH) -> Dict[str, Any]:
+    """Parsed config.yaml; re-read only when the file changes. Callers get their own copy."""
+    try:
+        st = path.stat()
+    except OSError:
+        return {}
+    stamp = (st.st_mtime_ns, st.st_size)
+    with _lock:
+        hit = _parsed.get(path)
+        if hit is None or hit[0] != stamp:
+            import yaml
+
+            with open(path, "r", encoding="utf-8") as f:
+                data = yaml.safe_load(f) or {}
+            hit = _parsed[path] = (stamp, data)
+    return copy.deepcopy(hit[1])
 
-def load_config() -> Dict[str, Any]:
-    if CONFIG_PATH.exists():
-        with open(CONFIG_PATH, "r", encoding="utf-8") as f:
-            data = yaml.safe_load(f) or {}
-        return data
-    return {}
 
 def to_yaml(cfg: Dict[str, Any]) -> str:
+    import yaml
+
     return yaml.safe_dump(cfg or {}, sort_keys=False, allow_unicode=True)
+
+
+def config_section(cfg: Optional[Mapping[str, Any]], name: str) -> Dict[str, Any]:
+    section = (cfg or {}).get(name)
+    return dict(section) if isinstance(section, Mapping) else {}
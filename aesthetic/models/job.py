@@ -1 +1,232 @@
-# TODO: pydantic models for jobs and results
+from __future__ import annotations
+
+import io
+import json
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Mapping, Optional, Sequence, Union
+
+import numpy as np
+
+from ..agents.motion import MOVEMENT_TYPES
+from ..agents.scoring import CATEGORIES
+from ..storage.columnar import CANDIDATE_DTYPE
+from .scores import CategoryScores, ShotRecord
+
+try:  # optional: several times faster than json for manifests
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None  # type: ignore[assignment]
+
+# Job-level records: candidates and shots as structured numpy arrays.
+#
+# A job can carry 100k candidates; as dicts that is ~1 KB each before any
+# scores, as CANDIDATE_DTYPE rows it is 32 bytes, and the same bytes go to
+# the columnar store and to to_bytes() unchanged. Constructors taking arrays
+# trust their input (they are fed by the pipeline); from_records / from_dicts
+# validate and are what the bridge uses for anything from outside.
+
+SHOT_DTYPE = np.dtype([
+    ("id", np.int64),                              # scene id
+    ("frame", np.int64),
+    ("start", np.float64),
+    ("end", np.float64),
+    ("total", np.float32),
+    ("scores", np.float32, (len(CATEGORIES),)),    # NaN = category without metrics
+    ("movement", np.int8),                         # index into MOVEMENT_TYPES, -1 = unknown
+])
+
+_MOVEMENT = {m: i for i, m in enumerate(MOVEMENT_TYPES)}
+
+
+def to_bytes(arr: np.ndarray) -> bytes:
+    """``.npy`` bytes of a structured array (header + raw rows, no pickle)."""
+    buf = io.BytesIO()
+    np.save(buf, arr, allow_pickle=False)
+    return buf.getvalue()
+
+
+def from_bytes(data: bytes, dtype: np.dtype) -> np.ndarray:
+    arr = np.load(io.BytesIO(data), allow_pickle=False)
+    if arr.dtype != dtype:
+        raise ValueError(f"expected {dtype}, got {arr.dtype}")
+    return arr
+
+
+class CandidateTable:
+    """Candidate frames of one job (CANDIDATE_DTYPE rows)."""
+
+    __slots__ = ("array",)
+
+    def __init__(self, array: np.ndarray):
+        self.array = array
+
+    @classmethod
+    def from_columns(
+        cls, scene_id: Sequence[int], frame: Sequence[int], fps: float, ids: Optional[Sequence[int]] = None
+    ) -> "CandidateTable":
+        arr = np.zeros(len(frame), dtype=CANDIDATE_DTYPE)
+        arr["id"] = np.arange(1, len(frame) + 1) if ids is None else ids
+        arr["scene_id"] = scene_id
+        arr["frame"] = frame
+        arr["time"] = arr["frame"] / fps if fps else 0.0
+        return cls(arr)
+
+    @classmethod
+    def from_records(cls, records: Sequence[Mapping[str, Any]]) -> "CandidateTable":
+        """Validating constructor from ``{"id", "scene_id", "frame", "time"}`` dicts."""
+        arr = np.zeros(len(records), dtype=CANDIDATE_DTYPE)
+        for i, r in enumerate(records):
+            try:
+                arr[i] = (int(r["id"]), int(r["scene_id"]), int(r["frame"]), float(r.get("time", 0.0)))
+            except (KeyError, TypeError, ValueError) as e:
+                raise ValueError(f"invalid candidate {i}: {e}") from None
+        if (arr["frame"] < 0).any():
+            raise ValueError("candidate frames must be >= 0")
+        return cls(arr)
+
+    def __len__(self) -> int:
+        return len(self.array)
+
+    def __getitem__(self, i: int) -> Dict[str, Any]:
+        r = self.array[i]
+        return {"id": int(r["id"]), "scene_id": int(r["scene_id"]), "frame": int(r["frame"]), "time": float(r["time"])}
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        return (self[i] for i in range(len(self)))
+
+    @property
+    def ids(self) -> np.ndarray:
+        return self.array["id"]
+
+    @property
+    def scene_id(self) -> np.ndarray:
+        return self.array["scene_id"]
+
+    @property
+    def frame(self) -> np.ndarray:
+        return self.array["frame"]
+
+    @property
+    def time(self) -> np.ndarray:
+        return self.array["time"]
+
+    def take(self, rows: np.ndarray, renumber: bool = False) -> "CandidateTable":
+        arr = self.array[rows].copy()
+        if renumber:
+            arr["id"] = np.arange(1, len(arr) + 1)
+        return CandidateTable(arr)
+
+    def to_records(self) -> List[Dict[str, Any]]:
+        return list(self)
+
+    def to_bytes(self) -> bytes:
+        return to_bytes(self.array)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "CandidateTable":
+        return cls(from_bytes(data, CANDIDATE_DTYPE))
+
+
+class ShotTable:
+    """Selected shots of one job, best first (SHOT_DTYPE rows)."""
+
+    __slots__ = ("array",)
+
+    def __init__(self, array: np.ndarray):
+        self.array = array
+
+    @classmethod
+    def from_selection(
+        cls,
+        candidates: CandidateTable,
+        scenes: Sequence[Mapping[str, Any]],
+        rows: np.ndarray,
+        total: np.ndarray,
+        categories: CategoryScores,
+        motion: Optional[Mapping[str, Mapping[str, Any]]] = None,
+    ) -> "ShotTable":
+        """Shots for candidate ``rows``; ``categories`` holds the matching (len(rows), C) scores."""
+        arr = np.zeros(len(rows), dtype=SHOT_DTYPE)
+        scene_ids = candidates.scene_id[rows]
+        spans = {int(s["id"]): (float(s.get("start", 0.0)), float(s.get("end", 0.0))) for s in scenes}
+        arr["id"] = scene_ids
+        arr["frame"] = candidates.frame[rows]
+        arr["total"] = total[rows]
+        arr["scores"] = categories.values
+        arr["movement"] = -1
+        for i, sid in enumerate(scene_ids.tolist()):
+            arr["start"][i], arr["end"][i] = spans.get(sid, (0.0, 0.0))
+            move = (motion or {}).get(str(sid))
+            if move is not None:
+                arr["movement"][i] = _MOVEMENT.get(move.get("type", ""), -1)
+        return cls(arr)
+
+    @classmethod
+    def from_dicts(cls, shots: Sequence[Any]) -> "ShotTable":
+        """Validating constructor from UI-shaped shot dicts; raises ValueError."""
+        arr = np.zeros(len(shots), dtype=SHOT_DTYPE)
+        for i, d in enumerate(shots):
+            rec = ShotRecord.from_dict(d)
+            if rec.movement and rec.movement not in _MOVEMENT:
+                raise ValueError(f"unknown movement type {rec.movement!r}")
+            arr[i] = (rec.id, rec.frame, rec.start, rec.end, rec.total, rec.scores, _MOVEMENT.get(rec.movement, -1))
+        return cls(arr)
+
+    def __len__(self) -> int:
+        return len(self.array)
+
+    def __getitem__(self, i: int) -> ShotRecord:
+        r = self.array[i]
+        m = int(r["movement"])
+        return ShotRecord(
+            int(r["id"]), float(r["start"]), float(r["end"]), int(r["frame"]), float(r["total"]),
+            r["scores"], MOVEMENT_TYPES[m] if m >= 0 else "",
+        )
+
+    def __iter__(self) -> Iterator[ShotRecord]:
+        return (self[i] for i in range(len(self)))
+
+    def to_dicts(self) -> List[Dict[str, Any]]:
+        return [rec.to_dict() for rec in self]
+
+    def to_bytes(self) -> bytes:
+        return to_bytes(self.array)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "ShotTable":
+        return cls(from_bytes(data, SHOT_DTYPE))
+
+
+# ---------- serialization ----------
+
+def _default(obj: Any) -> Any:
+    if hasattr(obj, "to_dicts"):
+        return obj.to_dicts()
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, Path):
+        return str(obj)
+    raise TypeError(f"{type(obj).__name__} is not JSON serializable")
+
+
+def dumps(obj: Any, indent: bool = False) -> bytes:
+    """
+    UTF-8 JSON for manifests and sidecars. Record tables, numpy arrays and
+    scalars are serialised natively; orjson is used when installed.
+    """
+    if orjson is not None:
+        opt = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+        if indent:
+            opt |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, default=_default, option=opt)
+    if indent:
+        return json.dumps(obj, default=_default, indent=2).encode("utf-8")
+    return json.dumps(obj, default=_default, separators=(",", ":")).encode("utf-8")
+
+
+def write_json(path: Union[str, Path], obj: Any, indent: bool = False) -> Path:
+    path = Path(path)
+    path.write_bytes(dumps(obj, indent))
+    return path
@@ -1 +1,131 @@
-# TODO: score DTOs and validation
+from __future__ import annotations
+
+import math
+from typing import Any, Dict, Iterator, List, Mapping, Sequence
+
+import numpy as np
+
+from ..agents.scoring import CATEGORIES
+
+# Per-category scores as one (N, C) float32 matrix instead of N nested
+# {"exposure": {"total": 82}, ...} dicts. The nested form is what the web UI
+# renders, so it is produced only at the bridge (to_dicts) for the handful of
+# rows that leave the process; NaN marks a category without metrics and is
+# left out there, as before.
+
+_COL = {c: i for i, c in enumerate(CATEGORIES)}
+
+
+def score_dict(row: np.ndarray) -> Dict[str, Dict[str, int]]:
+    """One (C,) row as ``{"exposure": {"total": 82}, ...}``."""
+    return {c: {"total": int(round(float(v)))} for c, v in zip(CATEGORIES, row) if not math.isnan(v)}
+
+
+class CategoryScores:
+    __slots__ = ("values",)
+
+    def __init__(self, values: np.ndarray):
+        # trusted: built from the Ranker's matrix, no checks on the hot path
+        self.values = values
+
+    @classmethod
+    def empty(cls, n: int = 0) -> "CategoryScores":
+        return cls(np.full((n, len(CATEGORIES)), np.nan, dtype=np.float32))
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def take(self, rows: np.ndarray) -> "CategoryScores":
+        return CategoryScores(np.ascontiguousarray(self.values[rows]))
+
+    def to_dicts(self) -> List[Dict[str, Dict[str, int]]]:
+        return [score_dict(row) for row in self.values]
+
+    @classmethod
+    def from_dicts(cls, rows: Sequence[Mapping[str, Any]]) -> "CategoryScores":
+        """Validating inverse of to_dicts, for scores that come from outside."""
+        out = cls.empty(len(rows))
+        for i, row in enumerate(rows):
+            out.values[i] = parse_scores(row)
+        return out
+
+
+def parse_scores(row: Any) -> np.ndarray:
+    """
+    One ``{"exposure": {"total": 82} | 82, ...}`` mapping as a (C,) row.
+    Raises ValueError on unknown categories or non-numeric totals.
+    """
+    if not isinstance(row, Mapping):
+        raise ValueError(f"scores must be a mapping, got {type(row).__name__}")
+    out = np.full(len(CATEGORIES), np.nan, dtype=np.float32)
+    for cat, v in row.items():
+        if cat not in _COL:
+            raise ValueError(f"unknown category {cat!r}")
+        total = v.get("total") if isinstance(v, Mapping) else v
+        if isinstance(total, bool) or not isinstance(total, (int, float)):
+            raise ValueError(f"score for {cat!r} must be a number")
+        out[_COL[cat]] = float(total)
+    return out
+
+
+class ShotRecord:
+    """One selected shot; the row type of models.job.ShotTable."""
+
+    __slots__ = ("id", "start", "end", "frame", "total", "scores", "movement")
+
+    def __init__(
+        self,
+        id: int,
+        start: float,
+        end: float,
+        frame: int,
+        total: float,
+        scores: np.ndarray,
+        movement: str = "",
+    ):
+        self.id = id
+        self.start = start
+        self.end = end
+        self.frame = frame
+        self.total = total
+        self.scores = scores
+        self.movement = movement
+
+    def __iter__(self) -> Iterator[Any]:
+        return iter((self.id, self.start, self.end, self.frame, self.total, self.scores, self.movement))
+
+    def __repr__(self) -> str:
+        return f"ShotRecord(id={self.id}, frame={self.frame}, total={self.total:.1f}, movement={self.movement!r})"
+
+    def to_dict(self) -> Dict[str, Any]:
+        """The shape the web UI and manifests use."""
+        out: Dict[str, Any] = {
+            "id": int(self.id),
+            "start": float(self.start),
+            "end": float(self.end),
+            "frame": int(self.frame),
+            "totalScore": int(round(float(self.total))),
+            "scores": score_dict(self.scores),
+        }
+        if self.movement:
+            out["movement"] = self.movement
+        return out
+
+    @classmethod
+    def from_dict(cls, d: Any) -> "ShotRecord":
+        """Validating constructor for shots that cross the boundary; raises ValueError."""
+        if not isinstance(d, Mapping):
+            raise ValueError(f"shot must be a mapping, got {type(d).__name__}")
+        try:
+            start, end = float(d.get("start", 0.0)), float(d.get("end", 0.0))
+            total = float(d.get("totalScore", d.get("total", 0.0)))
+            sid, frame = int(d["id"]), int(d.get("frame", 0))
+        except (KeyError, TypeError, ValueError) as e:
+            raise ValueError(f"invalid shot: {e}") from None
+        if end < start:
+            raise ValueError(f"shot {sid} ends before it starts")
+        movement = d.get("movement") or ""
+        if not isinstance(movement, str):
+            raise ValueError(f"shot {sid} movement must be a string")
+        return cls(sid, start, end, frame, total, parse_scores(d.get("scores") or {}), movement)
+
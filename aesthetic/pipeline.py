@@ -0,0 +1,476 @@
+from __future__ import annotations
+
+import hashlib
+import json
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Mapping, Optional, Tuple, Union
+
+import numpy as np
+
+from .agents.detection import DETECTION_NAMES, DETECTION_VERSION, detect, detection_columns, detection_options
+from .agents.detection import layout_vectors
+from .agents.ingest import keyframe_index, probe, read_frames
+from .agents.metrics import ENGINE_VERSION, METRIC_NAMES
+from .agents.motion import MOTION_NAMES, MOTION_VERSION, analyze_motion, motion_columns, motion_options
+from .agents.sampling import sample_candidates, sampling_options
+from .agents.scenes import detect_scenes, scene_options
+from .agents.scoring import Ranker, split_weights
+from .agents.selection import Selector, selection_options
+from .agents.signatures import EMBED_DIM, SIGNATURE_VERSION
+from .agents.signatures import compute as compute_signatures
+from .agents.workers import ScoringPool, score_frames
+from .config import config_section
+from .models.job import CandidateTable, ShotTable
+from .models.scores import CategoryScores
+from .profiling import Profiler, metric_costs
+from .storage.cache import FrameCache
+from .storage.signature_index import SignatureIndex
+
+# Ingest -> Scenes -> Sampling -> Metrics (+ Detection, + Motion per scene) -> Selection
+#
+# analyze_source() runs everything that touches pixels and returns a plain
+# dict holding the raw metric matrix; select_shots() turns that into ranked
+# shots. With a FrameCache, scene lists, candidate frames and metric tables
+# are reused across runs, so re-ranking a reel with another sensitivity or
+# other weights never decodes video again. An optional progress callback is
+# called per decoded block / scored chunk, which is also where a background
+# job gets cancelled.
+
+PathLike = Union[str, Path]
+# progress(stage, fraction); raising from it aborts the run (job cancellation)
+ProgressFn = Callable[[str, float], None]
+
+_DECODE_CHUNK = 32  # candidate frames held in memory per scoring call
+
+
+def _opts_digest(obj: Any) -> str:
+    data = json.dumps(obj, sort_keys=True, separators=(",", ":"), default=str).encode("utf-8")
+    return hashlib.sha256(data).hexdigest()[:16]
+
+
+# ---------- stages ----------
+
+def scenes_stage(
+    source: PathLike,
+    cfg: Mapping[str, Any],
+    cache: Optional[FrameCache],
+    key: str,
+    progress: Optional[ProgressFn] = None,
+) -> Dict[str, Any]:
+    name = "scenes-" + _opts_digest(scene_options(cfg))
+    if cache is not None:
+        hit = cache.get_json(key, name)
+        if hit is not None and hit.get("ok"):
+            if progress is not None:
+                progress("scenes", 1.0)
+            hit["cached"] = True
+            return hit
+    res = detect_scenes(source, cfg, progress=(lambda f: progress("scenes", f)) if progress is not None else None)
+    if cache is not None and res.get("ok"):
+        cache.put_json(key, name, res)
+    res["cached"] = False
+    return res
+
+
+def sampling_stage(
+    source: PathLike,
+    scenes: List[Mapping[str, Any]],
+    fps: float,
+    cfg: Mapping[str, Any],
+    cache: Optional[FrameCache],
+    key: str,
+    progress: Optional[ProgressFn] = None,
+) -> Tuple[CandidateTable, Optional[List[int]], Dict[str, Any]]:
+    """
+    Kept candidates, the source's keyframe index and sampling stats. Proxy
+    figures and the keyframe index are cached per source. Nothing is decoded
+    at full resolution here: the metrics stage decodes (and caches) survivors.
+    """
+    opts = sampling_options(cfg)
+    keyframes: Optional[List[int]] = None
+    stats = None
+    name = "sampling-" + _opts_digest({"proxy_height": opts["proxy_height"]})
+    if cache is not None:
+        hit = cache.get_json(key, "keyframes")
+        if hit is not None:
+            keyframes = hit.get("frames") or None
+        else:
+            keyframes = keyframe_index(source, fps)
+            cache.put_json(key, "keyframes", {"frames": keyframes or []})
+        stats = cache.get_json(key, name)
+    else:
+        keyframes = keyframe_index(source, fps)
+    candidates, info = sample_candidates(
+        source,
+        scenes,
+        fps,
+        opts,
+        stats=stats,
+        keyframes=keyframes,
+        progress=(lambda f: progress("sampling", f)) if progress is not None else None,
+    )
+    proxy = info.pop("proxy", None)
+    if cache is not None and proxy is not None and info["decoded"]:
+        cache.put_json(key, name, proxy)
+    info["keyframes"] = len(keyframes) if keyframes else 0
+    return candidates, keyframes, info
+
+
+def motion_stage(
+    source: PathLike,
+    scenes: List[Mapping[str, Any]],
+    fps: float,
+    cfg: Mapping[str, Any],
+    cache: Optional[FrameCache],
+    key: str,
+    keyframes: Optional[List[int]] = None,
+    progress: Optional[ProgressFn] = None,
+) -> Dict[str, Any]:
+    """Per-scene camera movement, cached per source, motion options and scene spans."""
+    opts = motion_options(cfg)
+    spans = [(int(s["id"]), int(s["start_frame"]), int(s["end_frame"])) for s in scenes]
+    name = "motion-" + _opts_digest({"opts": {k: v for k, v in opts.items() if k != "workers"}, "spans": spans})
+    if cache is not None:
+        hit = cache.get_json(key, name)
+        if hit is not None and hit.get("version") == MOTION_VERSION:
+            if progress is not None:
+                progress("motion", 1.0)
+            hit["cached"] = True
+            return hit
+    res = analyze_motion(
+        source,
+        scenes,
+        fps,
+        cfg,
+        keyframes,
+        (lambda f: progress("motion", f)) if progress is not None else None,
+    )
+    if cache is not None:
+        cache.put_json(key, name, res)
+    res["cached"] = False
+    return res
+
+
+def _lookup(cached_frames: np.ndarray, wanted: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """``(found mask, positions)`` of ``wanted`` frames in a sorted cached frame column."""
+    if len(cached_frames) == 0:
+        return np.zeros(len(wanted), dtype=bool), np.zeros(len(wanted), dtype=np.int64)
+    pos = np.clip(np.searchsorted(cached_frames, wanted), 0, len(cached_frames) - 1)
+    return cached_frames[pos] == wanted, pos
+
+
+def metrics_stage(
+    source: PathLike,
+    frames: List[int],
+    cfg: Mapping[str, Any],
+    cache: Optional[FrameCache],
+    key: str,
+    progress: Optional[ProgressFn] = None,
+    keyframes: Optional[List[int]] = None,
+) -> Tuple[np.ndarray, Dict[str, np.ndarray], Optional[Dict[str, np.ndarray]], Dict[str, Any]]:
+    """
+    (len(frames), M) raw metric matrix, per-candidate signatures (``phash``,
+    ``embed``), detections (``saliency``, ``faces``; None when disabled) and
+    cache / execution stats. Frames are decoded only for candidates missing
+    from any cached table.
+    """
+    values = np.zeros((len(frames), len(METRIC_NAMES)), dtype=np.float32)
+    sigs = {
+        "phash": np.zeros(len(frames), dtype=np.uint64),
+        "embed": np.zeros((len(frames), EMBED_DIM), dtype=np.float32),
+    }
+    rows: Dict[int, List[int]] = {}
+    for i, f in enumerate(frames):
+        rows.setdefault(int(f), []).append(i)
+    wanted = np.array(sorted(rows), dtype=np.int64)
+
+    # one table read per source instead of one sidecar per candidate
+    need_metrics = np.ones(len(wanted), dtype=bool)
+    table = cache.get_metrics_table(key, ENGINE_VERSION) if cache is not None else None
+    if table is not None and list(table[1]) == list(METRIC_NAMES):
+        found, pos = _lookup(table[0], wanted)
+        for f, p in zip(wanted[found].tolist(), pos[found].tolist()):
+            values[rows[f]] = table[2][p]
+        need_metrics = ~found
+
+    need_sigs = np.ones(len(wanted), dtype=bool)
+    stable = cache.get_signatures(key, SIGNATURE_VERSION) if cache is not None else None
+    if stable is not None:
+        found, pos = _lookup(stable[0], wanted)
+        for f, p in zip(wanted[found].tolist(), pos[found].tolist()):
+            sigs["phash"][rows[f]] = stable[1][p]
+            sigs["embed"][rows[f]] = stable[2][p]
+        need_sigs = ~found
+
+    det_opts = detection_options(cfg)
+    det: Optional[Dict[str, np.ndarray]] = None
+    det_version = ""
+    need_det = np.zeros(len(wanted), dtype=bool)
+    if det_opts["enabled"]:
+        size, k = int(det_opts["map_size"]), int(det_opts["max_faces"])
+        det = {
+            "saliency": np.zeros((len(frames), size, size), dtype=np.uint8),
+            "faces": np.full((len(frames), k, 4), np.nan, dtype=np.float32),
+        }
+        det_version = f"{DETECTION_VERSION}-{_opts_digest({k: v for k, v in det_opts.items() if k != 'workers'})}"
+        need_det[:] = True
+        dtable = cache.get_detections(key, det_version) if cache is not None else None
+        if dtable is not None:
+            found, pos = _lookup(dtable[0], wanted)
+            for f, p in zip(wanted[found].tolist(), pos[found].tolist()):
+                det["saliency"][rows[f]] = dtable[1][p]
+                det["faces"][rows[f]] = dtable[2][p]
+            need_det = ~found
+
+    missing_metrics = set(wanted[need_metrics].tolist())
+    missing_sigs = set(wanted[need_sigs].tolist())
+    missing_det = set(wanted[need_det].tolist())
+    missing = sorted(missing_metrics | missing_sigs | missing_det)
+    info: Dict[str, Any] = {
+        "metric_hits": len(rows) - len(missing_metrics),
+        "metric_misses": len(missing_metrics),
+        "signature_misses": len(missing_sigs),
+        "detection_misses": len(missing_det),
+        "frame_hits": 0,
+    }
+    timing: Dict[str, float] = {}
+    execution: List[Dict[str, Any]] = []
+    fresh_frames: List[int] = []
+    fresh_rows: List[np.ndarray] = []
+    sig_frames: List[int] = []
+    sig_parts: List[Dict[str, np.ndarray]] = []
+    det_frames: List[int] = []
+    det_parts: List[Dict[str, np.ndarray]] = []
+    done = [0]
+    if progress is not None:
+        progress("metrics", 0.0 if missing else 1.0)
+
+    def flush(batch: List[Tuple[int, np.ndarray]]) -> None:
+        if not batch:
+            return
+        todo = [(f, fr) for f, fr in batch if f in missing_metrics]
+        if todo:
+            res = score_frames(np.stack([fr for _, fr in todo]), cfg, scoring)
+            for (f, _), row in zip(todo, res["values"]):
+                values[rows[f]] = row
+                fresh_frames.append(f)
+                fresh_rows.append(row)
+            for k, v in res["timing"].items():
+                timing[k] = timing.get(k, 0.0) + float(v)
+            execution.append(res.get("execution", {}))
+        todo = [(f, fr) for f, fr in batch if f in missing_sigs]
+        if todo:
+            part = compute_signatures(np.stack([fr for _, fr in todo]))
+            for i, (f, _) in enumerate(todo):
+                sigs["phash"][rows[f]] = part["phash"][i]
+                sigs["embed"][rows[f]] = part["embed"][i]
+            sig_frames.extend(f for f, _ in todo)
+            sig_parts.append(part)
+        todo = [(f, fr) for f, fr in batch if f in missing_det]
+        if todo and det is not None:
+            part = detect(np.stack([fr for _, fr in todo]), det_opts, timing)
+            for i, (f, _) in enumerate(todo):
+                det["saliency"][rows[f]] = part["saliency"][i]
+                det["faces"][rows[f]] = part["faces"][i]
+            det_frames.extend(f for f, _ in todo)
+            det_parts.append(part)
+        done[0] += len(batch)
+        batch.clear()
+        if progress is not None:
+            progress("metrics", done[0] / len(missing))
+
+    batch: List[Tuple[int, np.ndarray]] = []
+    to_decode: List[int] = []
+    # one worker pool for every chunk of this stage, started on first need
+    scoring = ScoringPool()
+    try:
+        for f in missing:
+            fr = cache.get_frame(key, f) if cache is not None else None
+            if fr is None:
+                to_decode.append(f)
+                continue
+            info["frame_hits"] += 1
+            batch.append((f, fr))
+            if len(batch) >= _DECODE_CHUNK:
+                flush(batch)
+        for f, fr in read_frames(source, to_decode, keyframes=keyframes):
+            if cache is not None:
+                cache.put_frame(key, f, fr)
+            batch.append((f, fr))
+            if len(batch) >= _DECODE_CHUNK:
+                flush(batch)
+        flush(batch)
+    finally:
+        scoring.close()
+    info["pool_starts"] = scoring.starts
+    if cache is not None and fresh_frames:
+        cache.put_metrics_table(key, ENGINE_VERSION, np.array(fresh_frames), METRIC_NAMES, np.stack(fresh_rows))
+    if cache is not None and sig_frames:
+        cache.put_signatures(
+            key,
+            SIGNATURE_VERSION,
+            np.array(sig_frames),
+            np.concatenate([p["phash"] for p in sig_parts]),
+            np.concatenate([p["embed"] for p in sig_parts]),
+        )
+    if cache is not None and det_frames:
+        cache.put_detections(
+            key,
+            det_version,
+            np.array(det_frames),
+            np.concatenate([p["saliency"] for p in det_parts]),
+            np.concatenate([p["faces"] for p in det_parts]),
+        )
+
+    info["timing"] = timing
+    info["execution"] = execution
+    return values, sigs, det, info
+
+
+# ---------- entry points ----------
+
+def analyze_source(
+    source: PathLike,
+    cfg: Optional[Mapping[str, Any]] = None,
+    cache: Optional[FrameCache] = None,
+    progress: Optional[ProgressFn] = None,
+    profiler: Optional[Profiler] = None,
+) -> Dict[str, Any]:
+    """
+    Run every pixel stage for one source. Stage timings go to ``profiler``
+    (a fresh one if not given) and are returned under ``performance``.
+    """
+    cfg = cfg or {}
+    prof = profiler if profiler is not None else Profiler()
+    with prof.stage("ingest"):
+        meta = probe(source)
+        if not meta.get("ok"):
+            return {"ok": False, "error": meta.get("error", "probe failed")}
+        if progress is not None:
+            progress("source", 0.0)
+        key = cache.source_key(source) if cache is not None else ""
+
+    with prof.stage("scenes") as rec:
+        scenes = scenes_stage(source, cfg, cache, key, progress)
+        rec["frames"] = int(scenes.get("stats", {}).get("frames_analyzed", 0)) if not scenes.get("cached") else 0
+        rec["cached"] = bool(scenes.get("cached"))
+    if not scenes.get("ok"):
+        return {"ok": False, "error": scenes.get("error", "scene detection failed")}
+
+    fps = float(scenes.get("fps") or meta.get("fps") or 0.0)
+    with prof.stage("sampling") as rec:
+        candidates, keyframes, sampling = sampling_stage(source, scenes["scenes"], fps, cfg, cache, key, progress)
+        rec["frames"] = sampling["decoded"]
+        rec["candidates"] = len(candidates)
+        rec.update({k: sampling[k] for k in ("planned", "rejected_black", "rejected_blur", "keyframes")})
+    with prof.stage("metrics") as rec:
+        frames = candidates.frame.tolist()
+        values, sigs, det, info = metrics_stage(source, frames, cfg, cache, key, progress, keyframes)
+        rec["frames"] = int(info["metric_misses"])
+        rec["cached_rows"] = int(info["metric_hits"])
+        rec["detections"] = int(info["detection_misses"])
+        rec["pool_starts"] = int(info["pool_starts"])
+    prof.add("metrics", per_metric=metric_costs(info["timing"], info["metric_misses"]))
+
+    candidate_scene = np.array(candidates.scene_id)
+    names = list(METRIC_NAMES)
+    if det is not None:
+        values = np.hstack([values, detection_columns(det, candidate_scene)])
+        names += list(DETECTION_NAMES)
+    motion: Dict[str, Any] = {}
+    if motion_options(cfg)["enabled"]:
+        with prof.stage("motion") as rec:
+            motion = motion_stage(source, scenes["scenes"], fps, cfg, cache, key, keyframes, progress)
+            rec["pairs"] = 0 if motion.get("cached") else int(motion.get("pairs", 0))
+            rec["cached"] = bool(motion.get("cached"))
+        values = np.hstack([values, motion_columns(motion, candidate_scene)])
+        names += list(MOTION_NAMES)
+    return {
+        "ok": True,
+        "source": str(source),
+        "source_hash": key,
+        "meta": meta,
+        "scenes": scenes["scenes"],
+        "candidates": candidates,
+        "sampling": sampling,
+        "keyframes": keyframes,
+        "candidate_scene": candidate_scene,
+        "names": names,
+        "values": values,
+        "engine_version": ENGINE_VERSION,
+        "motion": motion.get("scenes", {}),
+        "phash": sigs["phash"],
+        "embed": sigs["embed"],
+        "detection": det,
+        "cache": {
+            "scenes_cached": bool(scenes.get("cached")),
+            **{k: info[k] for k in ("metric_hits", "metric_misses", "signature_misses", "detection_misses", "frame_hits")},
+        },
+        "metrics_timing": info["timing"],
+        "execution": info["execution"],
+        "performance": prof.report(),
+    }
+
+
+def shot_target(sensitivity: int) -> int:
+    return max(3, min(12, int(3 + (sensitivity / 100.0) * 9)))
+
+
+def default_weights(cfg: Optional[Mapping[str, Any]] = None) -> Dict[str, Dict[str, float]]:
+    """Pillar weights from ``weights`` and category weights from ``category_weights``."""
+    _, pillars = split_weights(config_section(cfg, "weights"))
+    cats, _ = split_weights(config_section(cfg, "category_weights"))
+    return {"categories": cats, "pillars": pillars}
+
+
+def make_selector(
+    analysis: Mapping[str, Any],
+    cfg: Optional[Mapping[str, Any]] = None,
+    index: Optional[SignatureIndex] = None,
+) -> Selector:
+    """
+    Per-job selection state; build once and pass to select_shots on every
+    re-rank. With the archive ``index``, candidates duplicating heroes of
+    other reels are kept out of the pool.
+    """
+    opts = selection_options(cfg)
+    det = analysis.get("detection")
+    layout = layout_vectors(det) if det is not None else None
+    exclude = None
+    if index is not None and opts["dedupe_prior_heroes"]:
+        exclude = index.hero_duplicates(analysis["phash"], int(opts["dedupe_hamming"]), analysis.get("source_hash"))
+    return Selector(analysis["embed"], analysis["phash"], analysis["candidate_scene"], opts, layout, exclude)
+
+
+def select_shots(
+    analysis: Mapping[str, Any],
+    sensitivity: int = 50,
+    weights: Optional[Mapping[str, Any]] = None,
+    ranker: Optional[Ranker] = None,
+    selector: Optional[Selector] = None,
+) -> ShotTable:
+    """
+    Diverse, deduplicated shots chosen by agents.selection, best first. Pass
+    the job's Ranker and Selector to skip renormalising the metric matrix and
+    re-clustering the candidate pool.
+    """
+    candidates: CandidateTable = analysis["candidates"]
+    if not len(candidates):
+        return ShotTable.from_dicts([])
+    if ranker is None:
+        ranker = Ranker(analysis["values"], analysis["names"])
+    if selector is None:
+        selector = make_selector(analysis)
+    cat_w, pillar_w = split_weights(weights)
+    total = ranker.totals(cat_w, pillar_w)
+
+    picked, _ = selector.select(total, shot_target(sensitivity))
+    top = picked[np.argsort(-total[picked], kind="stable")]
+    return ShotTable.from_selection(
+        candidates,
+        analysis.get("scenes", []),
+        top,
+        total,
+        CategoryScores(ranker.categories[top]),
+        analysis.get("motion"),
+    )
@@ -0,0 +1,137 @@
+from __future__ import annotations
+
+import cProfile
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Mapping, Optional
+
+from aesthetic.storage.fs import ensure_dir
+
+try:  # POSIX only; Windows runs without RSS figures
+    import resource
+except ImportError:  # pragma: no cover
+    resource = None  # type: ignore[assignment]
+
+# Stage instrumentation for the run manifest.
+#
+# Profiler.stage(name) records, per stage:
+#   wall_s      perf_counter delta
+#   cpu_s       this thread's CPU plus CPU of child processes reaped during
+#               the stage (the metrics pool is joined inside the stage)
+#   rss_mb      resident set size when the stage ended
+#   peak_rss_mb process high-water mark so far (children reported separately)
+#   frames/fps  when the stage says how many frames it handled
+# Stages can repeat (selection on every re-rank); the last run is kept and
+# ``runs`` counts them.
+
+_RSS_SCALE = 1024.0 if sys.platform == "darwin" else 1.0  # ru_maxrss: bytes on macOS, KiB elsewhere
+
+
+def _rss_mb() -> Optional[float]:
+    try:
+        with open("/proc/self/statm", "rb") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / (1024.0 * 1024.0)
+    except (OSError, ValueError, AttributeError, IndexError):
+        return None
+
+
+def _peak_mb(who: int) -> float:
+    return resource.getrusage(who).ru_maxrss / _RSS_SCALE / 1024.0
+
+
+def _children_cpu() -> float:
+    if resource is None:
+        return 0.0
+    ru = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return ru.ru_utime + ru.ru_stime
+
+
+class Profiler:
+    def __init__(self) -> None:
+        self.stages: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name: str, frames: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Time a block. The yielded dict may be filled in by the block, e.g.
+        ``rec["frames"] = n`` when the count is only known at the end.
+        """
+        rec: Dict[str, Any] = {}
+        if frames is not None:
+            rec["frames"] = int(frames)
+        w0, c0, k0 = time.perf_counter(), time.thread_time(), _children_cpu()
+        try:
+            yield rec
+        finally:
+            wall = time.perf_counter() - w0
+            rec["wall_s"] = round(wall, 4)
+            rec["cpu_s"] = round(time.thread_time() - c0 + _children_cpu() - k0, 4)
+            rss = _rss_mb()
+            peak = _peak_mb(resource.RUSAGE_SELF) if resource is not None else None
+            peak_children = _peak_mb(resource.RUSAGE_CHILDREN) if resource is not None else None
+            if rss is not None:
+                rec["rss_mb"] = round(rss, 1)
+            if peak is not None:
+                rec["peak_rss_mb"] = round(peak, 1)
+            if peak_children:
+                rec["peak_rss_children_mb"] = round(peak_children, 1)
+            if rec.get("frames") and wall > 0:
+                rec["fps"] = round(rec["frames"] / wall, 2)
+            with self._lock:
+                rec["runs"] = self.stages.get(name, {}).get("runs", 0) + 1
+                self.stages[name] = rec
+
+    def add(self, name: str, **fields: Any) -> None:
+        """Attach extra figures (e.g. per-metric cost) to a recorded stage."""
+        with self._lock:
+            self.stages.setdefault(name, {}).update(fields)
+
+    def report(self) -> Dict[str, Any]:
+        with self._lock:
+            stages = {k: dict(v) for k, v in self.stages.items()}
+        return {
+            "stages": stages,
+            "total_wall_s": round(sum(float(s.get("wall_s", 0.0)) for s in stages.values()), 4),
+            "host": {"cpus": os.cpu_count(), "platform": sys.platform, "python": sys.version.split()[0]},
+        }
+
+
+def metric_costs(timing: Mapping[str, float], frames: int) -> Dict[str, Dict[str, float]]:
+    """Per-metric-group and per-intermediate seconds from MetricsEngine timing, with ms/frame."""
+    n = max(1, int(frames))
+    return {
+        k: {"seconds": round(float(v), 4), "ms_per_frame": round(1000.0 * float(v) / n, 3)}
+        for k, v in sorted(timing.items(), key=lambda kv: -float(kv[1]))
+    }
+
+
+@contextmanager
+def cprofile_to(path: Optional[Path]) -> Iterator[List[str]]:
+    """
+    Profile the calling thread into ``path`` (pstats format) when given.
+    Yields a list that receives a note if profiling could not start, e.g.
+    because another job already holds the interpreter's profiler.
+    """
+    notes: List[str] = []
+    if path is None:
+        yield notes
+        return
+    prof = cProfile.Profile()
+    try:
+        prof.enable()
+    except ValueError as e:
+        notes.append(f"cProfile unavailable: {e}")
+        yield notes
+        return
+    try:
+        yield notes
+    finally:
+        prof.disable()
+        ensure_dir(Path(path).parent)
+        prof.dump_stats(str(path))
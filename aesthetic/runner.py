@@ -0,0 +1,251 @@
+from __future__ import annotations
+
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+# Background job scheduler for the desktop bridge.
+#
+# Bridge calls only enqueue work and return; jobs run on a small thread pool
+# (the metrics stage fans out to its own process pool underneath). Each job
+# reports progress through JobContext.progress(stage, fraction), which also
+# raises JobCancelled once cancel() was requested, so a running reel stops at
+# the next decoded block instead of finishing in the background.
+#
+# Events are kept per job with a sequence number: the UI can poll
+# status(job_id, since=seq) or receive the same dicts through ``on_event``
+# (API wires that to window.evaluate_js).
+
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = "queued", "running", "done", "failed", "cancelled"
+FINISHED = (DONE, FAILED, CANCELLED)
+
+_MIN_INTERVAL = 0.1   # seconds between progress events of one stage
+_MAX_EVENTS = 512     # per job; older events are dropped, stages keep totals
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class JobContext:
+    """Handed to the job function: progress reporting and the cancel flag."""
+
+    def __init__(self, runner: "JobRunner", job_id: Any):
+        self._runner = runner
+        self.job_id = job_id
+        self._cancel = threading.Event()
+        self._state: Dict[str, Any] = {}
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel.is_set()
+
+    def check(self) -> None:
+        if self._cancel.is_set():
+            raise JobCancelled(self.job_id)
+
+    def progress(self, stage: str, fraction: float = 0.0, **info: Any) -> None:
+        self.check()
+        self._runner._progress(self._state, stage, float(fraction), info)
+
+
+class JobRunner:
+    def __init__(
+        self,
+        max_jobs: int = 1,
+        on_event: Optional[Callable[[Dict[str, Any]], None]] = None,
+    ):
+        self.max_jobs = max(1, int(max_jobs))
+        self.on_event = on_event
+        self._pool = ThreadPoolExecutor(max_workers=self.max_jobs, thread_name_prefix="aesthetic-job")
+        self._lock = threading.Lock()
+        self._jobs: Dict[Any, Dict[str, Any]] = {}
+
+    # ---------- submission ----------
+
+    def submit(self, job_id: Any, fn: Callable[[JobContext], Any]) -> Dict[str, Any]:
+        """
+        Queue ``fn(ctx)`` for ``job_id``. Its return value becomes the job
+        result; raising JobCancelled marks it cancelled, any other exception
+        failed. Resubmitting a finished job starts it over.
+        """
+        with self._lock:
+            cur = self._jobs.get(job_id)
+            if cur is not None and cur["status"] not in FINISHED:
+                return {"ok": False, "error": f"job {job_id} is already {cur['status']}"}
+            ctx = JobContext(self, job_id)
+            state = {
+                "job_id": job_id,
+                "status": QUEUED,
+                "stage": None,
+                "progress": 0.0,
+                "stages": {},
+                "events": [],
+                "seq": 0,
+                "queued_at": time.time(),
+                "started_at": None,
+                "finished_at": None,
+                "result": None,
+                "error": None,
+                "ctx": ctx,
+                "future": None,
+                "_stage_t0": 0.0,
+                "_last_emit": 0.0,
+            }
+            ctx._state = state
+            self._jobs[job_id] = state
+            # the future exists before anyone can see the job, so cancel()
+            # never finds a queued job without one
+            queued = self._record(state, {"status": QUEUED})
+            state["future"] = self._pool.submit(self._run, state, fn, ctx)
+        self._notify(queued)
+        return {"ok": True, "status": QUEUED}
+
+    def _run(self, state: Dict[str, Any], fn: Callable[[JobContext], Any], ctx: JobContext) -> None:
+        # works on the state it was submitted with: a resubmitted job id
+        # has a fresh state that a stale run must not touch
+        if ctx.cancelled:
+            self._finish(state, CANCELLED)
+            return
+        with self._lock:
+            if state["status"] in FINISHED:
+                return
+            state["status"] = RUNNING
+            state["started_at"] = time.time()
+        self._emit(state, {"status": RUNNING})
+        try:
+            result = fn(ctx)
+        except JobCancelled:
+            self._finish(state, CANCELLED)
+        except Exception as e:  # surfaced to the UI, never raised into the pool
+            self._finish(state, FAILED, error=f"{type(e).__name__}: {e}")
+        else:
+            self._finish(state, DONE, result=result)
+
+    def _finish(self, state: Dict[str, Any], status: str, result: Any = None, error: Optional[str] = None) -> None:
+        """Move a job to a terminal status; only the first call wins."""
+        with self._lock:
+            if state["status"] in FINISHED:
+                return
+            self._close_stage(state)
+            state["status"] = status
+            state["finished_at"] = time.time()
+            state["result"] = result
+            state["error"] = error
+            if status == DONE:
+                state["progress"] = 1.0
+        ev: Dict[str, Any] = {"status": status, "stages": dict(state["stages"])}
+        if error:
+            ev["error"] = error
+        if isinstance(result, dict):
+            ev.update({k: v for k, v in result.items() if k not in ev})
+        self._emit(state, ev)
+
+    # ---------- progress ----------
+
+    @staticmethod
+    def _close_stage(state: Dict[str, Any]) -> None:
+        stage = state["stage"]
+        if stage is not None:
+            rec = state["stages"].setdefault(stage, {"seconds": 0.0})
+            rec["seconds"] = round(rec["seconds"] + time.perf_counter() - state["_stage_t0"], 4)
+
+    def _progress(self, state: Dict[str, Any], stage: str, fraction: float, info: Dict[str, Any]) -> None:
+        now = time.perf_counter()
+        with self._lock:
+            changed = stage != state["stage"]
+            if changed:
+                self._close_stage(state)
+                state["stage"] = stage
+                state["_stage_t0"] = now
+            state["progress"] = max(0.0, min(1.0, fraction))
+            due = changed or fraction >= 1.0 or now - state["_last_emit"] >= _MIN_INTERVAL
+            if due:
+                state["_last_emit"] = now
+        if due:
+            self._emit(state, {"stage": stage, "progress": round(state["progress"], 4), **info})
+
+    def _emit(self, state: Dict[str, Any], payload: Dict[str, Any]) -> None:
+        with self._lock:
+            ev = self._record(state, payload)
+        self._notify(ev)
+
+    @staticmethod
+    def _record(state: Dict[str, Any], payload: Dict[str, Any]) -> Dict[str, Any]:
+        """Append an event to the job's log; caller holds the lock."""
+        state["seq"] += 1
+        ev = {"job_id": state["job_id"], "seq": state["seq"], "t": time.time(), "status": state["status"]}
+        ev.update(payload)
+        state["events"].append(ev)
+        if len(state["events"]) > _MAX_EVENTS:
+            del state["events"][: len(state["events"]) - _MAX_EVENTS]
+        return ev
+
+    def _notify(self, ev: Dict[str, Any]) -> None:
+        if self.on_event is not None:
+            try:
+                self.on_event(ev)
+            except Exception:
+                pass  # a closed window must not fail the job
+
+    # ---------- control / queries ----------
+
+    def cancel(self, job_id: Any) -> Dict[str, Any]:
+        state = self._jobs.get(job_id)
+        if state is None:
+            return {"ok": False, "error": f"unknown job {job_id}"}
+        if state["status"] in FINISHED:
+            return {"ok": True, "status": state["status"]}
+        state["ctx"]._cancel.set()
+        fut: Optional[Future] = state["future"]
+        if state["status"] == QUEUED and (fut is None or fut.cancel()):
+            self._finish(state, CANCELLED)
+        return {"ok": True, "status": state["status"]}
+
+    def status(self, job_id: Any, since: int = 0) -> Dict[str, Any]:
+        state = self._jobs.get(job_id)
+        if state is None:
+            return {"ok": False, "error": f"unknown job {job_id}"}
+        with self._lock:
+            return {
+                "ok": True,
+                "job_id": job_id,
+                "status": state["status"],
+                "stage": state["stage"],
+                "progress": state["progress"],
+                "stages": dict(state["stages"]),
+                "error": state["error"],
+                "seq": state["seq"],
+                "events": [e for e in state["events"] if e["seq"] > int(since)],
+            }
+
+    def state(self, job_id: Any) -> Optional[str]:
+        state = self._jobs.get(job_id)
+        return None if state is None else state["status"]
+
+    def list(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [
+                {"job_id": j, "status": s["status"], "stage": s["stage"], "progress": s["progress"]}
+                for j, s in self._jobs.items()
+            ]
+
+    def wait(self, job_id: Any, timeout: Optional[float] = None) -> Optional[str]:
+        """Block until the job finishes (tests, CLI); returns its status."""
+        state = self._jobs.get(job_id)
+        if state is None:
+            return None
+        fut: Optional[Future] = state["future"]
+        if fut is not None:
+            try:
+                fut.result(timeout=timeout)
+            except Exception:
+                pass
+        return state["status"]
+
+    def shutdown(self, cancel: bool = True) -> None:
+        if cancel:
+            for job_id in list(self._jobs):
+                self.cancel(job_id)
+        self._pool.shutdown(wait=True)
@@ -0,0 +1,303 @@
+from __future__ import annotations
+
+import hashlib
+import io
+import json
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, ContextManager, Dict, List, Mapping, Optional, Sequence, Tuple, Union
+
+import cv2
+import numpy as np
+
+from aesthetic.config import config_section
+from aesthetic.storage.fs import data_path, ensure_dir, file_lock
+
+_CHUNK = 1 << 20
+
+
+def _atomic_write(path: Path, data: bytes) -> None:
+    ensure_dir(path.parent)
+    # unique per writer so concurrent jobs never share a temp file
+    tmp = path.with_name(f"{path.name}.{os.getpid()}-{threading.get_ident()}.tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
+
+
+def _merge_rows(
+    old: Optional[Mapping[str, np.ndarray]], frames: np.ndarray, **columns: np.ndarray
+) -> Dict[str, np.ndarray]:
+    """Row-merge ``columns`` keyed by ``frames`` into ``old``; new rows win, result sorted by frame."""
+    frames = np.asarray(frames, dtype=np.int64)
+    if old is not None and all(c in old and len(old[c]) == len(old["frames"]) for c in columns):
+        keep = ~np.isin(old["frames"], frames)
+        frames = np.concatenate([old["frames"][keep], frames])
+        columns = {c: np.concatenate([old[c][keep], v]) for c, v in columns.items()}
+    order = np.argsort(frames, kind="stable")
+    out = {"frames": frames[order]}
+    out.update({c: v[order] for c, v in columns.items()})
+    return out
+
+
+class FrameCache:
+    """
+    Content-addressed cache reused across runs, bounded by an LRU disk budget:
+
+      data/
+        cache/
+          sources.json                       # path -> {size, mtime_ns, hash}
+          <source hash>/
+            frames/<index>.png               # lossless candidate frames
+            metrics/<engine version>.npz     # frame indices + metric matrix
+            signatures/<version>.npz         # frame indices + pHash + embedding
+            detections/<version>.npz         # frame indices + saliency maps + face boxes
+            <table>.npz.lock                 # held across a table's read-merge-write
+            json/<name>.json                 # stage results, e.g. scene lists
+
+    Entries are keyed by the SHA-256 of the source file contents, so renamed or
+    copied reels still hit. Recency is the file mtime, refreshed on every hit.
+    Tables are merged under a per-table file lock, so jobs in other threads or
+    processes adding rows to the same table never drop each other's rows.
+    """
+
+    def __init__(self, root: Optional[Path] = None, max_bytes: int = 20 * 1024 ** 3):
+        self.root = ensure_dir(Path(root) if root is not None else data_path("cache"))
+        self.max_bytes = int(max_bytes)
+        self.sources_path = self.root / "sources.json"
+        self._lru: Optional["OrderedDict[Path, int]"] = None
+        self._total = 0
+        # one cache is shared by concurrent jobs; guards the LRU and sources.json
+        self._mutex = threading.RLock()
+
+    @classmethod
+    def from_config(cls, cfg: Optional[Mapping[str, Any]] = None) -> "FrameCache":
+        max_gb = float(config_section(cfg, "cache").get("max_gb", 20))
+        return cls(max_bytes=int(max_gb * 1024 ** 3))
+
+    # ---------- source keys ----------
+
+    def source_key(self, path: Union[str, Path]) -> str:
+        """SHA-256 of the file, memoised by (size, mtime) so reels are hashed once."""
+        p = Path(path).resolve()
+        st = p.stat()
+        memo = self._load_sources()
+        hit = memo.get(str(p))
+        if isinstance(hit, dict) and hit.get("size") == st.st_size and hit.get("mtime_ns") == st.st_mtime_ns:
+            return str(hit["hash"])
+        h = hashlib.sha256()
+        with open(p, "rb") as f:
+            for chunk in iter(lambda: f.read(_CHUNK), b""):
+                h.update(chunk)
+        digest = h.hexdigest()
+        with self._mutex:
+            memo = self._load_sources()
+            memo[str(p)] = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "hash": digest}
+            _atomic_write(self.sources_path, json.dumps(memo).encode("utf-8"))
+        return digest
+
+    def _load_sources(self) -> Dict[str, Any]:
+        try:
+            obj = json.loads(self.sources_path.read_text(encoding="utf-8"))
+            if isinstance(obj, dict):
+                return obj
+        except Exception:
+            pass
+        return {}
+
+    # ---------- frames ----------
+
+    def frame_path(self, key: str, index: int) -> Path:
+        return self.root / key / "frames" / f"{int(index):08d}.png"
+
+    def get_frame(self, key: str, index: int) -> Optional[np.ndarray]:
+        path = self.frame_path(key, index)
+        if not path.exists():
+            return None
+        frame = cv2.imread(str(path), cv2.IMREAD_COLOR)
+        if frame is not None:
+            self._touch(path)
+        return frame
+
+    def put_frame(self, key: str, index: int, frame: np.ndarray) -> None:
+        # PNG level 1: lossless so cached frames rescore identically, still fast
+        ok, buf = cv2.imencode(".png", frame, [cv2.IMWRITE_PNG_COMPRESSION, 1])
+        if ok:
+            self._put(self.frame_path(key, index), buf.tobytes())
+
+    # ---------- metric tables ----------
+
+    def metrics_path(self, key: str, version: str) -> Path:
+        return self.root / key / "metrics" / f"{version}.npz"
+
+    def get_metrics_table(self, key: str, version: str) -> Optional[Tuple[np.ndarray, List[str], np.ndarray]]:
+        """``(frames, names, values)`` cached for a source, frames sorted ascending."""
+        path = self.metrics_path(key, version)
+        try:
+            with np.load(path, allow_pickle=False) as z:
+                frames, names, values = z["frames"], [str(n) for n in z["names"]], z["values"]
+        except Exception:
+            return None
+        if values.shape != (len(frames), len(names)):
+            return None
+        self._touch(path)
+        return frames, names, values
+
+    def put_metrics_table(
+        self, key: str, version: str, frames: np.ndarray, names: Sequence[str], values: np.ndarray
+    ) -> None:
+        """Merge rows into the source's table; new rows win over cached ones."""
+        path = self.metrics_path(key, version)
+        with self._table_lock(path):
+            old = self.get_metrics_table(key, version)
+            prev = None
+            if old is not None and list(old[1]) == list(names):
+                prev = {"frames": old[0], "values": old[2]}
+            merged = _merge_rows(prev, frames, values=np.asarray(values, dtype=np.float32))
+            self._put_npz(path, names=np.array(list(names)), **merged)
+
+    # ---------- signature tables ----------
+
+    def signatures_path(self, key: str, version: str) -> Path:
+        return self.root / key / "signatures" / f"{version}.npz"
+
+    def get_signatures(self, key: str, version: str) -> Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+        """``(frames, phash, embed)`` cached for a source, frames sorted ascending."""
+        path = self.signatures_path(key, version)
+        try:
+            with np.load(path, allow_pickle=False) as z:
+                frames, ph, emb = z["frames"], z["phash"], z["embed"]
+        except Exception:
+            return None
+        if len(ph) != len(frames) or len(emb) != len(frames):
+            return None
+        self._touch(path)
+        return frames, ph, emb
+
+    def put_signatures(self, key: str, version: str, frames: np.ndarray, phash: np.ndarray, embed: np.ndarray) -> None:
+        path = self.signatures_path(key, version)
+        with self._table_lock(path):
+            old = self.get_signatures(key, version)
+            prev = {"frames": old[0], "phash": old[1], "embed": old[2]} if old is not None else None
+            merged = _merge_rows(
+                prev, frames, phash=np.asarray(phash, dtype=np.uint64), embed=np.asarray(embed, dtype=np.float32)
+            )
+            self._put_npz(path, **merged)
+
+    # ---------- detection tables ----------
+
+    def detections_path(self, key: str, version: str) -> Path:
+        return self.root / key / "detections" / f"{version}.npz"
+
+    def get_detections(self, key: str, version: str) -> Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+        """``(frames, saliency, faces)`` cached for a source, frames sorted ascending."""
+        path = self.detections_path(key, version)
+        try:
+            with np.load(path, allow_pickle=False) as z:
+                frames, sal, faces = z["frames"], z["saliency"], z["faces"]
+        except Exception:
+            return None
+        if len(sal) != len(frames) or len(faces) != len(frames):
+            return None
+        self._touch(path)
+        return frames, sal, faces
+
+    def put_detections(self, key: str, version: str, frames: np.ndarray, saliency: np.ndarray, faces: np.ndarray) -> None:
+        path = self.detections_path(key, version)
+        with self._table_lock(path):
+            old = self.get_detections(key, version)
+            prev = {"frames": old[0], "saliency": old[1], "faces": old[2]} if old is not None else None
+            merged = _merge_rows(
+                prev, frames, saliency=np.asarray(saliency, dtype=np.uint8), faces=np.asarray(faces, dtype=np.float32)
+            )
+            self._put_npz(path, **merged)
+
+    def _table_lock(self, path: Path) -> ContextManager[None]:
+        return file_lock(path.with_name(path.name + ".lock"))
+
+    def _put_npz(self, path: Path, **arrays: np.ndarray) -> None:
+        buf = io.BytesIO()
+        np.savez(buf, **arrays)
+        self._put(path, buf.getvalue())
+
+    # ---------- generic stage results ----------
+
+    def json_path(self, key: str, name: str) -> Path:
+        return self.root / key / "json" / f"{name}.json"
+
+    def get_json(self, key: str, name: str) -> Optional[Dict[str, Any]]:
+        return self._read_json(self.json_path(key, name))
+
+    def put_json(self, key: str, name: str, obj: Mapping[str, Any]) -> None:
+        self._put(self.json_path(key, name), json.dumps(obj).encode("utf-8"))
+
+    # ---------- LRU bookkeeping ----------
+
+    def _read_json(self, path: Path) -> Optional[Dict[str, Any]]:
+        try:
+            obj = json.loads(path.read_text(encoding="utf-8"))
+        except Exception:
+            return None
+        self._touch(path)
+        return obj if isinstance(obj, dict) else None
+
+    def _index(self) -> "OrderedDict[Path, int]":
+        with self._mutex:
+            return self._build_index()
+
+    def _build_index(self) -> "OrderedDict[Path, int]":
+        if self._lru is None:
+            entries = []
+            for dirpath, _, files in os.walk(self.root):
+                for name in files:
+                    p = Path(dirpath) / name
+                    if p == self.sources_path or name.endswith((".tmp", ".lock")):
+                        continue
+                    try:
+                        st = p.stat()
+                    except OSError:
+                        continue
+                    entries.append((st.st_mtime_ns, p, st.st_size))
+            entries.sort(key=lambda e: e[0])
+            self._lru = OrderedDict((p, size) for _, p, size in entries)
+            self._total = sum(self._lru.values())
+        return self._lru
+
+    def _touch(self, path: Path) -> None:
+        with self._mutex:
+            lru = self._index()
+            try:
+                os.utime(path)
+            except OSError:
+                return
+            if path in lru:
+                lru.move_to_end(path)
+
+    def _put(self, path: Path, data: bytes) -> None:
+        _atomic_write(path, data)
+        with self._mutex:
+            lru = self._index()
+            self._total += len(data) - lru.pop(path, 0)
+            lru[path] = len(data)
+            self.evict()
+
+    def evict(self) -> int:
+        """Drop least recently used entries until the cache fits max_bytes; returns bytes freed."""
+        with self._mutex:
+            lru = self._index()
+            freed = 0
+            while self._total > self.max_bytes and lru:
+                path, size = lru.popitem(last=False)
+                try:
+                    path.unlink()
+                except OSError:
+                    pass
+                self._total -= size
+                freed += size
+            return freed
+
+    @property
+    def total_bytes(self) -> int:
+        self._index()
+        return self._total
@@ -0,0 +1,153 @@
+from __future__ import annotations
+
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from aesthetic.storage.fs import ensure_dir
+
+STORE_VERSION = 1
+
+# candidate columns kept next to the metric matrix
+CANDIDATE_DTYPE = np.dtype([
+    ("id", np.int64),
+    ("scene_id", np.int64),
+    ("frame", np.int64),
+    ("time", np.float64),
+])
+
+
+def _save_npy(path: Path, arr: np.ndarray) -> None:
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "wb") as f:
+        np.save(f, arr, allow_pickle=False)
+    os.replace(tmp, path)
+
+
+class MetricsStore:
+    """
+    Columnar metrics for one job, replacing one JSON sidecar per candidate:
+
+      <job dir>/metrics/
+        index.json         # names, row count, engine version, file names
+        values.npy         # (M, N) float32, one contiguous row per metric
+        candidates.npy     # (N,) structured id / scene_id / frame / time
+
+    Arrays are opened with mmap, so column(name) touches only that metric's
+    bytes. index.json is written last and acts as the commit marker.
+    """
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+        self.index_path = self.root / "index.json"
+        self._index: Optional[Dict[str, Any]] = None
+        self._values: Optional[np.ndarray] = None
+        self._candidates: Optional[np.ndarray] = None
+
+    # ---------- writing ----------
+
+    @classmethod
+    def write(
+        cls,
+        root: Path,
+        names: Sequence[str],
+        values: np.ndarray,
+        candidates: Any,
+        engine_version: str,
+    ) -> "MetricsStore":
+        """``candidates`` is a models.job.CandidateTable or a sequence of candidate dicts."""
+        root = ensure_dir(Path(root))
+        vals = np.asarray(values, dtype=np.float32)
+        if vals.ndim != 2 or vals.shape[1] != len(names) or vals.shape[0] != len(candidates):
+            raise ValueError(f"values {vals.shape} do not match {len(candidates)} candidates x {len(names)} metrics")
+        table = getattr(candidates, "array", None)
+        if isinstance(table, np.ndarray) and table.dtype == CANDIDATE_DTYPE:
+            cand = table
+        else:
+            cand = np.zeros(len(candidates), dtype=CANDIDATE_DTYPE)
+            for field in CANDIDATE_DTYPE.names or ():
+                cand[field] = [c.get(field, 0) for c in candidates]
+
+        _save_npy(root / "values.npy", np.ascontiguousarray(vals.T))
+        _save_npy(root / "candidates.npy", cand)
+        index = {
+            "store_version": STORE_VERSION,
+            "engine_version": str(engine_version),
+            "rows": int(vals.shape[0]),
+            "names": list(names),
+            "values": "values.npy",
+            "candidates": "candidates.npy",
+            "layout": "metric-major float32",
+        }
+        tmp = root / "index.json.tmp"
+        tmp.write_text(json.dumps(index, separators=(",", ":")), encoding="utf-8")
+        os.replace(tmp, root / "index.json")
+        return cls(root)
+
+    # ---------- reading ----------
+
+    @property
+    def index(self) -> Dict[str, Any]:
+        if self._index is None:
+            obj = json.loads(self.index_path.read_text(encoding="utf-8"))
+            if not isinstance(obj, dict) or int(obj.get("store_version", 0)) != STORE_VERSION:
+                raise ValueError(f"unsupported metrics store at {self.root}")
+            self._index = obj
+        return self._index
+
+    @property
+    def names(self) -> List[str]:
+        return list(self.index["names"])
+
+    @property
+    def rows(self) -> int:
+        return int(self.index["rows"])
+
+    def _values_mmap(self) -> np.ndarray:
+        if self._values is None:
+            self._values = np.load(self.root / self.index["values"], mmap_mode="r")
+        return self._values
+
+    def column(self, name: str) -> np.ndarray:
+        """Read-only (N,) view of one metric; only its pages are read from disk."""
+        try:
+            j = self.index["names"].index(name)
+        except ValueError:
+            raise KeyError(name) from None
+        return self._values_mmap()[j]
+
+    def matrix(self, names: Optional[Sequence[str]] = None) -> np.ndarray:
+        """(N, M) in-memory matrix for ``names`` (all metrics by default)."""
+        wanted = list(names) if names is not None else self.names
+        return np.stack([np.asarray(self.column(n)) for n in wanted], axis=1) if wanted else np.zeros((self.rows, 0), np.float32)
+
+    def candidates(self) -> np.ndarray:
+        if self._candidates is None:
+            self._candidates = np.load(self.root / self.index["candidates"], mmap_mode="r")
+        return self._candidates
+
+    # ---------- interoperability ----------
+
+    def export_json(self, path: Path) -> Path:
+        """Row-per-candidate JSON, for tools that do not read .npy; missing (non-finite) values are null."""
+        cand = self.candidates()
+        names = self.names
+        mat = self.matrix(names)
+        rows = [
+            {
+                "id": int(c["id"]),
+                "scene_id": int(c["scene_id"]),
+                "frame": int(c["frame"]),
+                "time": float(c["time"]) if np.isfinite(c["time"]) else None,
+                "metrics": dict(zip(names, (float(v) if np.isfinite(v) else None for v in r))),
+            }
+            for c, r in zip(cand, mat)
+        ]
+        doc = {"engine_version": self.index["engine_version"], "candidates": rows}
+        path = Path(path)
+        ensure_dir(path.parent)
+        path.write_text(json.dumps(doc, separators=(",", ":"), allow_nan=False), encoding="utf-8")
+        return path
@@ -1,5 +1,9 @@
 from __future__ import annotations
+import os
+import time
+from contextlib import contextmanager
 from pathlib import Path
+from typing import Iterator
 from aesthetic.config import DATA_DIR
 
 def ensure_dir(p: Path) -> Path:
@@ -8,3 +12,45 @@ def ensure_dir(p: Path) -> Path:
 
 def data_path(*parts: str) -> Path:
     return DATA_DIR.joinpath(*parts)
+
+@contextmanager
+def file_lock(path: Path, timeout: float = 30.0, poll: float = 0.05) -> Iterator[None]:
+    """
+    Exclusive lock on ``path`` shared by all processes. Raises TimeoutError if
+    it is not acquired within ``timeout`` seconds (a hung or crashed holder
+    must not block the caller forever). Not re-entrant.
+    """
+    ensure_dir(path.parent)
+    deadline = time.monotonic() + max(0.0, float(timeout))
+    with open(path, "a+b") as f:
+        if os.name == "nt":
+            import msvcrt
+
+            def acquire() -> None:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+
+            def release() -> None:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            import fcntl
+
+            def acquire() -> None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+
+            def release() -> None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+        while True:
+            try:
+                acquire()
+                break
+            except OSError:
+                if time.monotonic() >= deadline:
+                    raise TimeoutError(f"timed out after {timeout:g}s waiting for lock {path}") from None
+                time.sleep(poll)
+        try:
+            yield
+        finally:
+            release()
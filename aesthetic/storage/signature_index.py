@@ -0,0 +1,480 @@
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time as _time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from aesthetic.agents.signatures import EMBED_DIM, SIGNATURE_VERSION, PHashIndex, popcount64
+from aesthetic.storage.fs import data_path, ensure_dir, file_lock
+
+INDEX_VERSION = 1
+
+# one row per indexed candidate
+ROW_DTYPE = np.dtype([
+    ("source", np.int32),     # id in index.json "sources"
+    ("gen", np.int32),        # source generation the row was written under
+    ("frame", np.int64),
+    ("scene", np.int32),
+    ("time", np.float32),
+])
+
+_CHUNK = 65536  # rows per cosine block
+_RETIRE_GRACE_S = 600.0  # compacted-away segments stay on disk this long for readers of an older index.json
+
+
+def _save_npy(path: Path, arr: np.ndarray) -> None:
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "wb") as f:
+        np.save(f, arr, allow_pickle=False)
+    os.replace(tmp, path)
+
+
+class SignatureIndex:
+    """
+    Archive-wide signatures of every analysed candidate, for "shots similar to
+    this one" and cross-reel hero dedupe:
+
+      data/signatures/
+        index.json          # version, segments, sources {key: id, path, gen, heroes}
+        index.lock          # held by whichever process is writing
+        seg-000001/
+          phash.npy         # (N,) uint64 pHash
+          embed.npy         # (N, EMBED_DIM) float16 unit colour / layout embedding
+          rows.npy          # (N,) ROW_DTYPE source / gen / frame / scene / time
+
+    Each analysed reel appends one immutable segment; index.json is written
+    last and is the commit marker, so a crash mid-append leaves an orphan
+    directory, never a half-visible segment. Segments are opened with mmap
+    and searched one at a time (vectorized popcount for Hamming, a blocked
+    matrix product for cosine), so memory stays flat as the archive grows.
+    Re-indexing a reel bumps its generation; rows of older generations are
+    ignored by queries and dropped by compact(), which also folds segments
+    together once there are more than ``max_segments``. Compacted-away
+    segments are only listed as retired; a later write deletes them once
+    they are older than _RETIRE_GRACE_S, so a reader still working from the
+    previous index.json does not lose its files mid-query (and a query that
+    does hit a vanished segment reloads index.json and runs once more).
+
+    Several processes may share one index: every write (add, mark_heroes,
+    compact) holds index.lock across re-reading index.json, writing its
+    segment and committing, so concurrent writers queue up instead of
+    dropping each other's segments or heroes. Readers take no lock; they see
+    the last committed index.json.
+
+    Heroes (frames exported from a reel) are kept per source in index.json;
+    hero_duplicates() checks a whole candidate pool against them with a
+    multi-index pHash lookup, i.e. per candidate only its bucket is compared.
+    """
+
+    def __init__(self, root: Optional[Path] = None, max_segments: int = 32, lock_timeout: float = 30.0):
+        self.root = Path(root) if root is not None else data_path("signatures")
+        self.index_path = self.root / "index.json"
+        self.lock_path = self.root / "index.lock"
+        self.lock_timeout = float(lock_timeout)
+        self.max_segments = max(1, int(max_segments))
+        self._lock = threading.RLock()
+        self._index: Dict[str, Any] = {}
+        self._stamp: Optional[Tuple[int, ...]] = None
+        self._segments: Dict[str, Tuple[np.ndarray, np.ndarray, np.ndarray]] = {}
+        self._heroes: Optional[Tuple[PHashIndex, np.ndarray]] = None
+        self._writing = 0   # write() nesting depth in this process
+
+    # ---------- persistence ----------
+
+    @contextmanager
+    def _write(self) -> Iterator[Dict[str, Any]]:
+        """Thread and process exclusive write section; yields the freshly loaded index."""
+        with self._lock:
+            if self._writing:
+                self._writing += 1
+                try:
+                    yield self._load()
+                finally:
+                    self._writing -= 1
+                return
+            with file_lock(self.lock_path, self.lock_timeout):
+                self._writing = 1
+                try:
+                    yield self._load()
+                except BaseException:
+                    self._stamp = None   # drop uncommitted in-memory changes
+                    raise
+                finally:
+                    self._writing = 0
+
+    def _load(self) -> Dict[str, Any]:
+        """index.json, re-read only when it changed on disk (another process may have written it)."""
+        try:
+            st = self.index_path.stat()
+            stamp: Optional[Tuple[int, ...]] = (st.st_ino, st.st_mtime_ns, st.st_size)
+        except OSError:
+            stamp = None
+        if stamp != self._stamp or not self._index:
+            doc: Dict[str, Any] = {}
+            if stamp is not None:
+                try:
+                    doc = json.loads(self.index_path.read_text(encoding="utf-8"))
+                except Exception:
+                    doc = {}
+            if int(doc.get("index_version", 0)) != INDEX_VERSION or doc.get("signature_version") != SIGNATURE_VERSION:
+                # a different signature definition is not comparable; start a fresh index
+                doc = {"index_version": INDEX_VERSION, "signature_version": SIGNATURE_VERSION,
+                       "embed_dim": EMBED_DIM, "next_segment": 1, "segments": [], "sources": {}}
+            self._index, self._stamp = doc, stamp
+            self._segments = {k: v for k, v in self._segments.items() if k in {s["name"] for s in doc["segments"]}}
+            self._heroes = None
+        return self._index
+
+    def _commit(self) -> None:
+        ensure_dir(self.root)
+        tmp = self.index_path.with_name("index.json.tmp")
+        tmp.write_text(json.dumps(self._index, separators=(",", ":")), encoding="utf-8")
+        os.replace(tmp, self.index_path)
+        st = self.index_path.stat()
+        self._stamp = (st.st_ino, st.st_mtime_ns, st.st_size)
+        self._heroes = None
+
+    def _segment(self, name: str) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        seg = self._segments.get(name)
+        if seg is None:
+            d = self.root / name
+            seg = (
+                np.load(d / "phash.npy", mmap_mode="r"),
+                np.load(d / "embed.npy", mmap_mode="r"),
+                np.load(d / "rows.npy", mmap_mode="r"),
+            )
+            self._segments[name] = seg
+        return seg
+
+    def _write_segment(self, phash: np.ndarray, embed: np.ndarray, rows: np.ndarray) -> Dict[str, Any]:
+        idx = self._index
+        name = f"seg-{int(idx['next_segment']):06d}"
+        idx["next_segment"] = int(idx["next_segment"]) + 1
+        d = ensure_dir(self.root / name)
+        _save_npy(d / "phash.npy", np.ascontiguousarray(phash, dtype=np.uint64))
+        _save_npy(d / "embed.npy", np.ascontiguousarray(embed, dtype=np.float16))
+        _save_npy(d / "rows.npy", rows)
+        return {"name": name, "rows": int(len(rows))}
+
+    def _live(self, rows: np.ndarray) -> np.ndarray:
+        """Mask of rows written under their source's current generation."""
+        sources = self._index["sources"].values()
+        gen = np.full(max([int(s["id"]) for s in sources], default=-1) + 1, -1, dtype=np.int64)
+        for s in sources:
+            gen[int(s["id"])] = int(s["gen"])
+        src = np.asarray(rows["source"], dtype=np.int64)
+        ok = src < len(gen)
+        out = np.zeros(len(rows), dtype=bool)
+        out[ok] = gen[src[ok]] == rows["gen"][ok]
+        return out
+
+    def _iter_segments(self) -> Iterator[Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]]:
+        for s in self._index["segments"]:
+            ph, emb, rows = self._segment(s["name"])
+            yield ph, emb, rows, self._live(rows)
+
+    def _sweep(self, idx: Dict[str, Any], now: float) -> None:
+        """Delete retired segments past the grace period; entries that cannot be removed yet stay listed."""
+        keep: List[Dict[str, Any]] = []
+        for r in idx.get("retired", []):
+            if now - float(r.get("t", 0.0)) < _RETIRE_GRACE_S or not self._remove_segment(str(r["name"])):
+                keep.append(r)
+        idx["retired"] = keep
+
+    def _remove_segment(self, name: str) -> bool:
+        d = self.root / name
+        for f in ("phash.npy", "embed.npy", "rows.npy"):
+            try:
+                (d / f).unlink()
+            except FileNotFoundError:
+                pass
+            except OSError:
+                return False   # still mapped by a reader (Windows)
+        try:
+            d.rmdir()
+        except FileNotFoundError:
+            pass
+        except OSError:
+            return False
+        return True
+
+    def _locked(self, fn: Any, *args: Any) -> Dict[str, Any]:
+        """Run a write; a lock held past lock_timeout (hung or crashed writer) becomes an error dict."""
+        try:
+            return fn(*args)
+        except TimeoutError as e:
+            return {"ok": False, "error": str(e)}
+
+    def _retry(self, fn: Any, *args: Any) -> Any:
+        """Run a query; if a segment vanished under it, reload index.json and run it once more."""
+        with self._lock:
+            try:
+                return fn(*args)
+            except FileNotFoundError:
+                self._stamp = None
+                self._segments.clear()
+                return fn(*args)
+
+    # ---------- writing ----------
+
+    def add(
+        self,
+        key: str,
+        path: str,
+        frames: Sequence[int],
+        scene: Sequence[int],
+        time: Sequence[float],
+        phash: np.ndarray,
+        embed: np.ndarray,
+    ) -> Dict[str, Any]:
+        """Index one reel's candidates under source ``key``, replacing what was indexed for it before."""
+        return self._locked(self._add, key, path, frames, scene, time, phash, embed)
+
+    def mark_heroes(self, key: str, frames: Sequence[int]) -> Dict[str, Any]:
+        """Record exported hero ``frames`` of source ``key``; earlier heroes are kept."""
+        return self._locked(self._mark_heroes, key, frames)
+
+    def compact(self) -> Dict[str, Any]:
+        """Fold all segments into one, dropping rows of superseded generations."""
+        return self._locked(self._compact)
+
+    def _add(
+        self,
+        key: str,
+        path: str,
+        frames: Sequence[int],
+        scene: Sequence[int],
+        time: Sequence[float],
+        phash: np.ndarray,
+        embed: np.ndarray,
+    ) -> Dict[str, Any]:
+        n = len(frames)
+        if not key:
+            return {"ok": False, "error": "source key required"}
+        if len(phash) != n or len(embed) != n or len(scene) != n or len(time) != n:
+            return {"ok": False, "error": "frames, scene, time, phash and embed lengths differ"}
+        emb = np.asarray(embed, dtype=np.float32).reshape(n, -1)
+        if emb.shape[1] != EMBED_DIM:
+            return {"ok": False, "error": f"embed must have {EMBED_DIM} columns, got {emb.shape[1]}"}
+        with self._write() as idx:
+            src = idx["sources"].get(key)
+            if src is None:
+                src = idx["sources"][key] = {"id": len(idx["sources"]), "path": str(path), "gen": 0, "heroes": []}
+            src["gen"] = int(src["gen"]) + 1
+            src["path"] = str(path)
+            src["rows"] = n
+            rows = np.zeros(n, dtype=ROW_DTYPE)
+            rows["source"], rows["gen"] = int(src["id"]), int(src["gen"])
+            rows["frame"], rows["scene"], rows["time"] = frames, scene, time
+            if n:
+                idx["segments"].append(self._write_segment(phash, emb, rows))
+            self._sweep(idx, _time.time())
+            self._commit()
+            if len(idx["segments"]) > self.max_segments:
+                self._compact()
+            return {"ok": True, "rows": n, "segments": len(self._index["segments"])}
+
+    def _mark_heroes(self, key: str, frames: Sequence[int]) -> Dict[str, Any]:
+        with self._write() as idx:
+            src = idx["sources"].get(key)
+            if src is None:
+                return {"ok": False, "error": f"source {key} is not indexed"}
+            src["heroes"] = sorted(set(int(f) for f in src.get("heroes", [])) | set(int(f) for f in frames))
+            self._commit()
+            return {"ok": True, "heroes": len(src["heroes"])}
+
+    def _compact(self) -> Dict[str, Any]:
+        with self._write() as idx:
+            old = [s["name"] for s in idx["segments"]]
+            parts = [(np.asarray(ph[live]), np.asarray(emb[live]), np.asarray(rows[live]))
+                     for ph, emb, rows, live in self._iter_segments()]
+            parts = [p for p in parts if len(p[0])]
+            idx["segments"] = []
+            if parts:
+                idx["segments"].append(self._write_segment(
+                    np.concatenate([p[0] for p in parts]),
+                    np.concatenate([p[1] for p in parts]),
+                    np.concatenate([p[2] for p in parts]),
+                ))
+            now = _time.time()
+            self._sweep(idx, now)
+            idx.setdefault("retired", []).extend({"name": name, "t": now} for name in old)
+            self._commit()
+            self._segments.clear()
+            return {"ok": True, "rows": sum(s["rows"] for s in idx["segments"]), "removed_segments": len(old)}
+
+    # ---------- queries ----------
+
+    def _lookup(self, key: str, frame: int) -> Optional[Tuple[int, np.ndarray]]:
+        with self._lock:
+            src = self._load()["sources"].get(key)
+            if src is None:
+                return None
+            for ph, emb, rows, live in self._iter_segments():
+                hit = np.flatnonzero(live & (rows["source"] == int(src["id"])) & (rows["frame"] == int(frame)))
+                if len(hit):
+                    return int(ph[hit[0]]), np.asarray(emb[hit[0]], dtype=np.float32)
+            return None
+
+    def _search(
+        self,
+        phash: Optional[int] = None,
+        embed: Optional[np.ndarray] = None,
+        k: int = 12,
+        metric: str = "cosine",
+        exclude_key: Optional[str] = None,
+        heroes_only: bool = False,
+    ) -> List[Dict[str, Any]]:
+        use_cos = metric != "hamming" and embed is not None
+        if not use_cos and phash is None:
+            raise ValueError("search needs phash for hamming or embed for cosine")
+        q_emb = np.asarray(embed, dtype=np.float32).reshape(-1) if embed is not None else None
+        q_ph = np.uint64(phash) if phash is not None else None
+        k = max(1, int(k))
+        with self._lock:
+            idx = self._load()
+            by_id = {int(s["id"]): (key, s) for key, s in idx["sources"].items()}
+            skip = int(idx["sources"][exclude_key]["id"]) if exclude_key in idx["sources"] else -1
+            best: List[Tuple[float, str, int]] = []   # (rank key, segment, row)
+            for s in idx["segments"]:
+                ph, emb, rows = self._segment(s["name"])
+                live = self._live(rows)
+                if skip >= 0:
+                    live &= rows["source"] != skip
+                if heroes_only:
+                    hero = np.zeros(len(rows), dtype=bool)
+                    for sid, (_, src) in by_id.items():
+                        if src.get("heroes"):
+                            hero |= (rows["source"] == sid) & np.isin(rows["frame"], src["heroes"])
+                    live &= hero
+                cand = np.flatnonzero(live)
+                if not len(cand):
+                    continue
+                if use_cos:
+                    score = np.empty(len(cand), dtype=np.float32)
+                    for a in range(0, len(cand), _CHUNK):
+                        score[a:a + _CHUNK] = -(np.asarray(emb[cand[a:a + _CHUNK]], dtype=np.float32) @ q_emb)
+                else:
+                    score = popcount64(np.bitwise_xor(np.asarray(ph[cand]), q_ph)).astype(np.float32)
+                top = np.argpartition(score, min(k, len(score)) - 1)[:k] if len(score) > k else np.arange(len(score))
+                best.extend((float(score[t]), s["name"], int(cand[t])) for t in top)
+            best.sort(key=lambda b: (b[0], b[1], b[2]))
+            out: List[Dict[str, Any]] = []
+            for _, name, r in best[:k]:
+                ph, emb, rows = self._segment(name)
+                row = rows[r]
+                key, src = by_id[int(row["source"])]
+                rec: Dict[str, Any] = {
+                    "source_key": key,
+                    "source": src.get("path", ""),
+                    "frame": int(row["frame"]),
+                    "scene": int(row["scene"]),
+                    "time": round(float(row["time"]), 3),
+                    "hero": int(row["frame"]) in set(src.get("heroes", [])),
+                }
+                if q_ph is not None:
+                    rec["hamming"] = int(popcount64(np.bitwise_xor(np.uint64(ph[r]), q_ph)))
+                if q_emb is not None:
+                    rec["cosine"] = round(float(np.asarray(emb[r], dtype=np.float32) @ q_emb), 4)
+                out.append(rec)
+            return out
+
+    def lookup(self, key: str, frame: int) -> Optional[Tuple[int, np.ndarray]]:
+        """``(phash, embed)`` indexed for ``frame`` of source ``key``."""
+        return self._retry(self._lookup, key, frame)
+
+    def search(
+        self,
+        phash: Optional[int] = None,
+        embed: Optional[np.ndarray] = None,
+        k: int = 12,
+        metric: str = "cosine",
+        exclude_key: Optional[str] = None,
+        heroes_only: bool = False,
+    ) -> List[Dict[str, Any]]:
+        """
+        Top ``k`` indexed candidates closest to the query, best first. ``metric``
+        "cosine" ranks by embedding similarity, "hamming" by pHash distance;
+        both figures are reported when both query parts are given.
+        """
+        return self._retry(self._search, phash, embed, k, metric, exclude_key, heroes_only)
+
+    def similar_to(self, key: str, frame: int, k: int = 12, metric: str = "cosine", other_sources: bool = False) -> Dict[str, Any]:
+        """search() seeded with an indexed frame; the frame itself is left out."""
+        hit = self.lookup(key, frame)
+        if hit is None:
+            return {"ok": False, "error": f"frame {frame} of {key} is not indexed"}
+        ph, emb = hit
+        res = self.search(ph, emb, k + 1, metric, exclude_key=key if other_sources else None)
+        res = [r for r in res if not (r["source_key"] == key and r["frame"] == int(frame))][:k]
+        return {"ok": True, "query": {"source_key": key, "frame": int(frame)}, "results": res}
+
+    def hero_duplicates(self, phash: np.ndarray, radius: int = 4, exclude_key: Optional[str] = None) -> np.ndarray:
+        """
+        (N,) mask of ``phash`` within ``radius`` bits of a hero exported from
+        another reel (``exclude_key``'s own heroes do not count).
+        """
+        return self._retry(self._hero_duplicates, phash, radius, exclude_key)
+
+    def stats(self) -> Dict[str, Any]:
+        return self._retry(self._stats)
+
+    def _hero_index(self, radius: int) -> Tuple[PHashIndex, np.ndarray]:
+        """Multi-index over live hero pHashes, with each hero's source id; cached until the next write."""
+        if self._heroes is not None and self._heroes[0].radius >= radius:
+            return self._heroes
+        hashes: List[np.ndarray] = []
+        owner: List[np.ndarray] = []
+        for ph, _, rows, live in self._iter_segments():
+            mask = np.zeros(len(rows), dtype=bool)
+            for src in self._index["sources"].values():
+                if src.get("heroes"):
+                    mask |= (rows["source"] == int(src["id"])) & np.isin(rows["frame"], src["heroes"])
+            mask &= live
+            hashes.append(np.asarray(ph[mask]))
+            owner.append(np.asarray(rows["source"][mask], dtype=np.int64))
+        hs = np.concatenate(hashes) if hashes else np.zeros(0, dtype=np.uint64)
+        src_ids = np.concatenate(owner) if owner else np.zeros(0, dtype=np.int64)
+        self._heroes = (PHashIndex(hs, radius), src_ids)
+        return self._heroes
+
+    def _hero_duplicates(self, phash: np.ndarray, radius: int = 4, exclude_key: Optional[str] = None) -> np.ndarray:
+        q = np.asarray(phash, dtype=np.uint64)
+        with self._lock:
+            idx = self._load()
+            mih, src_ids = self._hero_index(int(radius))
+            if len(mih) == 0:
+                return np.zeros(len(q), dtype=bool)
+            if exclude_key in idx["sources"]:
+                own = src_ids == int(idx["sources"][exclude_key]["id"])
+                if own.all():
+                    return np.zeros(len(q), dtype=bool)
+                if own.any():
+                    return PHashIndex(mih.hashes[~own], int(radius)).within(q, int(radius))
+            return mih.within(q, int(radius))
+
+    def _stats(self) -> Dict[str, Any]:
+        with self._lock:
+            idx = self._load()
+            total = live = 0
+            for _, _, rows, m in self._iter_segments():
+                total += len(rows)
+                live += int(m.sum())
+            size = sum(f.stat().st_size for s in idx["segments"] for f in (self.root / s["name"]).glob("*.npy"))
+            return {
+                "ok": True,
+                "root": str(self.root),
+                "sources": len(idx["sources"]),
+                "segments": len(idx["segments"]),
+                "rows": live,
+                "stale_rows": total - live,
+                "retired_segments": len(idx.get("retired", [])),
+                "heroes": sum(len(s.get("heroes", [])) for s in idx["sources"].values()),
+                "bytes": int(size),
+            }
@@ -0,0 +1,148 @@
+import numpy as np
+
+from aesthetic.baseline import BaselineStore, OnlineStat, batch_stats, column_stats
+
+NAMES = ["sharpness", "contrast", "saturation"]
+
+
+def _batches(seed, count, rows=20):
+    rng = np.random.default_rng(seed)
+    return [rng.normal(loc=i, scale=1.0 + i, size=(rows, len(NAMES))) for i in range(count)]
+
+
+def _assert_stats_equal(got, expected):
+    assert set(got) == set(expected)
+    for k, s in expected.items():
+        g = got[k]
+        assert int(g["n"]) == s.n
+        assert np.isclose(g["mean"], s.mean, rtol=1e-9, atol=1e-9)
+        assert np.isclose(g["M2"], s.M2, rtol=1e-9, atol=1e-9)
+
+
+def test_vectorized_stats_equal_sequential_add(monkeypatch):
+    rng = np.random.default_rng(9)
+    x = rng.normal(loc=1e3, scale=5.0, size=(257, len(NAMES)))
+    x[rng.random(x.shape) < 0.1] = np.nan
+    x[:, 2] = np.nan
+    x[5, 2] = 7.0
+    expected = {}
+    for j, name in enumerate(NAMES):
+        s = OnlineStat()
+        for v in x[:, j]:
+            if not np.isnan(v):
+                s.add(float(v))
+        expected[name] = s
+    monkeypatch.setattr("aesthetic.baseline._STAT_CHUNK", 16)   # many chunk merges
+    got = column_stats(x, NAMES)
+    _assert_stats_equal({k: v.to_dict() for k, v in got.items()}, expected)
+    assert got["saturation"].n == 1 and got["saturation"].M2 == 0.0
+
+    # every batch shape reduces to the same stats
+    rows = [{k: float(v) for k, v in zip(NAMES, r) if not np.isnan(v)} for r in x]
+    cols = {k: x[:, j] for j, k in enumerate(NAMES)}
+    for other in (batch_stats(rows), batch_stats(cols)):
+        _assert_stats_equal({k: v.to_dict() for k, v in other.items()}, expected)
+    assert column_stats(np.full((3, 1), np.nan), ["empty"]) == {}
+
+
+def test_torn_log_tail_is_dropped_on_replay(tmp_path):
+    store = BaselineStore(tmp_path, compact_every=100)
+    batches = _batches(0, 3)
+    for b in batches:
+        assert store.update_staging(b, NAMES, summary=True)["ok"]
+    log = store.staging.log_path
+    good = log.stat().st_size
+    with open(log, "ab") as f:
+        f.write(b'{"seq":4,"t":"2026-01-01T00:00:00+00:00","stats":{"sharp')
+
+    reopened = BaselineStore(tmp_path, compact_every=100)
+    assert reopened.staging.seq == 3
+    assert log.stat().st_size == good
+    _assert_stats_equal(reopened.staging_stats(), batch_stats(np.vstack(batches), NAMES))
+
+    extra = _batches(1, 1)
+    assert reopened.update_staging(extra[0], NAMES, summary=True)["seq"] == 4
+    again = BaselineStore(tmp_path, compact_every=100)
+    _assert_stats_equal(again.staging_stats(), batch_stats(np.vstack(batches + extra), NAMES))
+
+
+def test_compaction_then_reopen(tmp_path):
+    store = BaselineStore(tmp_path, compact_every=2)
+    batches = _batches(2, 5)
+    for b in batches:
+        store.update_augment(b, NAMES)
+    # two compactions folded four batches; the fifth is still in the log
+    assert len(store.augment.log_path.read_text(encoding="utf-8").splitlines()) == 1
+    reopened = BaselineStore(tmp_path, compact_every=2)
+    assert reopened.augment.seq == 5
+    _assert_stats_equal(reopened.augment_stats(), batch_stats(np.vstack(batches), NAMES))
+
+    reopened.compact()
+    assert reopened.augment.log_path.read_text(encoding="utf-8") == ""
+    final = BaselineStore(tmp_path, compact_every=2)
+    assert final.augment.seq == 5
+    _assert_stats_equal(final.augment_stats(), batch_stats(np.vstack(batches), NAMES))
+
+
+def test_snapshot_plus_log_matches_one_shot_stats(tmp_path):
+    store = BaselineStore(tmp_path, compact_every=3)
+    batches = _batches(3, 7, rows=33)
+    for b in batches:
+        res = store.update_staging(b, NAMES, summary=True)
+        assert set(res) == {"ok", "updated", "seq", "metricCount", "touched"}
+    reopened = BaselineStore(tmp_path, compact_every=3)
+    _assert_stats_equal(reopened.staging_stats(), batch_stats(np.vstack(batches), NAMES))
+
+
+def test_update_returns_full_stats_by_default(tmp_path):
+    store = BaselineStore(tmp_path)
+    rows = [{"sharpness": 1.0, "contrast": 2.0}, {"sharpness": 3.0}]
+    res = store.update_staging(rows)
+    assert set(res) == {"stats", "updated"}
+    assert res["stats"]["sharpness"] == {"n": 2.0, "mean": 2.0, "M2": 2.0}
+    assert res["stats"] == store.staging_stats()
+    assert set(store.update_augment(rows)) == {"stats", "updated"}
+
+
+def test_golden_versions_are_indexed_and_rebuilt(tmp_path):
+    store = BaselineStore(tmp_path)
+    for i, b in enumerate(_batches(4, 2)):
+        store.update_staging(b, NAMES, summary=True)
+        assert store.promote_staging_to_golden(f"v{i + 1}")["version"] == i + 1
+    versions = store.versions()
+    assert sorted(versions) == [1, 2]
+    assert versions[2]["note"] == "v2" and versions[2]["sampleCount"] == 20 * len(NAMES)
+    assert store.get_summary()["active"]["hash"] == versions[2]["hash"]
+
+    store.index_path.unlink()
+    assert BaselineStore(tmp_path).versions() == versions
+
+
+def test_active_golden_is_cached_until_another_store_promotes(tmp_path):
+    store = BaselineStore(tmp_path)
+    store.update_staging(_batches(5, 1)[0], NAMES)
+    store.promote_staging_to_golden()
+    first = store.load_active_golden()
+    assert store.load_active_golden() is first
+
+    other = BaselineStore(tmp_path)
+    other.update_augment(_batches(6, 1)[0], NAMES)
+    res = other.apply_augment_to_new_golden()
+    reloaded = store.load_active_golden()
+    assert reloaded is not first and reloaded["hash"] == res["hash"] and reloaded["version"] == 2
+
+
+def test_zscores_against_the_active_golden(tmp_path):
+    store = BaselineStore(tmp_path)
+    x = _batches(7, 1, rows=50)[0]
+    store.update_staging(x[:, :2], NAMES[:2])
+    store.update_staging([{"saturation": 0.5}])        # one sample: no spread
+    store.promote_staging_to_golden()
+
+    names = ["contrast", "missing", "saturation", "sharpness"]
+    values = np.random.default_rng(8).normal(size=(6, len(names)))
+    z = store.zscores(values, names)
+    expected = (values[:, [0, 3]] - x[:, [1, 0]].mean(axis=0)) / x[:, [1, 0]].std(axis=0, ddof=1)
+    assert np.allclose(z[:, [0, 3]], expected, rtol=1e-4, atol=1e-4)
+    assert np.isnan(z[:, [1, 2]]).all()
+    assert store.baseline_arrays(names)[0] is store.baseline_arrays(names)[0]
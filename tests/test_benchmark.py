@@ -0,0 +1,32 @@
+import multiprocessing as mp
+import os
+
+from aesthetic.benchmark import _await_case
+
+
+def _die(queue):
+    os._exit(3)
+
+
+def _post(queue):
+    queue.put({"ok": True})
+
+
+def _run(target):
+    ctx = mp.get_context("spawn")
+    queue = ctx.Queue()
+    proc = ctx.Process(target=target, args=(queue,))
+    proc.start()
+    res = _await_case({"id": "t"}, proc, queue, poll_s=0.2)
+    proc.join()
+    return res
+
+
+def test_dead_case_process_is_reported():
+    res = _run(_die)
+    assert res["ok"] is False
+    assert res["error"] == "exit code 3"
+
+
+def test_case_result_is_returned():
+    assert _run(_post) == {"ok": True}
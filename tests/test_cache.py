@@ -0,0 +1,59 @@
+import multiprocessing as mp
+import os
+
+import numpy as np
+
+from aesthetic.storage.cache import FrameCache
+
+
+def _metrics_writer(root, worker, rounds):
+    cache = FrameCache(root)
+    for r in range(rounds):
+        frames = np.arange(4) + 100 * worker + 10 * r
+        cache.put_metrics_table("k", "v1", frames, ["a", "b"], np.full((4, 2), worker, np.float32))
+        cache.put_signatures("k", "v1", frames, frames.astype(np.uint64), np.zeros((4, 3), np.float32))
+
+
+def test_concurrent_table_merges_keep_every_row(tmp_path):
+    workers, rounds = 4, 6
+    ctx = mp.get_context("spawn")
+    procs = [ctx.Process(target=_metrics_writer, args=(tmp_path, w, rounds)) for w in range(workers)]
+    for p in procs:
+        p.start()
+    for p in procs:
+        p.join(60)
+        assert p.exitcode == 0
+
+    expected = np.sort(np.concatenate([np.arange(4) + 100 * w + 10 * r for w in range(workers) for r in range(rounds)]))
+    cache = FrameCache(tmp_path)
+    frames, names, values = cache.get_metrics_table("k", "v1")
+    assert names == ["a", "b"]
+    assert frames.tolist() == expected.tolist()
+    assert values[:, 0].tolist() == (frames // 100).tolist()
+    assert cache.get_signatures("k", "v1")[0].tolist() == expected.tolist()
+    assert not any(p.suffix == ".lock" for p in cache._index())
+
+
+def test_lru_evicts_least_recently_used_first(tmp_path):
+    frame = np.random.default_rng(0).integers(0, 256, (32, 32, 3), dtype=np.uint8)
+    probe = FrameCache(tmp_path / "probe")
+    probe.put_frame("k", 0, frame)
+    size = probe.total_bytes
+
+    cache = FrameCache(tmp_path / "cache", max_bytes=3 * size)
+    for i in range(3):
+        cache.put_frame("k", i, frame)
+    assert cache.total_bytes == 3 * size
+    assert cache.get_frame("k", 0) is not None          # 0 is now the most recent
+    cache.put_frame("k", 3, frame)
+    assert cache.get_frame("k", 1) is None               # the oldest untouched entry went
+    assert all(cache.get_frame("k", i) is not None for i in (0, 2, 3))
+    assert cache.total_bytes <= cache.max_bytes
+
+    # a fresh instance rebuilds recency from mtimes
+    for age, i in enumerate((3, 2, 0)):
+        os.utime(cache.frame_path("k", i), ns=(10 ** 18 - age * 10 ** 9,) * 2)
+    reopened = FrameCache(tmp_path / "cache", max_bytes=2 * size)
+    assert reopened.total_bytes == 3 * size
+    assert reopened.evict() == size
+    assert not reopened.frame_path("k", 0).exists()
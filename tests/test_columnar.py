@@ -0,0 +1,42 @@
+import json
+
+import numpy as np
+
+from aesthetic.models.job import CandidateTable
+from aesthetic.storage.columnar import MetricsStore
+
+NAMES = ["sharpness", "face_count", "camera_speed"]
+
+
+def _store(tmp_path):
+    values = np.array([[1.5, np.nan, 0.2], [2.5, 1.0, np.inf], [3.5, 2.0, 0.4]], dtype=np.float32)
+    cands = CandidateTable.from_columns([1, 1, 2], [10, 20, 30], 24.0)
+    return MetricsStore.write(tmp_path / "metrics", NAMES, values, cands, "e1"), values, cands
+
+
+def test_round_trip(tmp_path):
+    store, values, cands = _store(tmp_path)
+    reopened = MetricsStore(tmp_path / "metrics")
+    assert reopened.names == NAMES and reopened.rows == 3
+    assert np.array_equal(reopened.matrix(), values, equal_nan=True)
+    assert np.array_equal(reopened.column("sharpness"), values[:, 0])
+    assert np.array_equal(reopened.matrix(["camera_speed", "sharpness"]), values[:, [2, 0]], equal_nan=True)
+    assert reopened.candidates()["frame"].tolist() == cands.frame.tolist()
+    assert reopened.index["engine_version"] == "e1"
+
+
+def test_export_json_is_strict_json(tmp_path):
+    store, _, _ = _store(tmp_path)
+    path = store.export_json(tmp_path / "out" / "metrics.json")
+    text = path.read_text(encoding="utf-8")
+    assert "NaN" not in text and "Infinity" not in text
+
+    def reject(token):
+        raise ValueError(token)
+
+    doc = json.loads(text, parse_constant=reject)
+    rows = doc["candidates"]
+    assert rows[0]["metrics"]["sharpness"] == 1.5
+    assert rows[0]["metrics"]["face_count"] is None
+    assert rows[1]["metrics"]["camera_speed"] is None
+    assert [r["frame"] for r in rows] == [10, 20, 30]
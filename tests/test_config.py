@@ -0,0 +1,39 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import yaml
+
+from aesthetic.config import config_section, load_config
+
+
+def test_config_is_parsed_once_until_the_file_changes(tmp_path, monkeypatch):
+    path = tmp_path / "config.yaml"
+    path.write_text("runtime:\n  workers: 2\n", encoding="utf-8")
+    parses = []
+    real = yaml.safe_load
+
+    def spy(stream):
+        parses.append(1)
+        return real(stream)
+
+    monkeypatch.setattr(yaml, "safe_load", spy)
+    first = load_config(path)
+    first["runtime"]["workers"] = 99            # callers get their own copy
+    assert load_config(path) == {"runtime": {"workers": 2}}
+    assert len(parses) == 1
+
+    path.write_text("runtime:\n  workers: 3\n", encoding="utf-8")
+    st = path.stat()
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 10 ** 9))
+    assert config_section(load_config(path), "runtime") == {"workers": 3}
+    assert len(parses) == 2
+    assert load_config(tmp_path / "missing.yaml") == {}
+
+
+def test_importing_config_is_cheap():
+    code = "import sys, aesthetic.config; print('yaml' in sys.modules)"
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True,
+                         cwd=Path(__file__).resolve().parents[1])
+    assert out.stdout.strip() == "False"
@@ -0,0 +1,38 @@
+import numpy as np
+
+from aesthetic.agents.detection import DETECTION_NAMES, detection_columns
+from aesthetic.agents.scoring import Ranker
+
+CONSISTENCY = DETECTION_NAMES.index("saliency_consistency")
+
+
+def _det(maps):
+    sal = np.asarray(maps, dtype=np.float32)
+    faces = np.full((len(sal), 1, 4), np.nan, dtype=np.float32)
+    return {"saliency": sal, "faces": faces}
+
+
+def test_single_candidate_scene_has_no_consistency():
+    rng = np.random.default_rng(0)
+    col = detection_columns(_det(rng.random((1, 8, 8))), np.array([1]))[:, CONSISTENCY]
+    assert np.isnan(col).all()
+
+
+def test_consistency_is_leave_one_out():
+    rng = np.random.default_rng(1)
+    a, b, c = rng.random((3, 8, 8))
+    col = detection_columns(_det([a, a, b, c]), np.array([1, 1, 2, 2]))[:, CONSISTENCY]
+    assert np.allclose(col[:2], 1.0)
+    fa, fb = (c - c.mean()).ravel(), (b - b.mean()).ravel()
+    expected = fa @ fb / (np.linalg.norm(fa) * np.linalg.norm(fb))
+    assert np.allclose(col[2:], expected, atol=1e-5)
+    assert (col[2:] < 1.0).all()
+
+
+def test_ranker_skips_nan_scores():
+    names = ["saliency_consistency", "subject_thirds_dist"]
+    ranker = Ranker.from_scores(np.array([[np.nan, 80.0], [60.0, 80.0]], dtype=np.float32), names)
+    totals = ranker.totals()
+    assert np.isclose(totals[0], 80.0)
+    assert np.isclose(totals[1], 70.0)
+    assert np.isnan(ranker.categories[0]).sum() > np.isnan(ranker.categories[1]).sum()
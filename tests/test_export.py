@@ -0,0 +1,59 @@
+import json
+
+import cv2
+import numpy as np
+
+from aesthetic.agents.export import export_shots, plan_trims
+from aesthetic.benchmark import make_clip
+from aesthetic.storage.cache import FrameCache
+
+SHOTS = [
+    {"id": 3, "frame": 60, "start": 2.5, "end": 4.0, "totalScore": 90},
+    {"id": 1, "frame": 5, "start": 0.0, "end": 1.0, "totalScore": 80},
+    {"id": 2, "frame": 30, "start": 1.0, "end": 2.5, "totalScore": 70},
+    {"id": 1, "frame": 5, "start": 0.0, "end": 1.0, "totalScore": 60},    # same frame again
+]
+
+
+def _frame_at(clip, index):
+    cap = cv2.VideoCapture(str(clip))
+    cap.set(cv2.CAP_PROP_POS_FRAMES, index)
+    ok, frame = cap.read()
+    cap.release()
+    assert ok
+    return frame
+
+
+def test_trims_copy_only_from_keyframes(tmp_path):
+    trims = plan_trims(tmp_path / "reel.mov", SHOTS, 24.0, tmp_path, [0, 59], {"keyframe_tolerance": 1, "trim_codec": "libx264"})
+    assert [t["scene"] for t in trims] == [3, 1, 2]
+    assert [t["mode"] for t in trims] == ["copy", "copy", "reencode"]
+    assert [t["start_frame"] for t in trims] == [60, 0, 24]
+    assert trims[0]["path"].endswith("reel_scene003.mov") and trims[2]["path"].endswith("reel_scene002.mp4")
+    cmd = trims[2]["command"]
+    assert cmd[cmd.index("-ss") + 1] == "1.000" and cmd[cmd.index("-t") + 1] == "1.500"
+    assert all(t["mode"] == "reencode" for t in plan_trims(tmp_path / "reel.mov", SHOTS, 24.0, tmp_path, None,
+                                                           {"keyframe_tolerance": 1, "trim_codec": "libx264"}))
+
+
+def test_export_writes_each_frame_once_and_prefers_the_cache(tmp_path):
+    clip = tmp_path / "reel.avi"
+    make_clip(clip, 160, 90, 4.0, fps=24, seed=6, scene_s=(1.0, 1.5))
+    cache = FrameCache(tmp_path / "cache")
+    marker = np.full((90, 160, 3), (0, 0, 255), dtype=np.uint8)
+    cache.put_frame("reel", 30, marker)
+
+    out = tmp_path / "out"
+    res = export_shots(clip, SHOTS, out, {"export": {"format": "png", "workers": 2, "sheet_columns": 2}},
+                       cache=cache, key="reel", keyframes=[0, 59])
+    assert res["ok"] and res["failed_frames"] == []
+    assert [p.rsplit("_", 1)[-1] for p in res["frames"]] == ["f60.png", "f5.png", "f30.png"]
+    assert np.array_equal(cv2.imread(res["frames"][2]), marker)
+    assert np.array_equal(cv2.imread(res["frames"][0]), _frame_at(clip, 60))
+
+    sheet = cv2.imread(res["contact_sheet"])
+    assert sheet.shape[:2] == (2 * 270, 2 * 480)
+    listed = json.loads((out / "reel_trims.json").read_text(encoding="utf-8"))
+    assert [t["scene"] for t in listed["trims"]] == [3, 1, 2]
+    assert res["trim_modes"] == {"copy": 2, "reencode": 1} and res["rendered"] == []
+
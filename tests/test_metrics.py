@@ -0,0 +1,32 @@
+import cv2
+import numpy as np
+
+from aesthetic.agents.metrics import METRIC_NAMES, MetricsEngine, as_records
+
+
+def _frames(n=7, seed=0):
+    rng = np.random.default_rng(seed)
+    small = rng.integers(0, 256, (n, 12, 20, 3), dtype=np.uint8)
+    return np.stack([cv2.resize(f, (160, 96), interpolation=cv2.INTER_CUBIC) for f in small])
+
+
+def test_batched_equals_per_frame():
+    frames = _frames()
+    batched = MetricsEngine(batch_size=4).compute(frames)["values"]
+    single = np.concatenate([MetricsEngine(batch_size=1).compute(f)["values"] for f in frames])
+    assert batched.shape == (len(frames), len(METRIC_NAMES))
+    np.testing.assert_allclose(batched, single, rtol=1e-5, atol=1e-5)
+    whole = MetricsEngine(batch_size=len(frames)).compute(frames)["values"]
+    np.testing.assert_allclose(whole, single, rtol=1e-5, atol=1e-5)
+
+
+def test_metrics_follow_the_picture():
+    sharp = _frames(1, seed=1)[0]
+    blurred = cv2.GaussianBlur(sharp, (0, 0), 3)
+    black = np.zeros_like(sharp)
+    gray = np.full_like(sharp, 128)
+    rec = as_records(MetricsEngine().compute(np.stack([sharp, blurred, black, gray])))
+    assert rec[0]["laplacian_var"] > rec[1]["laplacian_var"]
+    assert rec[2]["clip_shadows_pct"] == 100.0 and rec[2]["clip_highlights_pct"] == 0.0
+    assert abs(rec[3]["luma_mean"] - 128 / 255) < 1e-3 and rec[3]["saturation_mean"] < 1.0
+    assert all(np.isfinite(v) for r in rec for v in r.values())
@@ -0,0 +1,22 @@
+from aesthetic.benchmark import make_clip
+from aesthetic.pipeline import motion_stage, scenes_stage
+from aesthetic.storage.cache import FrameCache
+
+
+def test_scene_change_misses_motion_cache(tmp_path):
+    clip = tmp_path / "clip.avi"
+    make_clip(clip, 160, 90, 6.0, fps=24, seed=3, scene_s=(1.5, 1.5))
+    cache = FrameCache(tmp_path / "cache")
+    key = "clip"
+
+    cfg = {"extract": {"min_scene_len_frames": 12}}
+    scenes = scenes_stage(clip, cfg, cache, key)
+    first = motion_stage(clip, scenes["scenes"], scenes["fps"], cfg, cache, key)
+    assert not first["cached"]
+    assert motion_stage(clip, scenes["scenes"], scenes["fps"], cfg, cache, key)["cached"]
+
+    merged_cfg = {"extract": {"min_scene_len_frames": 60}}
+    merged = scenes_stage(clip, merged_cfg, cache, key)
+    assert len(merged["scenes"]) < len(scenes["scenes"])
+    second = motion_stage(clip, merged["scenes"], merged["fps"], merged_cfg, cache, key)
+    assert not second["cached"]
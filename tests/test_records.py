@@ -0,0 +1,52 @@
+import json
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from aesthetic.models import job
+from aesthetic.models.job import CandidateTable, ShotTable, dumps
+
+SHOTS = [
+    {"id": 4, "start": 1.5, "end": 3.25, "frame": 40, "totalScore": 87,
+     "scores": {"exposure": {"total": 80}, "color": {"total": 91}}, "movement": "pan"},
+    {"id": 9, "start": 6.0, "end": 7.0, "frame": 150, "totalScore": 64, "scores": {}},
+]
+
+
+def test_shot_table_round_trips_through_dicts_bytes_and_json():
+    table = ShotTable.from_dicts(SHOTS)
+    assert table.to_dicts() == SHOTS
+    assert ShotTable.from_bytes(table.to_bytes()).to_dicts() == SHOTS
+    assert ShotTable.from_dicts(json.loads(dumps({"shots": table}))["shots"]).to_dicts() == SHOTS
+
+
+def test_orjson_and_stdlib_write_the_same_document(monkeypatch):
+    cands = CandidateTable.from_columns([1, 1, 2], [10, 20, 30], 24.0)
+    doc = {
+        "shots": ShotTable.from_dicts(SHOTS),
+        "candidates": cands.to_records(),
+        "frames": cands.frame,
+        "fps": np.float32(24.0),
+        "count": np.int64(3),
+        "source": Path("reels") / "a.mov",
+    }
+    fast = json.loads(dumps(doc, indent=True))
+    monkeypatch.setattr(job, "orjson", None)
+    slow = json.loads(dumps(doc, indent=True))
+    assert fast == slow
+    assert slow["frames"] == [10, 20, 30] and slow["source"] == str(Path("reels") / "a.mov")
+    assert CandidateTable.from_records(slow["candidates"]).to_bytes() == cands.to_bytes()
+
+
+def test_records_from_outside_are_validated():
+    with pytest.raises(ValueError):
+        ShotTable.from_dicts([{"id": 1, "start": 2.0, "end": 1.0}])
+    with pytest.raises(ValueError):
+        ShotTable.from_dicts([dict(SHOTS[0], movement="dolly_zoom")])
+    with pytest.raises(ValueError):
+        ShotTable.from_dicts([dict(SHOTS[0], scores={"vibes": 3})])
+    with pytest.raises(ValueError):
+        CandidateTable.from_records([{"id": 1, "scene_id": 1, "frame": -4}])
+    with pytest.raises(ValueError):
+        ShotTable.from_bytes(CandidateTable.from_columns([1], [0], 24.0).to_bytes())
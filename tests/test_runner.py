@@ -0,0 +1,43 @@
+import threading
+
+from aesthetic.runner import CANCELLED, DONE, FINISHED, JobRunner
+
+
+def _terminal(events, job_id):
+    return [e for e in events if e["job_id"] == job_id and e["status"] in FINISHED and "stages" in e]
+
+
+def test_cancel_queued_job_finishes_once():
+    events = []
+    runner = JobRunner(max_jobs=1, on_event=events.append)
+    gate = threading.Event()
+    runner.submit("blocker", lambda ctx: gate.wait(5))
+    runner.submit("job", lambda ctx: "never")
+    assert runner.cancel("job")["status"] == CANCELLED
+    gate.set()
+    runner.wait("blocker", 5)
+    runner.shutdown(cancel=False)
+    assert len(_terminal(events, "job")) == 1
+    assert runner.state("job") == CANCELLED
+
+
+def test_resubmit_after_cancel_is_not_touched_by_stale_run():
+    events = []
+    runner = JobRunner(max_jobs=2, on_event=events.append)
+    started = threading.Event()
+
+    def slow(ctx):
+        started.set()
+        while True:
+            ctx.progress("work", 0.5)
+
+    runner.submit("job", slow)
+    started.wait(5)
+    runner.cancel("job")
+    runner.wait("job", 5)
+    assert runner.state("job") == CANCELLED
+    runner.submit("job", lambda ctx: {"n": 1})
+    assert runner.wait("job", 5) == DONE
+    runner.shutdown()
+    assert runner.status("job")["events"][-1]["status"] == DONE
+    assert len(_terminal(events, "job")) == 2
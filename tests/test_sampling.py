@@ -0,0 +1,88 @@
+import numpy as np
+
+from aesthetic.agents import ingest, sampling
+from aesthetic.agents.sampling import DEFAULTS, judge, plan_candidates, sample_candidates
+from aesthetic.benchmark import make_clip
+
+SCENES = [
+    {"id": 1, "start_frame": 0, "end_frame": 120},
+    {"id": 2, "start_frame": 120, "end_frame": 130},
+    {"id": 3, "start_frame": 130, "end_frame": 400},
+]
+
+
+def test_plan_is_ordered_deterministic_and_seeded_per_scene():
+    opts = dict(DEFAULTS)
+    plan = plan_candidates(SCENES, opts, 24.0)
+    frames = plan.frame
+    assert np.all(np.diff(frames) > 0)
+    assert plan.ids.tolist() == list(range(1, len(plan) + 1))
+    for sc in SCENES:
+        mine = frames[plan.scene_id == sc["id"]]
+        assert len(mine) >= 1
+        assert mine.min() >= sc["start_frame"] and mine.max() < sc["end_frame"]
+        assert np.all(np.diff(mine) >= opts["min_gap_frames"])
+    assert np.array_equal(plan_candidates(SCENES, opts, 24.0).frame, frames)
+    # changing one scene leaves the others' plans alone
+    moved = [dict(SCENES[0], end_frame=110), SCENES[1], SCENES[2]]
+    other = plan_candidates(moved, opts, 24.0)
+    assert np.array_equal(other.frame[other.scene_id == 3], frames[plan.scene_id == 3])
+
+
+def test_judge_rejects_black_and_blur_but_keeps_one_per_scene():
+    opts = dict(DEFAULTS, per_scene_keep_pct=0.5)
+    scene = np.array([1, 1, 1, 1, 2, 2])
+    luma = np.array([0.01, 0.5, 0.5, 0.4, 0.01, 0.02], dtype=np.float32)
+    sharp = np.array([50.0, 1.0, 80.0, 60.0, 50.0, 50.0], dtype=np.float32)
+    keep, rejected = judge(scene, luma, sharp, opts)
+    assert rejected == {"rejected_black": 3, "rejected_blur": 1}
+    # scene 2 is all black: its brighter frame is kept as the fallback
+    assert keep.tolist() == [False, False, True, True, False, True]
+
+
+def test_prefilter_decodes_only_proxies(tmp_path, monkeypatch):
+    clip = tmp_path / "clip.avi"
+    make_clip(clip, 640, 360, 4.0, fps=24, seed=1, scene_s=(2.0, 2.0))
+    opts = dict(DEFAULTS, proxy_height=72)
+    heights = []
+    real = ingest.read_frames
+
+    def spy(*args, **kwargs):
+        for f, img in real(*args, **kwargs):
+            heights.append(img.shape[0])
+            yield f, img
+
+    monkeypatch.setattr(sampling, "read_frames", spy)
+    scenes = [{"id": 1, "start_frame": 0, "end_frame": 48}, {"id": 2, "start_frame": 48, "end_frame": 96}]
+    kept, info = sample_candidates(clip, scenes, 24.0, opts)
+    assert info["decoded"] == info["planned"] == len(heights)
+    assert max(heights) <= 72
+    assert 1 <= info["kept"] < info["planned"]
+    # a second run from the stored proxy figures decodes nothing
+    heights.clear()
+    again, info2 = sample_candidates(clip, scenes, 24.0, opts, stats=info["proxy"])
+    assert info2["decoded"] == 0 and not heights
+    assert np.array_equal(again.frame, kept.frame)
+
+
+def test_read_frames_seeks_only_across_keyframes(tmp_path, monkeypatch):
+    clip = tmp_path / "clip.avi"
+    make_clip(clip, 160, 90, 4.0, fps=24, seed=2, scene_s=(2.0, 2.0))
+    seeks = []
+    real_seek = ingest._Decoder.seek
+
+    def seek(self, index):
+        seeks.append(index)
+        real_seek(self, index)
+
+    monkeypatch.setattr(ingest._Decoder, "seek", seek)
+    wanted = [5, 10, 60, 70]
+    with_kf = dict(ingest.read_frames(clip, wanted, keyframes=[0, 50]))
+    # 0 -> 5 -> 10 decode forward; keyframe 50 lies before 60, so that is a seek
+    assert seeks == [60]
+    seeks.clear()
+    plain = dict(ingest.read_frames(clip, wanted, seek_gap=1000))
+    assert seeks == []
+    assert sorted(with_kf) == wanted
+    for f in wanted:
+        assert np.abs(with_kf[f].astype(int) - plain[f].astype(int)).mean() < 2.0
@@ -0,0 +1,60 @@
+import cv2
+import numpy as np
+
+from aesthetic.agents.scenes import detect_scenes, suppress_flashes
+from aesthetic.benchmark import cut_accuracy, make_clip
+
+
+def _flash_clip(path, flash_at, flash_len, cut_at, total=96):
+    rng = np.random.default_rng(7)
+    a, b = (cv2.resize(rng.integers(0, 256, (9, 16, 3), dtype=np.uint8), (160, 90)) for _ in range(2))
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*"MJPG"), 24.0, (160, 90))
+    try:
+        for t in range(total):
+            frame = a if t < cut_at else b
+            if flash_at <= t < flash_at + flash_len:
+                frame = np.full_like(a, 250)
+            writer.write(frame)
+    finally:
+        writer.release()
+
+
+def test_cuts_found_on_synthetic_clip(tmp_path):
+    clip = tmp_path / "clip.avi"
+    truth = make_clip(clip, 160, 90, 8.0, fps=24, seed=4, scene_s=(1.5, 2.5))
+    res = detect_scenes(clip)
+    assert res["ok"] and res["frame_count"] == truth["frames"]
+    acc = cut_accuracy(truth["cuts"], res["cuts"])
+    assert acc["cut_recall"] == 1.0 and acc["cut_precision"] == 1.0
+    spans = [(s["start_frame"], s["end_frame"]) for s in res["scenes"]]
+    assert spans[0][0] == 0 and spans[-1][1] == truth["frames"]
+    assert all(a[1] == b[0] for a, b in zip(spans, spans[1:]))
+
+
+def test_stride_refines_to_the_same_cuts(tmp_path):
+    clip = tmp_path / "clip.avi"
+    make_clip(clip, 160, 90, 8.0, fps=24, seed=5, scene_s=(1.5, 2.5))
+    full = detect_scenes(clip)
+    strided = detect_scenes(clip, {"scenes": {"stride": 4}})
+    assert strided["cuts"] == full["cuts"]
+    assert strided["stats"]["frames_analyzed"] < full["stats"]["frames_analyzed"]
+
+
+def test_flash_is_not_a_cut(tmp_path):
+    clip = tmp_path / "flash.avi"
+    _flash_clip(clip, flash_at=30, flash_len=2, cut_at=60)
+    assert detect_scenes(clip)["cuts"] == [60]
+    # longer than flash_frames it is a scene of its own, subject to the minimum length
+    res = detect_scenes(clip, {"scenes": {"flash_frames": 0}, "extract": {"min_scene_len_frames": 1}})
+    assert res["cuts"] == [30, 32, 60]
+
+
+def test_suppress_flashes_drops_jump_and_return():
+    hist = np.zeros((10, 4), np.float32)
+    hist[:, 0] = 1.0
+    hist[4:6] = [0, 0, 0, 1]          # frames 4, 5 flash, 6 is back to the base picture
+    thresh = np.full(10, 0.1, np.float32)
+    assert suppress_flashes(np.array([4, 6]), hist, thresh, 3).tolist() == []
+    assert suppress_flashes(np.array([4, 6]), hist, thresh, 1).tolist() == [4, 6]
+    hist[6:] = [0, 1, 0, 0]           # no return: both are real changes
+    assert suppress_flashes(np.array([4, 6]), hist, thresh, 3).tolist() == [4, 6]
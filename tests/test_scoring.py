@@ -0,0 +1,81 @@
+import numpy as np
+
+from aesthetic.agents import scoring
+from aesthetic.agents.metrics import METRIC_NAMES
+from aesthetic.agents.scoring import CATEGORIES, COLUMN_CATEGORIES, Ranker, metric_weights, normalize, rollup
+
+NAMES = [n for n in METRIC_NAMES if n in COLUMN_CATEGORIES]
+
+
+def _values(seed, n=12):
+    rng = np.random.default_rng(seed)
+    return rng.random((n, len(NAMES))).astype(np.float32) * 2.0
+
+
+def _brute_total(scores, names, cat_w):
+    cats = {}
+    for j, n in enumerate(names):
+        cats.setdefault(COLUMN_CATEGORIES[n], []).append(scores[:, j])
+    num = sum(cat_w.get(c, 1.0) * np.mean(v, axis=0) for c, v in cats.items())
+    return num / sum(cat_w.get(c, 1.0) for c in cats)
+
+
+def test_ranker_totals_match_rollup_and_brute_force():
+    values = _values(0)
+    cat_w = {"exposure": 3.0, "color": 0.5}
+    ranker = Ranker(values, NAMES)
+    cats, totals = rollup(normalize(values, NAMES), NAMES, cat_w)
+    assert np.allclose(ranker.totals(cat_w), totals, atol=1e-3)
+    assert np.allclose(ranker.categories, cats, equal_nan=True)
+    assert np.allclose(totals, _brute_total(normalize(values, NAMES), NAMES, cat_w), atol=1e-3)
+
+
+def test_reweighting_stored_scores_equals_fresh_ranking():
+    values = _values(1)
+    stored = Ranker.from_scores(Ranker(values, NAMES).scores, NAMES)
+    for cat_w in ({}, {"quality": 4.0}, {c: float(i) for i, c in enumerate(CATEGORIES)}):
+        assert np.allclose(stored.totals(cat_w), Ranker(values, NAMES).totals(cat_w), atol=1e-4)
+
+
+def test_pillar_weights_without_other_pillars_change_nothing():
+    ranker = Ranker(_values(2), NAMES)
+    base = ranker.totals()
+    assert np.allclose(ranker.totals(pillar_weights={"technical": 5, "subjective": 0}), base)
+    # a zero weight on the only pillar must not tie every shot at 0
+    assert np.allclose(ranker.totals(pillar_weights={"technical": 0}), base)
+
+
+def test_pillar_weights_blend_present_pillars(monkeypatch):
+    creative = NAMES[: len(NAMES) // 2]
+    monkeypatch.setitem(scoring.__dict__, "METRIC_PILLARS", {n: ("creative" if n in creative else "technical") for n in NAMES})
+    assert scoring.active_pillars(NAMES) == ("technical", "creative")
+    mask = np.array([n in creative for n in NAMES])
+    w = metric_weights(NAMES, pillar_weights={"technical": 1.0, "creative": 3.0})
+    assert np.isclose(w.sum(), 1.0)
+    assert np.isclose(w[mask].sum(), 0.75) and np.isclose(w[~mask].sum(), 0.25)
+    only_tech = metric_weights(NAMES, pillar_weights={"technical": 1.0, "creative": 0.0})
+    assert np.isclose(only_tech[mask].sum(), 0.0) and np.isclose(only_tech.sum(), 1.0)
+
+
+def test_nan_scores_drop_out_of_the_total():
+    scores = normalize(_values(3), NAMES)
+    holed = scores.copy()
+    holed[0, 0] = np.nan
+    holed[1, :] = np.nan
+    ranker = Ranker.from_scores(holed, NAMES)
+    totals = ranker.totals()
+    assert np.allclose(totals[2:], Ranker.from_scores(scores, NAMES).totals()[2:])
+    w = metric_weights(NAMES)
+    keep = np.arange(len(NAMES)) != 0
+    assert np.isclose(totals[0], (scores[0, keep] * w[keep]).sum() / w[keep].sum(), atol=1e-3)
+    assert totals[1] == 0.0
+    assert np.isnan(ranker.categories[1]).all()
+
+
+def test_split_weights_accepts_nested_and_flat():
+    nested = {"categories": {"exposure": 2, "color": 0.5}, "pillars": {"technical": 3}}
+    flat = {"exposure": 2, "color": 0.5, "technical": 3, "bogus": 1, "quality": "high", "lighting": True}
+    assert scoring.split_weights(nested) == scoring.split_weights(flat) == (
+        {"exposure": 2.0, "color": 0.5}, {"technical": 3.0}
+    )
+    assert scoring.split_weights(None) == ({}, {})
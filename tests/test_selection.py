@@ -0,0 +1,78 @@
+import numpy as np
+
+from aesthetic.agents.selection import Selector, best_per_group, keep_per_scene
+from aesthetic.agents.signatures import hamming
+
+OPTS = {"min_clusters": 16, "clusters_per_shot": 4, "max_per_scene": 2}
+
+
+def _pool(seed, n=120, scenes=12):
+    rng = np.random.default_rng(seed)
+    embed = rng.normal(size=(n, 16)).astype(np.float32)
+    embed /= np.linalg.norm(embed, axis=1, keepdims=True)
+    phash = rng.integers(0, 2 ** 63, size=n, dtype=np.int64).astype(np.uint64)
+    scene = np.repeat(np.arange(scenes), n // scenes)
+    total = (rng.random(n) * 100).astype(np.float32)
+    return embed, phash, scene, total
+
+
+def _plain_greedy(sel, total, k):
+    """Re-evaluate every eligible candidate each step, as the non-lazy greedy would."""
+    q = total / 100.0
+    pool = best_per_group(total, sel.groups, keep_per_scene(total, sel.scene, 1.0))
+    cent, w = sel.clients(k)
+    cur = np.zeros(len(cent), dtype=np.float32)
+    picked = []
+    for _ in range(k):
+        best, best_gain = None, -np.inf
+        for j in np.flatnonzero(pool):
+            if j in picked or sum(sel.scene[p] == sel.scene[j] for p in picked) >= OPTS["max_per_scene"]:
+                continue
+            if picked and ((hamming(sel.phash[picked], sel.phash[j]) <= 4).any()
+                           or (sel.embed[picked] @ sel.embed[j]).max() > 0.97):
+                continue
+            gain = q[j] + float(np.maximum(np.maximum(cent @ sel.features[j], 0.0) - cur, 0.0) @ w)
+            if gain > best_gain:
+                best, best_gain = j, gain
+        if best is None:
+            break
+        picked.append(best)
+        np.maximum(cur, np.maximum(cent @ sel.features[best], 0.0), out=cur)
+    return picked
+
+
+def test_selection_is_deterministic_and_matches_plain_greedy():
+    embed, phash, scene, total = _pool(0)
+    first, stats = Selector(embed, phash, scene, OPTS).select(total, 8)
+    again, _ = Selector(embed, phash, scene, OPTS).select(total, 8)
+    assert first.tolist() == again.tolist()
+    assert not stats["degraded"] and stats["evaluations"] < stats["pool"] * 8
+
+    reused = Selector(embed, phash, scene, OPTS)
+    reused.select(total[::-1].copy(), 8)
+    assert reused.select(total, 8)[0].tolist() == first.tolist()
+    assert first.tolist() == _plain_greedy(Selector(embed, phash, scene, OPTS), total, 8)
+
+
+def test_near_duplicates_and_excluded_are_never_picked():
+    embed, phash, scene, total = _pool(1)
+    best = int(np.argmax(total))
+    twin = int(np.flatnonzero(scene != scene[best])[0])
+    phash[twin] = phash[best] ^ np.uint64(1)          # one bit apart, other scene
+    embed[twin] = embed[best]
+    total[twin] = total[best] - 0.01
+    picks, _ = Selector(embed, phash, scene, OPTS).select(total, 10)
+    assert best in picks.tolist() and twin not in picks.tolist()
+    assert np.bincount(scene[picks]).max() <= OPTS["max_per_scene"]
+
+    exclude = np.zeros(len(scene), dtype=bool)
+    exclude[best] = True
+    picks, _ = Selector(embed, phash, scene, OPTS, exclude=exclude).select(total, 10)
+    assert best not in picks.tolist()
+
+
+def test_short_pool_is_filled_and_flagged():
+    embed, phash, scene, total = _pool(2, n=12, scenes=3)
+    picks, stats = Selector(embed, phash, scene, {**OPTS, "max_per_scene": 4, "dedupe_cosine": -1.0}).select(total, 5)
+    assert len(picks) == 5 and stats["degraded"]
+    assert len(set(picks.tolist())) == 5
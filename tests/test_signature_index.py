@@ -0,0 +1,152 @@
+import multiprocessing as mp
+
+import numpy as np
+import pytest
+
+from aesthetic.agents.signatures import EMBED_DIM, PHashIndex, hamming
+from aesthetic.storage import signature_index
+from aesthetic.storage.fs import file_lock
+from aesthetic.storage.signature_index import SignatureIndex
+
+
+def _reel(rng, n):
+    phash = rng.integers(0, 2 ** 63, size=n, dtype=np.int64).astype(np.uint64)
+    embed = rng.normal(size=(n, EMBED_DIM)).astype(np.float32)
+    embed /= np.linalg.norm(embed, axis=1, keepdims=True)
+    frames = np.arange(n) * 10
+    return frames, np.ones(n, dtype=np.int32), frames / 24.0, phash, embed
+
+
+def _add(index, key, rng, n=8):
+    frames, scene, time, phash, embed = _reel(rng, n)
+    assert index.add(key, f"{key}.mp4", frames, scene, time, phash, embed)["ok"]
+    return frames, phash
+
+
+def _writer(root, worker, reels):
+    index = SignatureIndex(root)
+    rng = np.random.default_rng(worker)
+    for r in range(reels):
+        key = f"w{worker}-r{r}"
+        frames, _ = _add(index, key, rng, 4)
+        index.mark_heroes(key, frames[:1])
+
+
+def test_concurrent_writers_keep_every_segment(tmp_path):
+    workers, reels = 4, 5
+    ctx = mp.get_context("spawn")
+    procs = [ctx.Process(target=_writer, args=(tmp_path, w, reels)) for w in range(workers)]
+    for p in procs:
+        p.start()
+    for p in procs:
+        p.join()
+        assert p.exitcode == 0
+    stats = SignatureIndex(tmp_path).stats()
+    assert stats["sources"] == workers * reels
+    assert stats["rows"] == workers * reels * 4
+    assert stats["heroes"] == workers * reels
+
+
+def test_within_matches_brute_force():
+    rng = np.random.default_rng(7)
+    for trial in range(30):
+        stored = rng.integers(0, 2 ** 63, size=int(rng.integers(1, 200)), dtype=np.int64).astype(np.uint64)
+        radius = int(rng.integers(0, 9))
+        # half the queries are stored hashes with a few bits flipped, half are random
+        near = stored[rng.integers(0, len(stored), size=50)]
+        for i in range(len(near)):
+            for b in rng.choice(64, size=int(rng.integers(0, 12)), replace=False):
+                near[i] ^= np.uint64(1) << np.uint64(b)
+        far = rng.integers(0, 2 ** 63, size=50, dtype=np.int64).astype(np.uint64)
+        queries = np.concatenate([near, far])
+        expected = (hamming(queries[:, None], stored[None, :]) <= radius).any(axis=1)
+        got = PHashIndex(stored, radius).within(queries)
+        assert np.array_equal(got, expected), trial
+
+
+def test_reindex_bumps_generation_and_compact_drops_stale_rows(tmp_path):
+    index = SignatureIndex(tmp_path)
+    rng = np.random.default_rng(1)
+    _add(index, "a", rng, 8)
+    _add(index, "b", rng, 5)
+    _add(index, "a", rng, 6)
+    stats = index.stats()
+    assert stats["rows"] == 11 and stats["stale_rows"] == 8 and stats["segments"] == 3
+    res = index.compact()
+    assert res["rows"] == 11 and res["removed_segments"] == 3
+    reopened = SignatureIndex(tmp_path).stats()
+    assert reopened["rows"] == 11 and reopened["stale_rows"] == 0 and reopened["segments"] == 1
+    # old segments stay on disk for readers of the previous index.json
+    assert len(list(tmp_path.glob("seg-*"))) == 4
+    assert reopened["retired_segments"] == 3
+
+
+def test_retired_segments_are_swept_after_the_grace_period(tmp_path, monkeypatch):
+    index = SignatureIndex(tmp_path)
+    rng = np.random.default_rng(3)
+    _add(index, "a", rng)
+    _add(index, "b", rng)
+    index.compact()
+    monkeypatch.setattr(signature_index, "_RETIRE_GRACE_S", 0.0)
+    _add(index, "c", rng)
+    assert sorted(p.name for p in tmp_path.glob("seg-*")) == ["seg-000003", "seg-000004"]
+    assert index.stats()["retired_segments"] == 0
+
+
+def test_reader_with_stale_index_survives_compaction(tmp_path, monkeypatch):
+    writer = SignatureIndex(tmp_path)
+    rng = np.random.default_rng(4)
+    frames, _ = _add(writer, "a", rng)
+    _add(writer, "b", rng)
+    reader = SignatureIndex(tmp_path)
+    assert reader.stats()["rows"] == 16
+    reader._segments.clear()
+    monkeypatch.setattr(signature_index, "_RETIRE_GRACE_S", 0.0)
+    writer.compact()
+    _add(writer, "c", rng)                       # sweeps the retired segments
+    assert not (tmp_path / "seg-000001").exists()
+
+    # the reader's next load races the compaction: it still sees the old index.json
+    fresh = reader._load
+    calls = []
+
+    def stale_once():
+        calls.append(1)
+        return reader._index if len(calls) == 1 else fresh()
+
+    monkeypatch.setattr(reader, "_load", stale_once)
+    res = reader.similar_to("a", int(frames[0]), k=3)
+    assert res["ok"] and len(calls) >= 2
+    assert reader.stats()["rows"] == 24
+
+
+def test_hero_duplicates_ignore_own_heroes(tmp_path):
+    index = SignatureIndex(tmp_path)
+    rng = np.random.default_rng(2)
+    frames_a, phash_a = _add(index, "a", rng, 8)
+    frames_b, phash_b = _add(index, "b", rng, 8)
+    index.mark_heroes("a", frames_a[:2])
+    index.mark_heroes("b", frames_b[:1])
+    query = np.concatenate([phash_a[:3] ^ np.uint64(1), phash_b[:2]])
+
+    dup = index.hero_duplicates(query, radius=2, exclude_key="a")
+    assert dup.tolist() == [False, False, False, True, False]
+    dup = index.hero_duplicates(query, radius=2, exclude_key="b")
+    assert dup.tolist() == [True, True, False, False, False]
+    dup = index.hero_duplicates(query, radius=2)
+    assert dup.tolist() == [True, True, False, True, False]
+
+
+def test_write_gives_up_when_lock_is_held(tmp_path):
+    index = SignatureIndex(tmp_path, lock_timeout=0.2)
+    rng = np.random.default_rng(5)
+    _add(index, "a", rng)
+    with file_lock(index.lock_path):
+        with pytest.raises(TimeoutError):
+            with file_lock(index.lock_path, timeout=0.1):
+                pass
+        res = index.add("b", "b.mp4", *_reel(rng, 4))
+        assert not res["ok"] and "timed out" in res["error"]
+        assert not index.mark_heroes("a", [0])["ok"]
+    assert index.stats()["rows"] == 8
+    assert index.add("b", "b.mp4", *_reel(rng, 4))["ok"]
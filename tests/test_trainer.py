@@ -0,0 +1,38 @@
+import cv2
+import numpy as np
+
+from aesthetic.agents.trainer import train_baseline, train_stills
+from aesthetic.baseline import BaselineStore
+
+
+def _stills(root, n=7):
+    rng = np.random.default_rng(11)
+    for i in range(n):
+        h, w = 40 + 4 * i, 64 + 2 * i           # stills differ in size
+        small = rng.integers(0, 256, (6, 8, 3), dtype=np.uint8)
+        cv2.imwrite(str(root / f"still_{i:02d}.png"), cv2.resize(small, (w, h)))
+    (root / "notes.txt").write_text("not an image")
+    (root / "broken.png").write_bytes(b"not a png")
+    return root
+
+
+def test_stats_hash_is_independent_of_worker_count(tmp_path):
+    stills = _stills(tmp_path)
+    cfg = {"baseline": {"shard_size": 2}}
+    one = train_stills(stills, {**cfg, "runtime": {"workers": 1}})
+    two = train_stills(stills, {**cfg, "runtime": {"workers": 2}})
+    assert one["ok"] and two["ok"]
+    assert one["execution"]["mode"] == "inprocess" and two["execution"]["mode"] == "pool"
+    assert one["stats_hash"] == two["stats_hash"] and one["stats"] == two["stats"]
+    assert one["images"] == 7 and one["shards"] == 4
+    assert [p.endswith("broken.png") for p in one["failed"]] == [True]
+
+
+def test_train_baseline_folds_into_the_target_buffer(tmp_path):
+    (tmp_path / "stills").mkdir()
+    stills = _stills(tmp_path / "stills")
+    store = BaselineStore(tmp_path / "baseline")
+    res = train_baseline(stills, store, {"runtime": {"workers": 1}}, target="augment")
+    assert res["ok"] and res["seq"] == 1
+    assert store.augment_stats() == res["stats"] and store.staging_stats() == {}
+    assert not train_baseline(stills, store, target="golden")["ok"]
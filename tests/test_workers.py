@@ -0,0 +1,46 @@
+import threading
+
+import numpy as np
+
+from aesthetic.agents.metrics import MetricsEngine
+from aesthetic.agents.workers import ScoringPool, pool_context, score_frames
+
+CFG = {"runtime": {"workers": 2}, "metrics": {"batch_size": 4}}
+
+
+def _frames(seed, n=8):
+    return np.random.default_rng(seed).integers(0, 256, size=(n, 48, 64, 3), dtype=np.uint8)
+
+
+def test_pool_is_started_once_and_matches_in_process():
+    with ScoringPool() as pool:
+        for seed in range(3):
+            frames = _frames(seed)
+            res = score_frames(frames, CFG, pool)
+            assert res["execution"]["mode"] == "pool"
+            expected = MetricsEngine(batch_size=4).compute(frames)["values"]
+            assert np.allclose(res["values"], expected, rtol=1e-5, atol=1e-5)
+        assert pool.starts == 1
+
+
+def test_worker_threads_do_not_fork():
+    seen = []
+    t = threading.Thread(target=lambda: seen.append(pool_context().get_start_method()))
+    t.start()
+    t.join()
+    assert seen[0] in ("forkserver", "spawn")
+
+
+def test_pool_from_a_worker_thread_scores():
+    out = {}
+
+    def run():
+        with ScoringPool() as pool:
+            out["res"] = score_frames(_frames(9), CFG, pool)
+
+    t = threading.Thread(target=run)
+    t.start()
+    t.join()
+    expected = MetricsEngine(batch_size=4).compute(_frames(9))["values"]
+    assert out["res"]["execution"]["mode"] == "pool"
+    assert np.allclose(out["res"]["values"], expected, rtol=1e-5, atol=1e-5)